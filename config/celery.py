@@ -1,6 +1,10 @@
+import logging
 import os
 
 from celery import Celery
+from celery.signals import task_postrun, task_prerun
+
+from config.db import start_tracking, stop_tracking
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
@@ -15,3 +19,24 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
+
+logger = logging.getLogger('config.db')
+task_tracking = {}
+
+
+@task_prerun.connect
+def start_connection_tracking(task_id=None, **kwargs):
+    """Начинает подсчет новых соединений с БД, открытых задачей"""
+    task_tracking[task_id] = start_tracking()
+
+
+@task_postrun.connect
+def log_connection_setup(task_id=None, task=None, **kwargs):
+    """Пишет в лог, сколько соединений с БД открыла задача и сколько времени ушло на их установку"""
+    tracking = task_tracking.pop(task_id, None)
+    if tracking is None:
+        return
+    stats, token = tracking
+    stop_tracking(token)
+    logger.info('Задача %s[%s]: новых соединений с БД %s, %.1f мс',
+                task.name, task_id, stats.connections, stats.milliseconds)
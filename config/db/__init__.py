@@ -0,0 +1,42 @@
+"""
+Бэкенд PostgreSQL с замером времени установки соединений (ENGINE = 'config.db').
+Новые соединения учитываются в статистике текущего запроса или задачи Celery:
+при постоянных соединениях (CONN_MAX_AGE) их должно быть почти ноль
+"""
+import contextvars
+import logging
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConnectionSetupStats:
+    """Новые соединения с БД, открытые за запрос или задачу, и суммарное время их установки"""
+    connections: int = 0
+    seconds: float = 0.0
+
+    @property
+    def milliseconds(self):
+        return self.seconds * 1000
+
+
+current_stats = contextvars.ContextVar('db_connection_setup_stats', default=None)
+
+
+def start_tracking():
+    """Начинает сбор статистики соединений. Возвращает статистику и токен для stop_tracking"""
+    stats = ConnectionSetupStats()
+    return stats, current_stats.set(stats)
+
+
+def stop_tracking(token):
+    current_stats.reset(token)
+
+
+def record_connection_setup(alias, seconds):
+    stats = current_stats.get()
+    if stats is not None:
+        stats.connections += 1
+        stats.seconds += seconds
+    logger.debug('Новое соединение с БД %s за %.1f мс', alias, seconds * 1000)
@@ -0,0 +1,14 @@
+import time
+
+from django.db.backends.postgresql import base
+
+from config.db import record_connection_setup
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL, который замеряет установку каждого нового соединения вместе с его настройкой"""
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        record_connection_setup(self.alias, time.perf_counter() - started)
@@ -0,0 +1,38 @@
+"""
+Настройки gunicorn для запуска приложения в рабочем режиме через ASGI (config.asgi:application):
+
+    gunicorn config.asgi:application -c config/gunicorn.conf.py
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND') or '0.0.0.0:8000'
+workers = int(os.getenv('GUNICORN_WORKERS') or multiprocessing.cpu_count() * 2 + 1)
+worker_class = 'uvicorn.workers.UvicornWorker'
+timeout = int(os.getenv('GUNICORN_TIMEOUT') or 30)
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT') or 30)
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE') or 5)
+# Перезапуск воркера после указанного числа запросов ограничивает рост памяти
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS') or 10000)
+max_requests_jitter = max_requests // 10
+reload = os.getenv('GUNICORN_RELOAD') == 'True'
+accesslog = '-'
+
+
+def on_starting(server):
+    """Проверка настроек Django, без которых приложение под gunicorn работает неправильно"""
+    # Кэш списков и пользователей аутентификации сбрасывается только в процессе, изменившем данные,
+    # поэтому несколько воркеров не могут работать с локальным кэшем каждого процесса
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    from django.conf import settings
+
+    backend = settings.CACHES['default']['BACKEND']
+    if server.cfg.workers > 1 and backend == 'django.core.cache.backends.locmem.LocMemCache':
+        raise RuntimeError(f'{backend} не общий для {server.cfg.workers} воркеров, нужен общий кэш (Redis)')
+
+    # Под ASGI синхронный код каждого запроса выполняется в своем потоке, и постоянное соединение потока
+    # не переиспользуется следующими запросами, а остается открытым. Соединения переиспользует PgBouncer
+    if settings.DATABASES['default']['CONN_MAX_AGE'] != 0:
+        server.log.warning('DB_CONN_MAX_AGE=%s: под ASGI постоянные соединения не переиспользуются и копятся, '
+                           'задайте DB_CONN_MAX_AGE=0 и подключайтесь через PgBouncer',
+                           settings.DATABASES['default']['CONN_MAX_AGE'])
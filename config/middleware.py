@@ -0,0 +1,50 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from config.db import start_tracking, stop_tracking
+
+logger = logging.getLogger('config.db')
+
+
+class DBConnectionTimingMiddleware:
+    """
+    Считает новые соединения с БД, открытые за запрос, и время их установки.
+    Результат отдается в заголовке Server-Timing (db-connect) и пишется в лог, если соединение открывалось.
+    Работает и в синхронном, и в асинхронном режиме: статистика хранится в contextvar,
+    который asgiref передает в потоки sync_to_async
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats, token = start_tracking()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_tracking(token)
+        return self.process_response(request, response, stats)
+
+    async def __acall__(self, request):
+        stats, token = start_tracking()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_tracking(token)
+        return self.process_response(request, response, stats)
+
+    @staticmethod
+    def process_response(request, response, stats):
+        response['Server-Timing'] = f'db-connect;dur={stats.milliseconds:.2f};desc="{stats.connections}"'
+        if stats.connections:
+            logger.info('%s %s: новых соединений с БД %s, %.1f мс',
+                        request.method, request.path, stats.connections, stats.milliseconds)
+        return response
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
+import math
 import os
 from datetime import timedelta
 from pathlib import Path
@@ -49,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.middleware.DBConnectionTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,13 +84,20 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Соединения с БД не закрываются после запроса или задачи Celery, а используются повторно в течение
+# DB_CONN_MAX_AGE секунд и проверяются перед повторным использованием. Django 5.0 не поддерживает пул
+# соединений psycopg, поэтому размер пула равен числу процессов и потоков: потоков сервера приложения
+# и CELERY_WORKER_CONCURRENCY процессов Celery. Под ASGI постоянные соединения потоков не переиспользуются,
+# поэтому приложение под gunicorn подключается через PgBouncer с DB_CONN_MAX_AGE=0 (docker-compose.yaml)
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'config.db',
         'NAME': os.getenv('POSTGRES_DB'),
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
-        'HOST': os.getenv('POSTGRES_HOST')
+        'HOST': os.getenv('POSTGRES_HOST'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE') or 60),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS') != 'False',
     }
 }
 
@@ -133,24 +142,79 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
 
+TEST_RUNNER = 'config.test_runner.TestRunner'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ]
 }
 
+# Рендерер и парсер JSON на orjson для всех представлений; отдельному представлению их можно назначить
+# через renderer_classes и parser_classes
+ORJSON_ENABLED = os.getenv('ORJSON_ENABLED') == 'True'
+
+if ORJSON_ENABLED:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = (
+        'config.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = (
+        'config.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    )
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Кэш общий для всех процессов приложения и воркеров Celery: версии кэшированных списков (habits/cache.py)
+# и пользователь аутентификации (users/cache.py) сбрасываются в процессе, изменившем данные, и сброс
+# должен быть виден остальным процессам. Тесты используют локальный кэш (config.test_runner)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_LOCATION') or 'redis://localhost:6379/1',
+    }
+}
+
+PUBLIC_HABITS_CACHE_TIMEOUT = int(os.getenv('PUBLIC_HABITS_CACHE_TIMEOUT') or 300)
+USER_HABITS_CACHE_TIMEOUT = int(os.getenv('USER_HABITS_CACHE_TIMEOUT') or 300)
+# Пользователь, найденный по JWT, хранится в кэше не дольше этого времени и срока действия токена
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT') or 300)
+
+# Изменения моложе этого интервала не отдаются при синхронизации, пока не зафиксированы их транзакции
+HABITS_SYNC_LAG_SECONDS = int(os.getenv('HABITS_SYNC_LAG_SECONDS') or 5)
+
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND')
 
 API_KEY_TELEGRAM_BOT = os.getenv('API_KEY_TELEGRAM_BOT')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL') or 'https://api.telegram.org'
+TELEGRAM_TIMEOUT = float(os.getenv('TELEGRAM_TIMEOUT') or 10)
+TELEGRAM_MAX_ATTEMPTS = int(os.getenv('TELEGRAM_MAX_ATTEMPTS') or 3)
+TELEGRAM_RATE_LIMIT_REDIS_URL = os.getenv('TELEGRAM_RATE_LIMIT_REDIS_URL') or CELERY_BROKER_URL
+TELEGRAM_RATE_LIMIT = float(os.getenv('TELEGRAM_RATE_LIMIT') or 30)
+TELEGRAM_CHAT_RATE_LIMIT = float(os.getenv('TELEGRAM_CHAT_RATE_LIMIT') or 1)
+
+REMINDER_SHARDS = int(os.getenv('REMINDER_SHARDS') or 8)
+# Сколько раз отправляется напоминание, отправку которого ограничил Telegram
+REMINDER_MAX_ATTEMPTS = int(os.getenv('REMINDER_MAX_ATTEMPTS') or 5)
+
+# Число процессов воркера Celery, каждый держит одно постоянное соединение с БД
+CELERY_WORKER_CONCURRENCY = int(os.getenv('CELERY_WORKER_CONCURRENCY') or 4)
+
+# Потоки отправки всех одновременно выполняемых задач рассылки вместе отправляют около TELEGRAM_RATE_LIMIT
+# сообщений в секунду при ответе Telegram за секунду: остальные потоки только ждали бы токенов ограничителя
+TELEGRAM_MAX_WORKERS = int(
+    os.getenv('TELEGRAM_MAX_WORKERS')
+    or math.ceil(TELEGRAM_RATE_LIMIT / min(REMINDER_SHARDS, CELERY_WORKER_CONCURRENCY))
+)
 
 CELERY_BEAT_SCHEDULE = {
     'task-name': {
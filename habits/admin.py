@@ -1,9 +1,34 @@
 from django.contrib import admin
+from django.db import transaction
 
+from habits.cache import invalidate_public_habits, invalidate_user_habits
+from habits.completions import rebuild_habit_stats
 from habits.models import Habit
+from habits.services import delete_habits
+from habits.summary import BUCKET_FIELDS, get_bucket, update_summary
 
 
 @admin.register(Habit)
 class HabitAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'time', 'periodicity', 'is_pleasurable',
                     'associated_habit', 'reward', 'is_public',)
+
+    def save_model(self, request, obj, form, change):
+        old_bucket = None
+        if change:
+            old_bucket = Habit.objects.filter(pk=obj.pk, user__isnull=False).values_list(*BUCKET_FIELDS).first()
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            update_summary(added=[get_bucket(obj)], removed=[old_bucket])
+        if change and form.initial.get('periodicity') != obj.periodicity:
+            rebuild_habit_stats([obj.pk])
+        # Владельца можно сменить, поэтому сбрасывается и список прежнего владельца
+        invalidate_user_habits(obj.user_id, form.initial.get('user'))
+        # Изменения из админки редки, поэтому лента сбрасывается без проверки, затронута ли она
+        invalidate_public_habits()
+
+    def delete_model(self, request, obj):
+        delete_habits([obj])
+
+    def delete_queryset(self, request, queryset):
+        delete_habits(list(queryset))
@@ -0,0 +1,466 @@
+import datetime
+import io
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, get_runner
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from config.renderers import ORJSONParser, ORJSONRenderer
+from habits import urls as habits_urls
+from habits.cache import invalidate_public_habits, invalidate_user_habits
+from habits.completions import compute_stats, get_user_stats, record_completion
+from habits.models import Habit, HabitCompletion
+from habits.serializers import ValuesSerializer
+from habits.summary import rebuild_summary
+from users import urls as users_urls
+from users.models import User
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+@dataclass
+class Endpoint:
+    """
+    Сценарий замера одного маршрута.
+    prepare(context) вызывается перед каждым запросом вне замера и возвращает (method, url, data)
+    или (method, url, data, headers). format — формат тела запроса APIClient
+    """
+    name: str
+    prepare: object
+    authenticated: bool = True
+    format: str = 'json'
+
+
+@dataclass
+class BenchmarkContext:
+    user: User
+    habit: Habit
+    client: APIClient
+    refresh_token: str
+    counter: int = 0
+
+    def next_number(self):
+        self.counter += 1
+        return self.counter
+
+
+def habit_payload(context, **kwargs):
+    return {
+        'action': f'Benchmark habit {context.next_number()}',
+        'time': '17:31:00',
+        'periodicity': 1,
+        'lead_time': 10,
+        'is_public': True,
+        **kwargs,
+    }
+
+
+def prepare_habit_delete(context):
+    habit = Habit.objects.create(user=context.user, action='Benchmark habit', lead_time=10, time='08:00:00')
+    return 'delete', f'/habit/{habit.pk}/delete/', None
+
+
+def not_modified(url):
+    """Условный GET с ETag из предыдущего ответа: замеряется ответ 304"""
+    def prepare(context):
+        etag = context.client.get(url)['ETag']
+        return 'get', url, None, {'HTTP_IF_NONE_MATCH': etag}
+    return prepare
+
+
+def cold(prepare, invalidate):
+    """
+    Запрос к списку со сброшенным кэшем страниц: замеряется чтение из БД, а не из кэша.
+    invalidate(context) вызывается после prepare, которое само может заполнить кэш
+    """
+    def prepare_cold(context):
+        request = prepare(context)
+        invalidate(context)
+        return request
+    return prepare_cold
+
+
+def invalidate_user_list(context):
+    invalidate_user_habits(context.user.pk)
+
+
+def invalidate_public_list(context):
+    invalidate_public_habits()
+
+
+def next_page(url):
+    """Вторая страница списка по ссылке next первой: замеряется выбор страницы по ключу курсора"""
+    def prepare(context):
+        return 'get', context.client.get(url).json()['next'], None
+    return prepare
+
+
+def prepare_habits_bulk(context):
+    habit = Habit.objects.create(user=context.user, action='Benchmark habit', lead_time=10, time='08:00:00')
+    operations = [{'op': 'create', 'data': habit_payload(context)} for _ in range(10)]
+    operations += [
+        {'op': 'update', 'id': context.habit.pk, 'data': {'place': f'Место {context.next_number()}'}},
+        {'op': 'delete', 'id': habit.pk},
+    ]
+    return 'post', '/habit/bulk/', operations
+
+
+def prepare_habit_complete(context):
+    # Каждая отметка позже предыдущей, поэтому замеряется обновление статистики за O(1)
+    completed_on = datetime.date(2000, 1, 1) + datetime.timedelta(days=context.next_number())
+    return 'post', f'/habit/{context.habit.pk}/complete/', {'completed_on': completed_on.isoformat()}
+
+
+def prepare_habits_import(context):
+    lines = ['action,time,periodicity,lead_time,is_public']
+    lines += [f'Imported habit {context.next_number()},08:00:00,1,10,false' for _ in range(100)]
+    return 'post', '/habit/import/', {'file': SimpleUploadedFile('habits.csv', '\n'.join(lines).encode())}
+
+
+ENDPOINTS = [
+    Endpoint('habit-create', lambda context: ('post', '/habit/create/', habit_payload(context))),
+    Endpoint('habit-update', lambda context: (
+        'patch', f'/habit/{context.habit.pk}/update/', habit_payload(context)
+    )),
+    Endpoint('habit-delete', prepare_habit_delete),
+    Endpoint('habit-get', lambda context: ('get', f'/habit/{context.habit.pk}/', None)),
+    Endpoint('habits-list', lambda context: ('get', '/habit/list/', None)),
+    Endpoint('habits-public_list', lambda context: ('get', '/habit/public_list/', None)),
+    Endpoint('habit-get-not_modified', lambda context: not_modified(f'/habit/{context.habit.pk}/')(context)),
+    Endpoint('habits-list-not_modified', not_modified('/habit/list/')),
+    Endpoint('habits-public_list-not_modified', not_modified('/habit/public_list/')),
+    Endpoint('habit-get-async', lambda context: ('get', f'/habit/async/{context.habit.pk}/', None)),
+    Endpoint('habits-list-async', lambda context: ('get', '/habit/async/list/', None)),
+    Endpoint('habits-public_list-async', lambda context: ('get', '/habit/async/public_list/', None)),
+    Endpoint('habits-list-cold', cold(lambda context: ('get', '/habit/list/', None), invalidate_user_list)),
+    Endpoint('habits-list-count-cold', cold(
+        lambda context: ('get', '/habit/list/?count=true', None), invalidate_user_list
+    )),
+    Endpoint('habits-list-cursor-cold', cold(next_page('/habit/list/'), invalidate_user_list)),
+    Endpoint('habits-list-async-cold', cold(
+        lambda context: ('get', '/habit/async/list/', None), invalidate_user_list
+    )),
+    Endpoint('habits-public_list-cold', cold(
+        lambda context: ('get', '/habit/public_list/', None), invalidate_public_list
+    )),
+    Endpoint('habits-public_list-count-cold', cold(
+        lambda context: ('get', '/habit/public_list/?count=true', None), invalidate_public_list
+    )),
+    Endpoint('habits-public_list-cursor-cold', cold(next_page('/habit/public_list/'), invalidate_public_list)),
+    Endpoint('habits-public_list-async-cold', cold(
+        lambda context: ('get', '/habit/async/public_list/', None), invalidate_public_list
+    )),
+    Endpoint('habits-bulk', prepare_habits_bulk),
+    Endpoint('habits-sync', lambda context: ('get', '/habit/sync/', None)),
+    Endpoint('habit-complete', prepare_habit_complete),
+    Endpoint('habits-stats', lambda context: ('get', '/habit/stats/', None)),
+    Endpoint('habits-summary', lambda context: ('get', '/habit/summary/', None)),
+    Endpoint('habits-export', lambda context: ('get', '/habit/export/', None)),
+    Endpoint('habits-export-csv', lambda context: ('get', '/habit/export/?export_format=csv', None)),
+    Endpoint('habits-import', prepare_habits_import, format='multipart'),
+    Endpoint('token_obtain_pair', lambda context: (
+        'post', '/users/token/', {'email': context.user.email, 'password': BENCHMARK_PASSWORD}
+    ), authenticated=False),
+    Endpoint('token_refresh', lambda context: (
+        'post', '/users/token/refresh/', {'refresh': context.refresh_token}
+    ), authenticated=False),
+    Endpoint('user-register', lambda context: (
+        'post', '/users/register/', {'email': f'register_{context.next_number()}@benchmark.com',
+                                     'password': BENCHMARK_PASSWORD}
+    ), authenticated=False),
+    Endpoint('user-update', lambda context: (
+        'patch', f'/users/{context.user.pk}/update/', {'first_name': f'Benchmark {context.next_number()}'}
+    )),
+    Endpoint('user-get', lambda context: ('get', f'/users/{context.user.pk}/', None)),
+]
+
+
+def get_route_names():
+    return {pattern.name for pattern in habits_urls.urlpatterns + users_urls.urlpatterns}
+
+
+def get_missing_endpoints(endpoints=ENDPOINTS):
+    """Маршруты habits.urls и users.urls, для которых нет сценария замера"""
+    return sorted(get_route_names() - {endpoint.name for endpoint in endpoints})
+
+
+@contextmanager
+def test_database():
+    """
+    Замеры внутри блока выполняются в отдельной тестовой базе, которая удаляется после блока,
+    и с тем же кэшем, что и тесты
+    """
+    runner = get_runner(settings)(verbosity=0, interactive=False)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+    try:
+        yield
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+
+
+def seed(users, habits, seed=0):
+    """
+    Создает users пользователей и habits привычек, распределенных между ними.
+    Возвращает пользователя, от имени которого выполняются запросы
+    """
+    rng = random.Random(seed)
+    created_users = User.objects.bulk_create(
+        User(email=f'user_{index}@benchmark.com', telegram_chat_id=str(index)) for index in range(users)
+    )
+    Habit.objects.bulk_create(
+        (
+            Habit(
+                user=created_users[rng.randrange(users)],
+                action=f'Benchmark habit {index}',
+                place='Дом',
+                time=datetime.time(rng.randrange(24), rng.choice((0, 15, 30, 45))),
+                periodicity=rng.randint(1, 7),
+                lead_time=rng.randint(1, 120),
+                is_public=rng.random() < 0.3,
+            )
+            for index in range(habits)
+        ),
+        batch_size=1000,
+    )
+    rebuild_summary()
+
+    user = created_users[0]
+    user.set_password(BENCHMARK_PASSWORD)
+    user.save()
+    return user
+
+
+def get_context(user):
+    client = APIClient()
+    response = client.post('/users/token/', {'email': user.email, 'password': BENCHMARK_PASSWORD})
+    tokens = response.json()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+
+    habit = Habit.objects.filter(user=user).first() or Habit.objects.create(
+        user=user, action='Benchmark habit', lead_time=10, time='17:31:00'
+    )
+    return BenchmarkContext(user=user, habit=habit, client=client, refresh_token=tokens['refresh'])
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def consume(response):
+    """Читает потоковый ответ до конца, не сохраняя его, чтобы замер включал всю выгрузку"""
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def measure_endpoint(context, endpoint, repeat):
+    """Количество запросов к БД, p50/p95 времени ответа в мс и пик выделенной памяти в КиБ"""
+    anonymous_client = APIClient()
+
+    def request():
+        method, url, data, *headers = endpoint.prepare(context)
+        client = context.client if endpoint.authenticated else anonymous_client
+        extra = headers[0] if headers else {}
+        return lambda: consume(getattr(client, method)(url, data=data, format=endpoint.format, **extra))
+
+    # Первый запрос прогревает кэши и не учитывается, по второму считаются запросы к БД
+    request()()
+    send = request()
+    with CaptureQueriesContext(connection) as queries:
+        response = send()
+    query_count = len(queries.captured_queries)
+    if response.status_code >= 400:
+        raise RuntimeError(f'{endpoint.name}: {response.status_code} {response.content[:200]!r}')
+
+    durations = []
+    for _ in range(repeat):
+        send = request()
+        started = time.perf_counter()
+        send()
+        durations.append((time.perf_counter() - started) * 1000)
+
+    send = request()
+    tracemalloc.start()
+    send()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'queries': query_count,
+        'p50_ms': round(statistics.median(durations), 3),
+        'p95_ms': round(percentile(durations, 95), 3),
+        'memory_kib': round(peak / 1024, 1),
+    }
+
+
+def run_benchmark(user, repeat=20, endpoints=ENDPOINTS, names=None):
+    cache.clear()
+    context = get_context(user)
+    return {
+        endpoint.name: measure_endpoint(context, endpoint, repeat)
+        for endpoint in endpoints
+        if names is None or endpoint.name in names
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Сравнивает результаты с базовыми. Любой рост числа запросов считается регрессией,
+    время и память — только при росте больше чем на tolerance (доля)
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result['queries'] > expected['queries']:
+            regressions.append(f'{name}: запросов {result["queries"]} вместо {expected["queries"]}')
+        for metric in ('p50_ms', 'p95_ms', 'memory_kib'):
+            if result[metric] > expected[metric] * (1 + tolerance):
+                regressions.append(f'{name}: {metric} {result[metric]} при базовом {expected[metric]}')
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def time_per_item(func, items, repeat):
+    """Медианное время вызова func в микросекундах на один элемент"""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    return round(statistics.median(durations) / max(items, 1) * 1_000_000, 3)
+
+
+def measure_serialization(serializer_class, queryset, repeat=20):
+    """
+    Стоимость одной привычки в мкс для сериализатора serializer_class по моделям и для ValuesSerializer
+    по строкам .values(): чтение из БД, сериализация и рендеринг в JSON по отдельности.
+    identical показывает, что оба способа дают одинаковый JSON
+    """
+    values_serializer = ValuesSerializer(serializer_class)
+    renderer = JSONRenderer()
+    instances = list(queryset)
+    rows = list(queryset.values(*values_serializer.fields))
+    model_data = serializer_class(instances, many=True).data
+    values_data = values_serializer.to_representation(rows)
+
+    return {
+        'items': len(instances),
+        'identical': renderer.render(model_data) == renderer.render(values_data),
+        'model': {
+            'fetch_us': time_per_item(lambda: list(queryset.all()), len(instances), repeat),
+            'serialize_us': time_per_item(lambda: serializer_class(instances, many=True).data, len(instances), repeat),
+            'render_us': time_per_item(lambda: renderer.render(model_data), len(instances), repeat),
+        },
+        'values': {
+            'fetch_us': time_per_item(lambda: list(queryset.values(*values_serializer.fields)), len(rows), repeat),
+            'serialize_us': time_per_item(lambda: values_serializer.to_representation(rows), len(rows), repeat),
+            'render_us': time_per_item(lambda: renderer.render(values_data), len(rows), repeat),
+        },
+    }
+
+
+def measure_renderers(client, page_sizes, repeat=50):
+    """
+    Время рендеринга и разбора одной страницы /habit/public_list/ в мкс для JSONRenderer/JSONParser DRF
+    и для ORJSONRenderer/ORJSONParser. identical показывает, что рендереры дают одинаковые байты
+    """
+    results = {}
+    for page_size in page_sizes:
+        data = client.get('/habit/public_list/', {'page_size': page_size}).data
+        content = JSONRenderer().render(data)
+        items = len(data['results'])
+        results[page_size] = {
+            'items': items,
+            'bytes': len(content),
+            'identical': ORJSONRenderer().render(data) == content,
+        }
+        for name, renderer, parser in (('drf', JSONRenderer(), JSONParser()),
+                                       ('orjson', ORJSONRenderer(), ORJSONParser())):
+            results[page_size][name] = {
+                'render_us': time_per_item(lambda: renderer.render(data), 1, repeat),
+                'parse_us': time_per_item(lambda: parser.parse(io.BytesIO(content)), 1, repeat),
+            }
+    return results
+
+
+def seed_completions(start_date, first_day, last_day):
+    """
+    Добавляет каждой привычке выполнения за дни [first_day, last_day) от start_date одним INSERT ... SELECT.
+    Каждый десятый день пропускается, чтобы серии прерывались. Возвращает число добавленных выполнений
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            INSERT INTO {HabitCompletion._meta.db_table} (habit_id, completed_on, created_at)
+            SELECT habit.id, %s::date + day, now()
+            FROM {Habit._meta.db_table} habit CROSS JOIN generate_series(%s, %s) AS day
+            WHERE (habit.id + day) %% 10 <> 0
+            ''',
+            [start_date, first_day, last_day - 1],
+        )
+        return cursor.rowcount
+
+
+def get_stats_from_history(user, today):
+    """Статистика пользователя, вычисленная по всей истории выполнений, для сравнения с get_user_stats"""
+    periodicity = dict(Habit.objects.filter(user=user).values_list('pk', 'periodicity'))
+    dates = {habit_id: [] for habit_id in periodicity}
+    completions = HabitCompletion.objects.filter(habit__user=user).order_by('habit_id', 'completed_on')
+    for habit_id, completed_on in completions.values_list('habit_id', 'completed_on'):
+        dates[habit_id].append(completed_on)
+    return {habit_id: compute_stats(dates[habit_id], periodicity[habit_id]) for habit_id in periodicity}
+
+
+def measure_completions(user, today, repeat=20):
+    """
+    Время в мс: статистики пользователя по строкам HabitStats, той же статистики по всей истории
+    и отметки о выполнении позже последнего. history — число выполнений привычек пользователя.
+    Сгенерированная история должна заканчиваться раньше чем за repeat + 1 день до today
+    """
+    # Отметки ставятся новой привычке за последние дни, чтобы не пересекаться со сгенерированной историей
+    habit = Habit.objects.create(user=user, action='Benchmark completions', lead_time=10)
+    completed_on = today - datetime.timedelta(days=repeat + 1)
+
+    def append():
+        nonlocal completed_on
+        completed_on += datetime.timedelta(days=1)
+        record_completion(habit, completed_on)
+
+    return {
+        'history': HabitCompletion.objects.filter(habit__user=user).count(),
+        'stats_ms': round(time_per_item(lambda: get_user_stats(user, today), 1, repeat) / 1000, 3),
+        'from_history_ms': round(time_per_item(lambda: get_stats_from_history(user, today), 1, repeat) / 1000, 3),
+        'append_ms': round(time_per_item(append, 1, repeat) / 1000, 3),
+    }
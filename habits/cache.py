@@ -0,0 +1,92 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+PUBLIC_HABITS_VERSION_KEY = 'habits:public:version'
+USER_HABITS_VERSION_KEY = 'habits:user:{user_id}:version'
+
+
+def get_version(key):
+    """
+    Текущая версия кэшируемых данных.
+    Если версия пропала из кэша, новая берется из текущего времени, чтобы не совпасть со старыми ключами
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(key):
+    """То же, что get_version, через асинхронный API кэша"""
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def incr_versions(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_versions(keys):
+    """
+    Увеличивает версии, сбрасывая закэшированные под ними данные.
+    Внутри транзакции версии увеличиваются еще раз после ее фиксации: данные, прочитанные до фиксации,
+    успевают сохраниться только под промежуточной версией и не будут отданы
+    """
+    incr_versions(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: incr_versions(keys))
+
+
+def get_public_habits_version():
+    """Текущая версия ленты публичных привычек"""
+    return get_version(PUBLIC_HABITS_VERSION_KEY)
+
+
+def invalidate_public_habits():
+    """Сбрасывает кэш ленты публичных привычек, увеличивая ее версию"""
+    bump_versions([PUBLIC_HABITS_VERSION_KEY])
+
+
+def get_public_habits_cache_key(request):
+    """
+    Ключ страницы ленты публичных привычек.
+    Ключ нужно вычислить один раз до запроса к БД, тогда данные, прочитанные до изменения ленты,
+    сохранятся под старой версией и не будут отданы
+    """
+    return f'habits:public:{get_public_habits_version()}:{request.get_full_path()}'
+
+
+async def aget_public_habits_cache_key(request):
+    return f'habits:public:{await aget_version(PUBLIC_HABITS_VERSION_KEY)}:{request.get_full_path()}'
+
+
+def get_user_habits_version(user_id):
+    """Текущая версия списка привычек пользователя"""
+    return get_version(USER_HABITS_VERSION_KEY.format(user_id=user_id))
+
+
+def invalidate_user_habits(*user_ids):
+    """Сбрасывает кэш списков привычек пользователей, увеличивая их версии"""
+    bump_versions([USER_HABITS_VERSION_KEY.format(user_id=user_id) for user_id in set(user_ids) if user_id is not None])
+
+
+def get_user_habits_cache_key(request):
+    """Ключ страницы списка привычек пользователя, вычисляется так же один раз до запроса к БД"""
+    user_id = request.user.pk
+    return f'habits:user:{user_id}:{get_user_habits_version(user_id)}:{request.get_full_path()}'
+
+
+async def aget_user_habits_cache_key(request):
+    user_id = request.user.pk
+    version = await aget_version(USER_HABITS_VERSION_KEY.format(user_id=user_id))
+    return f'habits:user:{user_id}:{version}:{request.get_full_path()}'
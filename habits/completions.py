@@ -0,0 +1,142 @@
+from django.db import transaction
+from django.utils import timezone
+
+from habits.models import Habit, HabitCompletion, HabitStats
+
+REBUILD_CHUNK_SIZE = 10000
+
+STATS_FIELDS = ('total_completions', 'current_streak', 'longest_streak', 'first_completed_on', 'last_completed_on')
+
+
+def compute_stats(dates, periodicity):
+    """
+    Статистика по датам выполнения привычки в порядке возрастания: число выполнений, текущая и самая длинная серия.
+    Выполнения входят в одну серию, если между ними прошло не больше periodicity дней
+    """
+    stats = dict.fromkeys(STATS_FIELDS, 0)
+    stats['first_completed_on'] = stats['last_completed_on'] = None
+    for completed_on in dates:
+        append_completion(stats, completed_on, periodicity)
+    return stats
+
+
+def append_completion(stats, completed_on, periodicity):
+    """Учитывает в словаре статистики выполнение позже последнего"""
+    last_completed_on = stats['last_completed_on']
+    if last_completed_on is not None and (completed_on - last_completed_on).days <= periodicity:
+        stats['current_streak'] += 1
+    else:
+        stats['current_streak'] = 1
+    stats['longest_streak'] = max(stats['longest_streak'], stats['current_streak'])
+    stats['total_completions'] += 1
+    if stats['first_completed_on'] is None:
+        stats['first_completed_on'] = completed_on
+    stats['last_completed_on'] = completed_on
+
+
+def record_completion(habit, completed_on):
+    """
+    Отмечает выполнение привычки за день и обновляет ее статистику.
+    Выполнение позже последнего учитывается за O(1); отметка задним числом пересчитывает статистику
+    по истории привычки. Строка статистики блокируется, поэтому одновременные отметки не теряются.
+    Возвращает (stats, created), created равен False, если выполнение за этот день уже отмечено
+    """
+    with transaction.atomic():
+        stats, _ = HabitStats.objects.select_for_update().get_or_create(habit=habit)
+        # Отметки привычки выполняются по очереди под блокировкой строки статистики
+        if HabitCompletion.objects.filter(habit=habit, completed_on=completed_on).exists():
+            return stats, False
+        HabitCompletion.objects.create(habit=habit, completed_on=completed_on)
+
+        values = {name: getattr(stats, name) for name in STATS_FIELDS}
+        if stats.last_completed_on is None or completed_on > stats.last_completed_on:
+            append_completion(values, completed_on, habit.periodicity)
+        else:
+            dates = HabitCompletion.objects.filter(habit=habit).order_by('completed_on').values_list(
+                'completed_on', flat=True,
+            )
+            values = compute_stats(dates, habit.periodicity)
+        for name, value in values.items():
+            setattr(stats, name, value)
+        stats.save()
+    return stats, True
+
+
+def rebuild_habit_stats(habit_ids=None):
+    """
+    Пересчитывает статистику привычек по истории выполнений, например после смены периодичности.
+    habit_ids — id привычек, по умолчанию все привычки. История читается одним запросом в порядке привычек и дат,
+    статистика сохраняется пачками. Возвращает число пересчитанных привычек
+    """
+    habits = Habit.objects.all()
+    completions = HabitCompletion.objects.order_by('habit_id', 'completed_on').values_list('habit_id', 'completed_on')
+    if habit_ids is not None:
+        habit_ids = list(habit_ids)
+        habits = habits.filter(pk__in=habit_ids)
+        completions = completions.filter(habit_id__in=habit_ids)
+    periodicity = dict(habits.values_list('pk', 'periodicity'))
+    if not periodicity:
+        return 0
+
+    computed = {}
+    for habit_id, completed_on in completions.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+        if habit_id not in periodicity:
+            continue
+        stats = computed.get(habit_id)
+        if stats is None:
+            stats = computed[habit_id] = compute_stats((), periodicity[habit_id])
+        append_completion(stats, completed_on, periodicity[habit_id])
+
+    with transaction.atomic():
+        HabitStats.objects.bulk_create(
+            (
+                HabitStats(habit_id=habit_id, **computed.get(habit_id) or compute_stats((), periodicity[habit_id]))
+                for habit_id in periodicity
+            ),
+            batch_size=REBUILD_CHUNK_SIZE,
+            update_conflicts=True,
+            unique_fields=['habit'],
+            update_fields=STATS_FIELDS,
+        )
+    return len(periodicity)
+
+
+def get_user_stats(user, today=None):
+    """
+    Статистика выполнения привычек пользователя одним запросом к строкам HabitStats,
+    поэтому время ответа не зависит от длины истории.
+    Серия считается текущей, если с последнего выполнения прошло не больше периодичности привычки.
+    Доля выполнения — выполнения к числу периодов с первого выполнения
+    """
+    today = today or timezone.localdate()
+    rows = Habit.objects.filter(user=user).order_by('id').values(
+        'id', 'action', 'periodicity', *(f'stats__{name}' for name in STATS_FIELDS),
+    )
+
+    habits = []
+    for row in rows:
+        total = row['stats__total_completions'] or 0
+        first_completed_on = row['stats__first_completed_on']
+        last_completed_on = row['stats__last_completed_on']
+        is_active = last_completed_on is not None and (today - last_completed_on).days <= row['periodicity']
+        if first_completed_on is not None:
+            periods = max((today - first_completed_on).days, 0) // max(row['periodicity'], 1) + 1
+            adherence = round(min(total / periods, 1), 3)
+        else:
+            adherence = 0.0
+        habits.append({
+            'habit': row['id'],
+            'action': row['action'],
+            'total_completions': total,
+            'current_streak': row['stats__current_streak'] if is_active else 0,
+            'longest_streak': row['stats__longest_streak'] or 0,
+            'last_completed_on': last_completed_on,
+            'adherence': adherence,
+        })
+
+    return {
+        'total_completions': sum(habit['total_completions'] for habit in habits),
+        'active_streaks': sum(1 for habit in habits if habit['current_streak']),
+        'longest_streak': max((habit['longest_streak'] for habit in habits), default=0),
+        'habits': habits,
+    }
@@ -0,0 +1,35 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы для представлений DRF.
+    ETag и Last-Modified вычисляются по версии данных до сериализации ответа: если клиент прислал
+    совпадающий If-None-Match или If-Modified-Since, тело не формируется и возвращается 304
+    """
+    etag = None
+    last_modified = None
+
+    @staticmethod
+    def make_etag(request, *parts):
+        """ETag из версии данных, адреса запроса с параметрами и формата ответа"""
+        value = '\n'.join(str(part) for part in (request.get_full_path(), request.accepted_renderer.format, *parts))
+        return hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+
+    def get_not_modified_response(self, request, etag=None, last_modified=None):
+        """Ответ 304, если данные у клиента не устарели, иначе None"""
+        self.etag = quote_etag(etag) if etag is not None else None
+        self.last_modified = int(last_modified.timestamp()) if last_modified is not None else None
+        return get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code in (200, 304):
+            if self.etag is not None:
+                response.headers.setdefault('ETag', self.etag)
+            if self.last_modified is not None:
+                response.headers.setdefault('Last-Modified', http_date(self.last_modified))
+        return response
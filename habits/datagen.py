@@ -0,0 +1,156 @@
+import datetime
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+
+from habits.models import Habit
+from habits.summary import get_bucket, update_summary
+from users.models import User
+
+EMAIL_TEMPLATE = 'load_{index}@example.com'
+
+# Распределения по наблюдаемым привычкам: большинство выполняется ежедневно утром или вечером
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 6, 12, 12, 8, 5, 4, 5, 4, 3, 3, 4, 6, 9, 10, 10, 8, 5, 2]
+PERIODICITY_WEIGHTS = {1: 60, 2: 8, 3: 8, 4: 3, 5: 3, 6: 2, 7: 16}
+LEAD_TIME_WEIGHTS = {1: 5, 2: 15, 5: 25, 10: 20, 15: 15, 30: 10, 60: 7, 120: 3}
+PLACES = ['Дом', 'Работа', 'Спортзал', 'Парк', 'Кухня', 'Офис', 'Улица']
+PLEASURABLE_ACTIONS = ['Выпить кофе', 'Посмотреть сериал', 'Съесть десерт', 'Принять ванну', 'Поиграть в игру']
+USEFUL_ACTIONS = ['Сделать зарядку', 'Прочитать 10 страниц', 'Пробежать 3 км', 'Выучить 10 слов', 'Медитировать',
+                  'Выпить стакан воды', 'Разобрать почту', 'Позвонить родителям']
+REWARDS = ['Кусочек шоколада', 'Серия любимого сериала', 'Прогулка', '15 минут соцсетей']
+
+
+@dataclass
+class GeneratedData:
+    first_index: int
+    users: int
+    habits: int
+    public: int
+    pleasurable: int
+    associated: int
+    seconds: float
+
+
+def distribute_habits(rng, users, habits):
+    """
+    Число привычек каждого пользователя. Распределение с тяжелым хвостом: у большинства
+    несколько привычек, у немногих — сотни
+    """
+    weights = [rng.paretovariate(1.2) for _ in range(users)]
+    counts = Counter(rng.choices(range(users), weights=weights, k=habits))
+    return [counts[index] for index in range(users)]
+
+
+def make_time(rng):
+    """Время напоминания: пики утром и вечером, обычно кратно 15 минутам, у 10% привычек не задано"""
+    if rng.random() < 0.1:
+        return None
+    minute = rng.choice((0, 15, 30, 45)) if rng.random() < 0.8 else rng.randrange(60)
+    return datetime.time(rng.choices(range(24), weights=HOUR_WEIGHTS)[0], minute)
+
+
+def make_habits(rng, user, count, today):
+    """
+    Привычки одного пользователя: около 30% приятных, половина полезных связана с приятной привычкой
+    того же пользователя, часть остальных имеет вознаграждение. Возвращает (приятные, полезные)
+    """
+    pleasurable, useful = [], []
+    for _ in range(count):
+        habit = Habit(
+            user=user,
+            place=rng.choice(PLACES) if rng.random() < 0.8 else None,
+            time=make_time(rng),
+            periodicity=rng.choices(list(PERIODICITY_WEIGHTS), weights=list(PERIODICITY_WEIGHTS.values()))[0],
+            lead_time=rng.choices(list(LEAD_TIME_WEIGHTS), weights=list(LEAD_TIME_WEIGHTS.values()))[0],
+            is_public=rng.random() < 0.2,
+            date_of_next_reminder_sending=today + datetime.timedelta(days=rng.randrange(7))
+            if rng.random() < 0.7 else None,
+        )
+        if rng.random() < 0.3:
+            habit.is_pleasurable = True
+            habit.action = rng.choice(PLEASURABLE_ACTIONS)
+            pleasurable.append(habit)
+        else:
+            habit.action = rng.choice(USEFUL_ACTIONS)
+            useful.append(habit)
+
+    for habit in useful:
+        if pleasurable and rng.random() < 0.5:
+            habit.associated_habit = rng.choice(pleasurable)
+        elif rng.random() < 0.5:
+            habit.reward = rng.choice(REWARDS)
+    return pleasurable, useful
+
+
+def save_habits(pleasurable, useful):
+    """Сохраняет пачку привычек: сначала приятные, чтобы полезные получили id связанных, затем полезные"""
+    with transaction.atomic():
+        Habit.objects.bulk_create(pleasurable)
+        Habit.objects.bulk_create(useful)
+        update_summary(added=[get_bucket(habit) for habit in pleasurable + useful])
+
+
+def generate_data(users, habits, password, seed=0, batch_size=5000, on_batch=None):
+    """
+    Создает users пользователей с почтами по EMAIL_TEMPLATE и общим паролем и habits привычек
+    с реалистичными распределениями времени, периодичности, публичности и связанных привычек.
+    Данные сохраняются bulk_create пачками примерно по batch_size привычек, сводка по привычкам обновляется.
+    on_batch(habits_created) вызывается после каждой пачки
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    today = datetime.date.today()
+    # Номера почт продолжаются после последнего пользователя, поэтому генерацию можно запускать повторно
+    first_index = (User.objects.aggregate(last_id=Max('pk'))['last_id'] or 0) + 1
+    password_hash = make_password(password)
+
+    created_users = []
+    for start in range(0, users, batch_size):
+        created_users += User.objects.bulk_create(
+            User(
+                email=EMAIL_TEMPLATE.format(index=first_index + index),
+                password=password_hash,
+                telegram_chat_id=str(first_index + index) if rng.random() < 0.4 else None,
+            )
+            for index in range(start, min(start + batch_size, users))
+        )
+
+    stats = Counter()
+    pleasurable, useful = [], []
+    for user, count in zip(created_users, distribute_habits(rng, users, habits)):
+        user_pleasurable, user_useful = make_habits(rng, user, count, today)
+        pleasurable += user_pleasurable
+        useful += user_useful
+        if len(pleasurable) + len(useful) >= batch_size:
+            save_habits(pleasurable, useful)
+            stats.update(count_generated(pleasurable + useful))
+            if on_batch is not None:
+                on_batch(stats['habits'])
+            pleasurable, useful = [], []
+    if pleasurable or useful:
+        save_habits(pleasurable, useful)
+        stats.update(count_generated(pleasurable + useful))
+
+    return GeneratedData(
+        first_index=first_index,
+        users=len(created_users),
+        habits=stats['habits'],
+        public=stats['public'],
+        pleasurable=stats['pleasurable'],
+        associated=stats['associated'],
+        seconds=time.perf_counter() - started,
+    )
+
+
+def count_generated(habits):
+    return Counter(
+        habits=len(habits),
+        public=sum(habit.is_public for habit in habits),
+        pleasurable=sum(habit.is_pleasurable for habit in habits),
+        associated=sum(habit.associated_habit_id is not None for habit in habits),
+    )
@@ -0,0 +1,93 @@
+import csv
+
+import orjson
+
+from config.renderers import ORJSON_OPTIONS, ORJSONRenderer
+
+
+class Echo:
+    """Буфер для csv.writer, который возвращает записанную строку вместо сохранения"""
+
+    def write(self, value):
+        return value
+
+
+class HabitExport:
+    """
+    Выгрузка строк queryset.values() частями по chunk_size строк.
+    Строки читаются серверным курсором (iterator/aiterator), преобразуются ValuesSerializer
+    и отдаются по одной части, поэтому память не зависит от числа строк.
+    Поддерживает обычную и асинхронную итерацию: под WSGI StreamingHttpResponse передается iter(export),
+    под ASGI — aiter(export), иначе Django прочитает всю выгрузку в память до отправки
+    """
+    content_type = None
+    extension = None
+
+    def __init__(self, queryset, values_serializer, chunk_size, first_chunk_size=None):
+        self.queryset = queryset
+        self.values_serializer = values_serializer
+        self.chunk_size = chunk_size
+        self.first_chunk_size = min(first_chunk_size or chunk_size, chunk_size)
+
+    def get_header(self):
+        return b''
+
+    def format(self, data):
+        raise NotImplementedError
+
+    def __iter__(self):
+        # Заголовок отдается до запроса к БД, а первая часть меньше остальных, чтобы первый байт ушел сразу
+        header = self.get_header()
+        if header:
+            yield header
+        chunk, size = [], self.first_chunk_size
+        for row in self.queryset.iterator(chunk_size=self.chunk_size):
+            chunk.append(row)
+            if len(chunk) == size:
+                yield self.format(self.values_serializer.to_representation(chunk))
+                chunk, size = [], self.chunk_size
+        if chunk:
+            yield self.format(self.values_serializer.to_representation(chunk))
+
+    async def __aiter__(self):
+        header = self.get_header()
+        if header:
+            yield header
+        chunk, size = [], self.first_chunk_size
+        async for row in self.queryset.aiterator(chunk_size=self.chunk_size):
+            chunk.append(row)
+            if len(chunk) == size:
+                yield self.format(self.values_serializer.to_representation(chunk))
+                chunk, size = [], self.chunk_size
+        if chunk:
+            yield self.format(self.values_serializer.to_representation(chunk))
+
+
+class NDJSONHabitExport(HabitExport):
+    """Выгрузка в NDJSON: одна привычка в формате HabitSerializer на строку"""
+    content_type = 'application/x-ndjson'
+    extension = 'ndjson'
+
+    def format(self, data):
+        default = ORJSONRenderer.encoder.default
+        return b''.join(orjson.dumps(item, default=default, option=ORJSON_OPTIONS) + b'\n' for item in data)
+
+
+class CSVHabitExport(HabitExport):
+    """Выгрузка в CSV с заголовком из имен полей HabitSerializer"""
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writer = csv.writer(Echo())
+        self.names = [name for name, _, _ in self.values_serializer.mapping]
+
+    def get_header(self):
+        return self.writer.writerow(self.names).encode()
+
+    def format(self, data):
+        return ''.join(self.writer.writerow([item[name] for name in self.names]) for item in data).encode()
+
+
+EXPORT_FORMATS = {export_class.extension: export_class for export_class in (NDJSONHabitExport, CSVHabitExport)}
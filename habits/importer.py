@@ -0,0 +1,161 @@
+import csv
+import io
+import json
+import time
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from habits.cache import invalidate_public_habits, invalidate_user_habits
+from habits.models import Habit
+from habits.serializers import get_related_pks, HabitSerializer
+from habits.services import chunked
+from habits.summary import get_bucket, update_summary
+
+IMPORT_CHUNK_SIZE = 1000
+
+# Ошибки сохраняются для первых строк, остальные только считаются
+MAX_REPORTED_ERRORS = 1000
+
+JSON_READ_SIZE = 64 * 1024
+# Объект привычки намного короче: более длинный незаконченный объект считается ошибкой JSON
+JSON_MAX_OBJECT_SIZE = 1024 * 1024
+
+
+class ImportFormatError(ValueError):
+    """Файл выгрузки не удалось разобрать"""
+
+
+@dataclass
+class ImportReport:
+    """Итог импорта: число строк, созданных привычек, строк с ошибками и ошибки по номерам строк"""
+    rows: int = 0
+    created: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds, 1) if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'failed': self.failed,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': self.rows_per_second,
+            'errors': self.errors,
+        }
+
+
+def read_csv_rows(file):
+    """
+    Строки CSV с заголовком из имен полей HabitSerializer по одной, без чтения файла целиком.
+    Пустые значения считаются не переданными
+    """
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    try:
+        for row in reader:
+            yield {name: value for name, value in row.items() if name and value not in ('', None)}
+    except (csv.Error, UnicodeDecodeError) as exc:
+        raise ImportFormatError(f'Ошибка CSV в строке {reader.line_num}: {exc}')
+
+
+def read_json_rows(file, read_size=JSON_READ_SIZE, max_object_size=JSON_MAX_OBJECT_SIZE):
+    """
+    Объекты из JSON-массива или NDJSON по одному. Файл читается частями по read_size символов,
+    каждый объект разбирается, как только прочитан целиком. Если объект не разобран и после
+    max_object_size символов, это ошибка JSON, и остаток файла не читается
+    """
+    decoder = json.JSONDecoder()
+    text = io.TextIOWrapper(file, encoding='utf-8-sig')
+    buffer, position, eof = '', 0, False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            position += 1
+        if position == len(buffer):
+            if eof:
+                return
+            buffer, position = text.read(read_size), 0
+            eof = not buffer
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as exc:
+            if eof or len(buffer) - position >= max_object_size:
+                raise ImportFormatError(f'Ошибка JSON: {exc}')
+            # Объект прочитан не до конца
+            chunk = text.read(read_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        except UnicodeDecodeError as exc:
+            raise ImportFormatError(f'Ошибка JSON: {exc}')
+        yield value
+        position = end
+
+
+IMPORT_READERS = {
+    'csv': read_csv_rows,
+    'json': read_json_rows,
+}
+
+
+def validate_chunk(user, chunk, first_row, report):
+    """
+    Проверяет часть строк правилами HabitSerializer. Связанные привычки пользователя загружаются
+    одним запросом на всю часть. Возвращает проверенные данные, ошибки добавляет в report
+    """
+    associated_pks = get_related_pks(Habit, (data.get('associated_habit') for data in chunk if isinstance(data, dict)))
+    prefetched = Habit.objects.filter(user=user).in_bulk(associated_pks) if associated_pks else {}
+    child = HabitSerializer(many=True, context={'prefetched': {'associated_habit': prefetched}, 'user': user}).child
+
+    validated = []
+    for row, data in enumerate(chunk, start=first_row):
+        try:
+            if not isinstance(data, dict):
+                raise ValidationError({'non_field_errors': ['Ожидался объект с полями привычки']})
+            validated.append(child.run_validation(data))
+        except ValidationError as exc:
+            report.failed += 1
+            if len(report.errors) < MAX_REPORTED_ERRORS:
+                report.errors.append({'row': row, 'errors': exc.detail})
+    return validated
+
+
+def import_habits(user, rows, chunk_size=IMPORT_CHUNK_SIZE, on_chunk=None):
+    """
+    Импорт привычек пользователя из потока строк (словарей полей HabitSerializer).
+    Строки проверяются и сохраняются частями по chunk_size: один запрос за связанными привычками,
+    один bulk_create и обновление сводки в транзакции на часть. Строки с ошибками пропускаются
+    и попадают в отчет с номером строки, начиная с 1. on_chunk(report) вызывается после каждой части.
+    Ошибка разбора файла (ImportFormatError) прерывает импорт, уже сохраненные части остаются
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    has_public = False
+    try:
+        for chunk in chunked(rows, chunk_size):
+            validated = validate_chunk(user, chunk, report.rows + 1, report)
+            habits = [Habit(user=user, **validated_data) for validated_data in validated]
+            with transaction.atomic():
+                Habit.objects.bulk_create(habits)
+                update_summary(added=[get_bucket(habit) for habit in habits])
+
+            has_public = has_public or any(habit.is_public for habit in habits)
+            report.rows += len(chunk)
+            report.created += len(habits)
+            report.seconds = time.perf_counter() - started
+            if on_chunk is not None:
+                on_chunk(report)
+    finally:
+        if report.created:
+            invalidate_user_habits(user.pk)
+            if has_public:
+                invalidate_public_habits()
+        report.seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,192 @@
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from habits.benchmark import percentile
+from habits.datagen import PLACES
+
+# Пары маршрутов для сравнения: синхронное представление и его асинхронная версия
+SYNC_ASYNC_PATHS = [
+    ('/habit/{habit_id}/', '/habit/async/{habit_id}/'),
+    ('/habit/list/', '/habit/async/list/'),
+    ('/habit/public_list/', '/habit/async/public_list/'),
+]
+
+
+@dataclass
+class LoadTestResult:
+    """Итог нагрузки на один маршрут или сценарий"""
+    path: str
+    concurrency: int
+    requests: int
+    errors: int
+    seconds: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+    @property
+    def rps(self):
+        return self.requests / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class VirtualUser:
+    """Пользователь, от имени которого выполняются запросы, и id его привычек"""
+    token: str
+    habit_ids: list = field(default_factory=list)
+
+
+@dataclass
+class Scenario:
+    """
+    Вид запроса в смеси нагрузки. prepare(user, rng) возвращает (method, path, json),
+    weight — относительная частота запроса в смеси
+    """
+    key: str
+    name: str
+    weight: int
+    prepare: object
+
+
+def choose_habit(user, rng):
+    return rng.choice(user.habit_ids)
+
+
+# Смесь запросов, близкая к работе приложения: в основном чтение, немного изменений и отметок о выполнении
+DEFAULT_SCENARIOS = [
+    Scenario('list', 'GET /habit/list/', 30, lambda user, rng: ('get', '/habit/list/', None)),
+    Scenario('get', 'GET /habit/<id>/', 20, lambda user, rng: ('get', f'/habit/{choose_habit(user, rng)}/', None)),
+    Scenario('public_list', 'GET /habit/public_list/', 15, lambda user, rng: ('get', '/habit/public_list/', None)),
+    Scenario('sync', 'GET /habit/sync/', 5, lambda user, rng: ('get', '/habit/sync/', None)),
+    Scenario('stats', 'GET /habit/stats/', 5, lambda user, rng: ('get', '/habit/stats/', None)),
+    Scenario('summary', 'GET /habit/summary/', 5, lambda user, rng: ('get', '/habit/summary/', None)),
+    Scenario('create', 'POST /habit/create/', 5, lambda user, rng: (
+        'post', '/habit/create/', {'action': 'Load habit', 'time': '08:00:00', 'periodicity': 1, 'lead_time': 10}
+    )),
+    Scenario('update', 'PATCH /habit/<id>/update/', 5, lambda user, rng: (
+        'patch', f'/habit/{choose_habit(user, rng)}/update/', {'place': rng.choice(PLACES)}
+    )),
+    Scenario('complete', 'POST /habit/<id>/complete/', 10, lambda user, rng: (
+        'post', f'/habit/{choose_habit(user, rng)}/complete/', {}
+    )),
+]
+
+
+def get_access_token(base_url, email, password, timeout=10):
+    response = requests.post(f'{base_url}/users/token/', json={'email': email, 'password': password},
+                             timeout=timeout)
+    response.raise_for_status()
+    return response.json()['access']
+
+
+def login_users(base_url, emails, password, timeout=10, max_habits=100):
+    """
+    Получает токены пользователей и id их привычек (до max_habits). Пользователи,
+    которые не смогли войти или у которых нет привычек, пропускаются
+    """
+    users = []
+    for email in emails:
+        try:
+            token = get_access_token(base_url, email, password, timeout)
+        except requests.HTTPError:
+            continue
+        response = requests.get(f'{base_url}/habit/list/', params={'page_size': max_habits},
+                                headers={'Authorization': f'Bearer {token}'}, timeout=timeout)
+        response.raise_for_status()
+        habit_ids = [habit['id'] for habit in response.json()['results']]
+        if habit_ids:
+            users.append(VirtualUser(token=token, habit_ids=habit_ids))
+    return users
+
+
+def make_result(name, concurrency, latencies, errors, seconds):
+    return LoadTestResult(
+        path=name,
+        concurrency=concurrency,
+        requests=len(latencies),
+        errors=errors,
+        seconds=seconds,
+        p50_ms=round(statistics.median(latencies), 2) if latencies else 0.0,
+        p95_ms=round(percentile(latencies, 95), 2) if latencies else 0.0,
+        p99_ms=round(percentile(latencies, 99), 2) if latencies else 0.0,
+    )
+
+
+def run_scenarios(base_url, users, scenarios, concurrency=10, duration=10.0, timeout=10, headers=None, seed=0):
+    """
+    Нагружает сервер смесью запросов scenarios в concurrency потоков в течение duration секунд.
+    Поток i выполняет запросы от имени users[i % len(users)] и каждый раз выбирает сценарий случайно по весам.
+    Каждый поток держит свое keep-alive соединение; ошибкой считается исключение или статус 400 и выше.
+    Возвращает (результаты по сценариям в порядке scenarios, общий результат)
+    """
+    weights = [scenario.weight for scenario in scenarios]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        user = users[index % len(users)]
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        request_headers = {'Authorization': f'Bearer {user.token}', **(headers or {})}
+        worker_latencies, worker_errors = defaultdict(list), defaultdict(int)
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(scenarios, weights=weights)[0]
+            method, path, data = scenario.prepare(user, rng)
+            started = time.perf_counter()
+            try:
+                response = session.request(method, f'{base_url}{path}', json=data, headers=request_headers,
+                                           timeout=timeout)
+                failed = response.status_code >= 400
+            except requests.RequestException:
+                failed = True
+            worker_latencies[scenario.name].append((time.perf_counter() - started) * 1000)
+            worker_errors[scenario.name] += failed
+        session.close()
+        with lock:
+            for name, values in worker_latencies.items():
+                latencies[name].extend(values)
+                errors[name] += worker_errors[name]
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    results = [
+        make_result(scenario.name, concurrency, latencies[scenario.name], errors[scenario.name], seconds)
+        for scenario in scenarios
+    ]
+    total = make_result('всего', concurrency, [value for values in latencies.values() for value in values],
+                        sum(errors.values()), seconds)
+    return results, total
+
+
+def run_load(base_url, path, token, concurrency=10, duration=10.0, timeout=10, headers=None):
+    """Нагружает GET-запросами маршрут path в concurrency потоков в течение duration секунд"""
+    scenario = Scenario(path, path, 1, lambda user, rng: ('get', path, None))
+    results, _ = run_scenarios(base_url, [VirtualUser(token)], [scenario], concurrency, duration, timeout, headers)
+    return results[0]
+
+
+def compare_sync_async(base_url, token, habit_id, concurrency=10, duration=10.0, pairs=SYNC_ASYNC_PATHS):
+    """Нагружает по очереди синхронный и асинхронный маршрут каждой пары. Возвращает список пар результатов"""
+    results = []
+    for sync_path, async_path in pairs:
+        results.append(tuple(
+            run_load(base_url, path.format(habit_id=habit_id), token, concurrency, duration)
+            for path in (sync_path, async_path)
+        ))
+    return results
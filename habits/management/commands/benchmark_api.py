@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from habits.benchmark import compare, get_missing_endpoints, load_baseline, run_benchmark, save_baseline, seed, \
+    test_database
+
+
+class Command(BaseCommand):
+    """
+    Команда для замера количества запросов к БД, времени ответа и памяти для всех маршрутов habits и users.
+    Результаты сравниваются с сохраненными базовыми
+    """
+    help = 'Замер производительности API на сгенерированных данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Количество пользователей')
+        parser.add_argument('--habits', type=int, default=10000, help='Количество привычек')
+        parser.add_argument('--repeat', type=int, default=20, help='Количество замеров для каждого маршрута')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Имя маршрута для замера, можно указать несколько раз')
+        parser.add_argument('--baseline', default=settings.BASE_DIR / 'benchmarks' / 'api_baseline.json',
+                            help='Файл с базовыми результатами')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Допустимый рост времени ответа и памяти относительно базовых, доля')
+        parser.add_argument('--update-baseline', action='store_true', help='Сохранить результаты как базовые')
+
+    def handle(self, *args, **options):
+        missing = get_missing_endpoints()
+        if missing:
+            raise CommandError(f'Нет сценариев замера для маршрутов: {", ".join(missing)}')
+
+        with test_database():
+            started = time.perf_counter()
+            user = seed(options['users'], options['habits'])
+            self.stdout.write(f'Созданы данные: пользователей {options["users"]}, привычек {options["habits"]} '
+                              f'за {time.perf_counter() - started:.1f} с')
+            results = run_benchmark(user, repeat=options['repeat'], names=options['endpoints'])
+
+        self.stdout.write(f'{"маршрут":<34}{"запросов":>10}{"p50, мс":>10}{"p95, мс":>10}{"память, КиБ":>14}')
+        for name, result in results.items():
+            self.stdout.write(f'{name:<34}{result["queries"]:>10}{result["p50_ms"]:>10.2f}'
+                              f'{result["p95_ms"]:>10.2f}{result["memory_kib"]:>14.1f}')
+
+        if options['update_baseline']:
+            save_baseline(options['baseline'], {**load_baseline(options['baseline']), **results})
+            self.stdout.write(self.style.SUCCESS(f'Базовые результаты сохранены в {options["baseline"]}'))
+            return
+
+        regressions = compare(results, load_baseline(options['baseline']), options['tolerance'])
+        if regressions:
+            raise CommandError('Регрессии относительно базовых результатов:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,54 @@
+import datetime
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection
+
+from habits.benchmark import measure_completions, seed, seed_completions, test_database
+from habits.completions import rebuild_habit_stats
+from habits.models import Habit, HabitCompletion, HabitStats
+
+
+class Command(BaseCommand):
+    """
+    Команда для замера статистики выполнения привычек на истории до миллионов выполнений.
+    История наращивается шагами, на каждом шаге статистика пересчитывается целиком и замеряется
+    чтение статистики пользователя по строкам HabitStats и по всей истории
+    """
+    help = 'Замер статистики выполнения привычек на сгенерированной истории'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habits', type=int, default=10000, help='Количество привычек в базе')
+        parser.add_argument('--events', type=int, nargs='+', default=[100000, 1000000, 3000000],
+                            help='Размеры истории выполнений для замеров')
+        parser.add_argument('--repeat', type=int, default=20, help='Количество замеров')
+
+    def handle(self, *args, **options):
+        with test_database():
+            user = seed(100, options['habits'])
+            habits = Habit.objects.count()
+            days = [max(1, round(events / habits / 0.9)) for events in sorted(options['events'])]
+            today = datetime.date.today()
+            start_date = today - datetime.timedelta(days=days[-1] + options['repeat'] * 3)
+
+            self.stdout.write(f'{"выполнений":>12}{"заполнение, с":>16}{"пересчет, с":>14}{"у пользователя":>16}'
+                              f'{"статистика, мс":>17}{"по истории, мс":>17}{"отметка, мс":>14}')
+            total, first_day = 0, 0
+            for last_day in days:
+                started = time.perf_counter()
+                total += seed_completions(start_date, first_day, last_day)
+                seeded = time.perf_counter() - started
+                first_day = last_day
+
+                started = time.perf_counter()
+                rebuild_habit_stats()
+                rebuilt = time.perf_counter() - started
+
+                # Иначе замеры совпадают с автоочисткой после массовой вставки
+                with connection.cursor() as cursor:
+                    cursor.execute(f'VACUUM ANALYZE {HabitCompletion._meta.db_table}, {HabitStats._meta.db_table}')
+
+                result = measure_completions(user, today, options['repeat'])
+                self.stdout.write(f'{total:>12}{seeded:>16.1f}{rebuilt:>14.1f}{result["history"]:>16}'
+                                  f'{result["stats_ms"]:>17.3f}{result["from_history_ms"]:>17.3f}'
+                                  f'{result["append_ms"]:>14.3f}')
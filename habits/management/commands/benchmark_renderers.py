@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand
+
+from habits.benchmark import get_context, measure_renderers, seed, test_database
+
+
+class Command(BaseCommand):
+    """
+    Команда для сравнения JSON-рендерера и парсера DRF с вариантами на orjson
+    на страницах ленты публичных привычек
+    """
+    help = 'Замер рендеринга и разбора JSON на страницах /habit/public_list/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habits', type=int, default=10000, help='Количество привычек в базе')
+        parser.add_argument('--page-size', type=int, nargs='+', default=[5, 20, 50],
+                            help='Размеры страниц для замеров')
+        parser.add_argument('--repeat', type=int, default=200, help='Количество замеров')
+
+    def handle(self, *args, **options):
+        with test_database():
+            context = get_context(seed(100, options['habits']))
+            results = measure_renderers(context.client, options['page_size'], options['repeat'])
+
+        self.stdout.write(f'{"привычек":>10}{"байт":>10}{"способ":>10}{"рендеринг, мкс":>18}{"разбор, мкс":>14}')
+        for result in results.values():
+            if not result['identical']:
+                self.stderr.write(f'Страница из {result["items"]} привычек: ответы рендереров отличаются')
+            for way in ('drf', 'orjson'):
+                self.stdout.write(f'{result["items"]:>10}{result["bytes"]:>10}{way:>10}'
+                                  f'{result[way]["render_us"]:>18.2f}{result[way]["parse_us"]:>14.2f}')
@@ -0,0 +1,37 @@
+from django.core.management import BaseCommand
+
+from habits.benchmark import measure_serialization, seed, test_database
+from habits.models import Habit
+from habits.serializers import HabitPublicSerializer, HabitSerializer
+
+
+class Command(BaseCommand):
+    """
+    Команда для сравнения стоимости одной привычки в списках: сериализаторы DRF по моделям
+    против ValuesSerializer по строкам .values()
+    """
+    help = 'Замер сериализации списков привычек на сгенерированных данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habits', type=int, default=10000, help='Количество привычек в базе')
+        parser.add_argument('--page-size', type=int, nargs='+', default=[5, 50, 1000],
+                            help='Размеры страниц для замеров')
+        parser.add_argument('--repeat', type=int, default=50, help='Количество замеров')
+
+    def handle(self, *args, **options):
+        with test_database():
+            seed(100, options['habits'])
+            queryset = Habit.objects.filter(is_public=True).order_by('-time', 'id')
+
+            self.stdout.write(f'{"сериализатор":<24}{"страница":>10}{"способ":>8}'
+                              f'{"чтение, мкс":>14}{"сериализация, мкс":>20}{"JSON, мкс":>12}')
+            for serializer_class in (HabitSerializer, HabitPublicSerializer):
+                for page_size in options['page_size']:
+                    result = measure_serialization(serializer_class, queryset[:page_size], options['repeat'])
+                    if not result['identical']:
+                        self.stderr.write(f'{serializer_class.__name__}: JSON отличается')
+                    for way in ('model', 'values'):
+                        costs = result[way]
+                        self.stdout.write(f'{serializer_class.__name__:<24}{result["items"]:>10}{way:>8}'
+                                          f'{costs["fetch_us"]:>14.2f}{costs["serialize_us"]:>20.2f}'
+                                          f'{costs["render_us"]:>12.2f}')
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management import BaseCommand
+
+from habits.telegram import StandInTelegramServer, TelegramClient
+
+
+class Command(BaseCommand):
+    """
+    Команда для замера пропускной способности отправки напоминаний.
+    Сообщения отправляются на локальную замену Telegram Bot API, сеть не нужна
+    """
+    help = 'Замер пропускной способности отправки сообщений в Telegram на локальном сервере'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500, help='Количество сообщений')
+        parser.add_argument('--delay', type=float, default=0.02, help='Задержка ответа сервера в секундах')
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16, 32],
+                            help='Число параллельных запросов для замеров')
+
+    def handle(self, *args, **options):
+        messages = [(str(chat_id), f'Напоминание {chat_id}') for chat_id in range(options['messages'])]
+
+        with StandInTelegramServer(delay=options['delay']) as server:
+            for workers in options['workers']:
+                with TelegramClient(token='benchmark', api_url=server.url, max_workers=workers) as client:
+                    started = time.perf_counter()
+                    results = client.send_messages(messages)
+                    elapsed = time.perf_counter() - started
+
+                failed = sum(not result.ok for result in results)
+                self.stdout.write(
+                    f'workers={workers:<4} messages={len(messages)} failed={failed} '
+                    f'elapsed={elapsed:.2f}s throughput={len(messages) / elapsed:.0f} msg/s'
+                )
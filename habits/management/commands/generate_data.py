@@ -0,0 +1,33 @@
+from django.core.management import BaseCommand
+
+from habits.datagen import EMAIL_TEMPLATE, generate_data
+
+
+class Command(BaseCommand):
+    """
+    Команда для заполнения текущей базы синтетическими пользователями и привычками
+    с реалистичными распределениями для нагрузочного тестирования и планирования мощностей
+    """
+    help = 'Генерация пользователей и привычек в текущей базе'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Количество пользователей')
+        parser.add_argument('--habits', type=int, default=100000, help='Количество привычек')
+        parser.add_argument('--password', default='load-password', help='Пароль всех созданных пользователей')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора случайных чисел')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Количество привычек в одной пачке')
+
+    def handle(self, *args, **options):
+        result = generate_data(
+            options['users'], options['habits'], options['password'],
+            seed=options['seed'], batch_size=options['batch_size'],
+            on_batch=lambda created: self.stdout.write(f'Создано привычек {created}'),
+        )
+        self.stdout.write(
+            f'Создано пользователей {result.users}, привычек {result.habits} за {result.seconds:.1f} с '
+            f'({result.habits / max(result.seconds, 1e-9):.0f} привычек/с): публичных {result.public}, '
+            f'приятных {result.pleasurable}, со связанной привычкой {result.associated}'
+        )
+        self.stdout.write(f'Почты пользователей: {EMAIL_TEMPLATE.format(index=result.first_index)} ... '
+                          f'{EMAIL_TEMPLATE.format(index=result.first_index + result.users - 1)}, '
+                          f'пароль: {options["password"]}')
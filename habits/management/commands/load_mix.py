@@ -0,0 +1,61 @@
+import requests
+from django.core.management import BaseCommand, CommandError
+
+from habits.datagen import EMAIL_TEMPLATE
+from habits.loadtest import DEFAULT_SCENARIOS, login_users, run_scenarios, Scenario
+
+
+class Command(BaseCommand):
+    """
+    Команда нагрузочного тестирования запущенного сервера смесью запросов к API от имени пользователей,
+    созданных командой generate_data. Выводит запросы в секунду и задержки по каждому виду запроса
+    """
+    help = 'Нагрузка смесью запросов к API с замером пропускной способности и задержек'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Адрес сервера')
+        parser.add_argument('--password', default='load-password', help='Пароль пользователей generate_data')
+        parser.add_argument('--first-index', type=int, default=1, help='Номер первого пользователя в почте')
+        parser.add_argument('--users', type=int, default=10, help='Количество пользователей, от имени которых '
+                                                                  'выполняются запросы')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50],
+                            help='Число одновременных клиентов для замеров')
+        parser.add_argument('--duration', type=float, default=30, help='Длительность замера в секундах')
+        parser.add_argument('--weight', action='append', default=[], metavar='KEY=WEIGHT',
+                            help=f'Вес вида запроса в смеси, можно указать несколько раз. Виды: '
+                                 f'{", ".join(scenario.key for scenario in DEFAULT_SCENARIOS)}')
+
+    def handle(self, *args, **options):
+        scenarios = self.get_scenarios(options['weight'])
+        base_url = options['base_url'].rstrip('/')
+        emails = [EMAIL_TEMPLATE.format(index=options['first_index'] + index) for index in range(options['users'])]
+        try:
+            users = login_users(base_url, emails, options['password'])
+        except requests.RequestException as e:
+            raise CommandError(f'Сервер {base_url} недоступен: {e}')
+        if not users:
+            raise CommandError('Нет пользователей с привычками, которые смогли войти. '
+                               'Создайте их командой generate_data')
+        self.stdout.write(f'Пользователей: {len(users)}')
+
+        self.stdout.write(f'{"запрос":<30}{"клиентов":>10}{"запросов":>10}{"ошибок":>8}{"RPS":>10}'
+                          f'{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}')
+        for concurrency in options['concurrency']:
+            results, total = run_scenarios(base_url, users, scenarios, concurrency, options['duration'])
+            for result in results + [total]:
+                self.stdout.write(f'{result.path:<30}{result.concurrency:>10}{result.requests:>10}'
+                                  f'{result.errors:>8}{result.rps:>10.1f}{result.p50_ms:>10.2f}'
+                                  f'{result.p95_ms:>10.2f}{result.p99_ms:>10.2f}')
+
+    @staticmethod
+    def get_scenarios(weights):
+        scenarios = {scenario.key: scenario for scenario in DEFAULT_SCENARIOS}
+        for option in weights:
+            key, _, weight = option.partition('=')
+            if key not in scenarios or not weight.isdigit():
+                raise CommandError(f'Неверный вес {option}, ожидается KEY=WEIGHT, виды: {", ".join(scenarios)}')
+            scenarios[key] = Scenario(key, scenarios[key].name, int(weight), scenarios[key].prepare)
+        scenarios = [scenario for scenario in scenarios.values() if scenario.weight]
+        if not scenarios:
+            raise CommandError('Все веса равны нулю')
+        return scenarios
@@ -0,0 +1,43 @@
+import requests
+from django.core.management import BaseCommand, CommandError
+
+from habits.loadtest import compare_sync_async, get_access_token
+
+
+class Command(BaseCommand):
+    """
+    Команда нагрузочного тестирования запущенного сервера: сравнивает запросы в секунду и задержки
+    синхронных эндпоинтов чтения привычек с их асинхронными версиями
+    """
+    help = 'Сравнение синхронных и асинхронных эндпоинтов чтения привычек под нагрузкой'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Адрес сервера')
+        parser.add_argument('--email', required=True, help='Почта пользователя для получения токена')
+        parser.add_argument('--password', required=True, help='Пароль пользователя')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50],
+                            help='Число одновременных клиентов для замеров')
+        parser.add_argument('--duration', type=float, default=10, help='Длительность замера маршрута в секундах')
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        try:
+            token = get_access_token(base_url, options['email'], options['password'])
+            response = requests.get(f'{base_url}/habit/list/', params={'page_size': 1},
+                                    headers={'Authorization': f'Bearer {token}'}, timeout=10)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise CommandError(f'Сервер {base_url} недоступен: {e}')
+
+        habits = response.json()['results']
+        if not habits:
+            raise CommandError('У пользователя нет привычек для замера')
+
+        self.stdout.write(f'{"маршрут":<28}{"клиентов":>10}{"запросов":>10}{"ошибок":>8}{"RPS":>10}'
+                          f'{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}')
+        for concurrency in options['concurrency']:
+            for pair in compare_sync_async(base_url, token, habits[0]['id'], concurrency, options['duration']):
+                for result in pair:
+                    self.stdout.write(f'{result.path:<28}{result.concurrency:>10}{result.requests:>10}'
+                                      f'{result.errors:>8}{result.rps:>10.1f}{result.p50_ms:>10.2f}'
+                                      f'{result.p95_ms:>10.2f}{result.p99_ms:>10.2f}')
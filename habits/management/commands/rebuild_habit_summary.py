@@ -0,0 +1,30 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from habits.summary import check_summary_drift, rebuild_summary
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересчета сводки по привычкам с нуля и проверки ее расхождений с таблицей привычек.
+    С --check сводка только проверяется, при расхождениях команда завершается с ошибкой
+    """
+    help = 'Пересчет и проверка сводки по привычкам пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Только проверить расхождения, не пересчитывая')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            started = time.perf_counter()
+            buckets = rebuild_summary()
+            self.stdout.write(f'Сводка пересчитана: групп {buckets} за {time.perf_counter() - started:.1f} с')
+
+        drift = check_summary_drift()
+        for (user_id, periodicity, is_public, is_pleasurable), expected, actual in drift:
+            self.stdout.write(f'Пользователь {user_id}, периодичность {periodicity}, публичная {is_public}, '
+                              f'приятная {is_pleasurable}: привычек {expected}, в сводке {actual}')
+        if drift:
+            raise CommandError(f'Сводка расходится с привычками в {len(drift)} группах')
+        self.stdout.write('Расхождений нет')
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-18 10:18
+
+import django.db.models.functions.datetime
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('habits', '0003_alter_habit_is_pleasurable_alter_habit_is_public'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='habit',
+            index=models.Index(django.db.models.functions.datetime.ExtractHour('time'), models.F('date_of_next_reminder_sending'), name='habit_reminder_due_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.7 on 2026-10-18 10:28
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('habits', '0004_habit_reminder_due_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='habit',
+            index=models.Index(fields=['user', '-time', 'id'], name='habit_user_time_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='habit',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-time', 'id'], name='habit_public_time_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.7 on 2026-10-18 10:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0005_habit_user_time_idx_habit_public_time_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedHabit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('habit_id', models.BigIntegerField(verbose_name='id привычки')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удаленная привычка',
+                'verbose_name_plural': 'Удаленные привычки',
+            },
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='дата создания'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='дата изменения'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='habit_user_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='deletedhabit',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='deletedhabit',
+            index=models.Index(fields=['user', 'deleted_at', 'id'], name='deleted_habit_user_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.7 on 2026-10-18 11:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0006_habit_change_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitStats',
+            fields=[
+                ('habit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='habits.habit', verbose_name='привычка')),
+                ('total_completions', models.PositiveIntegerField(default=0, verbose_name='всего выполнений')),
+                ('current_streak', models.PositiveIntegerField(default=0, verbose_name='текущая серия')),
+                ('longest_streak', models.PositiveIntegerField(default=0, verbose_name='самая длинная серия')),
+                ('first_completed_on', models.DateField(blank=True, null=True, verbose_name='дата первого выполнения')),
+                ('last_completed_on', models.DateField(blank=True, null=True, verbose_name='дата последнего выполнения')),
+            ],
+            options={
+                'verbose_name': 'Статистика привычки',
+                'verbose_name_plural': 'Статистика привычек',
+            },
+        ),
+        migrations.CreateModel(
+            name='HabitCompletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed_on', models.DateField(verbose_name='дата выполнения')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='дата отметки')),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='completions', to='habits.habit', verbose_name='привычка')),
+            ],
+            options={
+                'verbose_name': 'Выполнение привычки',
+                'verbose_name_plural': 'Выполнения привычек',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='habitcompletion',
+            constraint=models.UniqueConstraint(fields=('habit', 'completed_on'), name='habit_completion_unique'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.7 on 2026-10-18 11:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_habit_summary(apps, schema_editor):
+    Habit = apps.get_model('habits', 'Habit')
+    HabitSummary = apps.get_model('habits', 'HabitSummary')
+    rows = Habit.objects.filter(user__isnull=False).order_by().values(
+        'user_id', 'periodicity', 'is_public', 'is_pleasurable',
+    ).annotate(count=Count('pk'))
+    HabitSummary.objects.bulk_create((HabitSummary(**row) for row in rows), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0007_habit_completions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodicity', models.PositiveIntegerField(verbose_name='периодичность в днях')),
+                ('is_public', models.BooleanField(verbose_name='публичная привычка')),
+                ('is_pleasurable', models.BooleanField(verbose_name='приятная привычка')),
+                ('count', models.IntegerField(default=0, verbose_name='количество привычек')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'verbose_name': 'Сводка по привычкам',
+                'verbose_name_plural': 'Сводки по привычкам',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='habitsummary',
+            constraint=models.UniqueConstraint(fields=('user', 'periodicity', 'is_public', 'is_pleasurable'), name='habit_summary_unique'),
+        ),
+        migrations.RunPython(fill_habit_summary, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,23 @@
 from users.models import User
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import ExtractHour
 
 from config.settings import NULLABLE
 
 
+class HabitQuerySet(models.QuerySet):
+
+    def due_for_reminder(self, now):
+        """Привычки, напоминание о которых нужно отправить в текущий час"""
+        return self.annotate(
+            reminder_hour=ExtractHour('time'),
+        ).filter(
+            Q(date_of_next_reminder_sending__lte=now.date()) | Q(date_of_next_reminder_sending__isnull=True),
+            reminder_hour=now.hour,
+        )
+
+
 class Habit(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='пользователь', **NULLABLE)
     place = models.CharField(max_length=150, verbose_name='место', **NULLABLE)
@@ -16,6 +30,10 @@ class Habit(models.Model):
     lead_time = models.IntegerField(verbose_name='время на выполнение')
     is_public = models.BooleanField(default=False, verbose_name='публичная привычка')
     date_of_next_reminder_sending = models.DateField(verbose_name='дата отправки следуюзего напоминания', **NULLABLE)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='дата изменения')
+
+    objects = HabitQuerySet.as_manager()
 
     def __str__(self):
         return f'Я буду {self.action} в {self.time} в {self.place}'
@@ -24,4 +42,88 @@ class Habit(models.Model):
         verbose_name = 'Привычка'
         verbose_name_plural = 'Привычки'
         ordering = ['-time']
+        indexes = [
+            models.Index(ExtractHour('time'), F('date_of_next_reminder_sending'), name='habit_reminder_due_idx'),
+            models.Index(fields=['user', '-time', 'id'], name='habit_user_time_idx'),
+            models.Index(fields=['-time', 'id'], condition=Q(is_public=True), name='habit_public_time_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='habit_user_updated_idx'),
+        ]
+
+
+class DeletedHabit(models.Model):
+    """Запись об удаленной привычке для синхронизации клиентов"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='пользователь')
+    habit_id = models.BigIntegerField(verbose_name='id привычки')
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name='дата удаления')
+
+    def __str__(self):
+        return f'Привычка {self.habit_id} удалена {self.deleted_at}'
+
+    class Meta:
+        verbose_name = 'Удаленная привычка'
+        verbose_name_plural = 'Удаленные привычки'
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id'], name='deleted_habit_user_idx'),
+        ]
+
+
+class HabitCompletion(models.Model):
+    """Отметка о выполнении привычки за день. Записи только добавляются, одна на привычку и день"""
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name='completions', verbose_name='привычка')
+    completed_on = models.DateField(verbose_name='дата выполнения')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='дата отметки')
+
+    def __str__(self):
+        return f'Привычка {self.habit_id} выполнена {self.completed_on}'
 
+    class Meta:
+        verbose_name = 'Выполнение привычки'
+        verbose_name_plural = 'Выполнения привычек'
+        constraints = [
+            # Индекс ограничения хранит историю привычки в порядке дат
+            models.UniqueConstraint(fields=['habit', 'completed_on'], name='habit_completion_unique'),
+        ]
+
+
+class HabitStats(models.Model):
+    """
+    Статистика выполнения привычки, которая обновляется при каждой отметке.
+    Серия — выполнения, между которыми прошло не больше периодичности привычки
+    """
+    habit = models.OneToOneField(Habit, on_delete=models.CASCADE, primary_key=True, related_name='stats',
+                                 verbose_name='привычка')
+    total_completions = models.PositiveIntegerField(default=0, verbose_name='всего выполнений')
+    current_streak = models.PositiveIntegerField(default=0, verbose_name='текущая серия')
+    longest_streak = models.PositiveIntegerField(default=0, verbose_name='самая длинная серия')
+    first_completed_on = models.DateField(verbose_name='дата первого выполнения', **NULLABLE)
+    last_completed_on = models.DateField(verbose_name='дата последнего выполнения', **NULLABLE)
+
+    def __str__(self):
+        return f'Статистика привычки {self.habit_id}'
+
+    class Meta:
+        verbose_name = 'Статистика привычки'
+        verbose_name_plural = 'Статистика привычек'
+
+
+class HabitSummary(models.Model):
+    """
+    Число привычек пользователя в одной группе: периодичность, публичность и приятность.
+    Счетчики обновляются при создании, изменении и удалении привычек
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='пользователь')
+    periodicity = models.PositiveIntegerField(verbose_name='периодичность в днях')
+    is_public = models.BooleanField(verbose_name='публичная привычка')
+    is_pleasurable = models.BooleanField(verbose_name='приятная привычка')
+    count = models.IntegerField(default=0, verbose_name='количество привычек')
+
+    def __str__(self):
+        return f'Привычек пользователя {self.user_id}: {self.count}'
+
+    class Meta:
+        verbose_name = 'Сводка по привычкам'
+        verbose_name_plural = 'Сводки по привычкам'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'periodicity', 'is_public', 'is_pleasurable'],
+                                    name='habit_summary_unique'),
+        ]
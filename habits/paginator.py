@@ -1,7 +1,154 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import datetime
+import json
 
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
-class HabitPaginator(PageNumberPagination):
+
+class HabitCursorPaginator(BasePagination):
+    """
+    Курсорная пагинация привычек по ключу (time, id) в порядке -time, id.
+    Страница выбирается условием по ключу последней показанной привычки, поэтому ее стоимость
+    не зависит от глубины. Общее количество считается, только если клиент передал count=true
+    """
     page_size = 5
-    page_query_param = 'page_size'
     max_page_size = 50
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Неверный курсор'
+    # Поля ключа, которые должны быть в строках queryset.values()
+    position_fields = ('time', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request)
+        self.count = queryset.count() if self.is_count_requested(request) else None
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """То же, что paginate_queryset, через асинхронный ORM"""
+        page_queryset = self.get_page_queryset(queryset, request)
+        self.count = await queryset.acount() if self.is_count_requested(request) else None
+        return self.set_page([item async for item in page_queryset])
+
+    def get_page_queryset(self, queryset, request):
+        """Запрос страницы с одной лишней привычкой, по которой видно, есть ли следующая страница"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        if cursor is None:
+            self.reverse, self.position = False, None
+        else:
+            self.reverse, self.position = cursor
+
+        if self.reverse:
+            queryset = queryset.order_by(F('time').asc(nulls_last=True), '-id')
+        else:
+            queryset = queryset.order_by(F('time').desc(nulls_first=True), 'id')
+        if self.position is not None:
+            queryset = queryset.filter(self.get_position_filter(*self.position, reverse=self.reverse))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = self.position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def is_count_requested(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true')
+
+    @staticmethod
+    def get_position(item):
+        if isinstance(item, dict):
+            return item['time'], item['id']
+        return item.time, item.id
+
+    @staticmethod
+    def get_position_filter(time, pk, reverse=False):
+        """
+        Условие для привычек после позиции (time, pk) в порядке -time, id.
+        Привычки без времени идут первыми, как в ORDER BY time DESC в PostgreSQL.
+        Для reverse условие выбирает привычки перед позицией
+        """
+        if not reverse:
+            if time is None:
+                return Q(time__isnull=True, id__gt=pk) | Q(time__isnull=False)
+            return Q(time__lte=time) & (Q(time__lt=time) | Q(id__gt=pk))
+
+        if time is None:
+            return Q(time__isnull=True, id__lt=pk)
+        return Q(time__isnull=True) | Q(time__gte=time) & (Q(time__gt=time) | Q(id__lt=pk))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(reverse=False, position=self.get_position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_link(reverse=True, position=self.get_position(self.page[0]))
+
+    def get_link(self, reverse, position):
+        time, pk = position
+        payload = {'r': int(reverse), 't': time.isoformat() if time is not None else None, 'i': pk}
+        cursor = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+        return replace_query_param(remove_query_param(self.base_url, self.count_query_param),
+                                   self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            time = datetime.time.fromisoformat(payload['t']) if payload['t'] is not None else None
+            return bool(payload['r']), (time, int(payload['i']))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
@@ -4,6 +4,7 @@ from rest_framework.permissions import BasePermission
 class IsOwner(BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        if request.user == obj.user:
+        # Сравнение по user_id не загружает владельца отдельным запросом
+        if obj.user_id is not None and obj.user_id == request.user.pk:
             return True
         return False
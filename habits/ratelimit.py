@@ -0,0 +1,126 @@
+import time
+
+import redis
+from django.conf import settings
+
+# KEYS: общий бакет, бакет чата, блокировка бота, блокировка чата
+# ARGV: скорость и емкость общего бакета, скорость и емкость бакета чата
+# Возвращает {0, 0}, если токен получен, иначе {сколько миллисекунд нужно подождать, 1 если ограничен чат}
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local chat_blocked = redis.call('PTTL', KEYS[4])
+if chat_blocked > 0 then
+    return {chat_blocked, 1}
+end
+local blocked = redis.call('PTTL', KEYS[3])
+if blocked > 0 then
+    return {blocked, 0}
+end
+
+local tokens = {}
+local waits = {}
+for i = 1, 2 do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local capacity = tonumber(ARGV[i * 2])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(0, now - ts) * rate / 1000)
+    waits[i] = 0
+    if available < 1 then
+        waits[i] = math.ceil((1 - available) * 1000 / rate)
+    end
+    tokens[i] = available
+end
+if waits[2] > 0 then
+    return {waits[2], 1}
+end
+if waits[1] > 0 then
+    return {waits[1], 0}
+end
+
+for i = 1, 2 do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local capacity = tonumber(ARGV[i * 2])
+    redis.call('HSET', KEYS[i], 'tokens', tokens[i] - 1, 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity * 1000 / rate) + 1000)
+end
+return {0, 0}
+"""
+
+
+class TelegramRateLimiter:
+    """
+    Ограничение частоты отправки сообщений в Telegram, общее для всех воркеров Celery.
+    Состояние хранится в Redis: общий token bucket бота и отдельный bucket на каждый чат.
+    После ответа 429 отправка в чат приостанавливается на retry_after секунд, а всему боту — не дольше
+    max_bot_block секунд: по ответу нельзя понять, превышен лимит чата или бота, и 429 одного чата
+    не должен останавливать рассылку остальным. Если превышен лимит бота, следующие ответы 429
+    других чатов продлят паузу
+    """
+    key_prefix = 'telegram:ratelimit'
+    max_bot_block = 1.0
+
+    def __init__(self, client, rate=None, capacity=None, chat_rate=None, chat_capacity=None, key_prefix=None,
+                 max_bot_block=None):
+        self.client = client
+        self.rate = rate or settings.TELEGRAM_RATE_LIMIT
+        self.capacity = capacity or self.rate
+        self.chat_rate = chat_rate or settings.TELEGRAM_CHAT_RATE_LIMIT
+        self.chat_capacity = chat_capacity or max(1, self.chat_rate)
+        self.key_prefix = key_prefix or self.key_prefix
+        self.max_bot_block = max_bot_block if max_bot_block is not None else self.max_bot_block
+        self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    @classmethod
+    def from_settings(cls):
+        """Ограничитель из настроек или None, если Redis для него не настроен"""
+        if not settings.TELEGRAM_RATE_LIMIT_REDIS_URL:
+            return None
+        return cls(redis.Redis.from_url(settings.TELEGRAM_RATE_LIMIT_REDIS_URL))
+
+    def keys(self, chat_id):
+        return [
+            f'{self.key_prefix}:bucket',
+            f'{self.key_prefix}:bucket:{chat_id}',
+            f'{self.key_prefix}:blocked',
+            f'{self.key_prefix}:blocked:{chat_id}',
+        ]
+
+    def try_acquire(self, chat_id):
+        """
+        Пытается взять токен для отправки в чат. Возвращает (0, False), если токен получен,
+        иначе время ожидания в секундах и признак, что ограничен сам чат, а не весь бот
+        """
+        wait, chat_limited = self.script(
+            keys=self.keys(chat_id),
+            args=[self.rate, self.capacity, self.chat_rate, self.chat_capacity],
+        )
+        return wait / 1000, bool(chat_limited)
+
+    def acquire(self, chat_id):
+        """
+        Берет токен для отправки в чат. Общий лимит бота ждет здесь же: это доли секунды или не больше
+        max_bot_block. Если ограничен сам чат, не ждет и возвращает время ожидания чата в секундах,
+        чтобы поток не простаивал, пока другие чаты ждут отправки. Возвращает 0, если токен получен
+        """
+        while True:
+            wait, chat_limited = self.try_acquire(chat_id)
+            if not wait or chat_limited:
+                return wait
+            time.sleep(wait)
+
+    def block(self, chat_id, retry_after):
+        """
+        Приостанавливает отправку в чат на retry_after секунд после ответа 429,
+        а всему боту — на min(retry_after, max_bot_block) секунд
+        """
+        _, _, blocked, chat_blocked = self.keys(chat_id)
+        pipeline = self.client.pipeline()
+        pipeline.set(chat_blocked, 1, px=max(1, int(retry_after * 1000)))
+        bot_block = min(retry_after, self.max_bot_block)
+        if bot_block > 0:
+            pipeline.set(blocked, 1, px=max(1, int(bot_block * 1000)))
+        pipeline.execute()
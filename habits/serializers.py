@@ -1,11 +1,88 @@
+import datetime
+
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.settings import api_settings, ISO_8601
 
-from habits.models import Habit
+from habits.models import Habit, HabitStats
 from habits.validators import LeadTimeValidator, PeriodicityValidator, AssociatedHabitOrRewardValidator, \
     PleasurableHabitValidator, AssociatedHabitIsPleasurableHabitValidator
 
 
+def to_pk(model, value):
+    """
+    Первичный ключ model из значения поля связи, приведенный так же, как в queryset.get(pk=value)
+    у PrimaryKeyRelatedField. Для значений, которые это поле не принимает, выбрасывает TypeError или ValueError
+    """
+    if isinstance(value, bool):
+        raise TypeError
+    return model._meta.pk.get_prep_value(value)
+
+
+def get_related_pks(model, values):
+    """Первичные ключи для предзагрузки связанных объектов, значения без ключа пропускаются"""
+    pks = set()
+    for value in values:
+        try:
+            pk = to_pk(model, value)
+        except (TypeError, ValueError):
+            continue
+        if pk is not None:
+            pks.add(pk)
+    return pks
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Связь по первичному ключу, которая берет объекты из context['prefetched'][имя поля], если они переданы.
+    Позволяет проверить много объектов с одним запросом за связанными объектами вместо запроса на каждый.
+    Значения принимаются и отклоняются с теми же ошибками, что у PrimaryKeyRelatedField
+    """
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get('prefetched', {}).get(self.field_name)
+        if prefetched is None:
+            return super().to_internal_value(data)
+
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        try:
+            pk = to_pk(self.get_queryset().model, data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in prefetched or not self.is_available(prefetched[pk]):
+            self.fail('does_not_exist', pk_value=data)
+        return prefetched[pk]
+
+    def is_available(self, obj):
+        """Можно ли связать с объектом из context['prefetched'], как если бы он был найден в get_queryset()"""
+        return True
+
+
+class OwnHabitRelatedField(PrefetchedPrimaryKeyRelatedField):
+    """
+    Связь с привычкой того же пользователя: context['user'] или пользователя запроса context['request'].
+    Привычки других пользователей считаются несуществующими, одинаково при создании и изменении одной
+    привычки, в пакете и при импорте
+    """
+
+    def get_owner_id(self):
+        user = self.context.get('user') or getattr(self.context.get('request'), 'user', None)
+        return getattr(user, 'pk', None)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        owner_id = self.get_owner_id()
+        return queryset if owner_id is None else queryset.filter(user_id=owner_id)
+
+    def is_available(self, obj):
+        owner_id = self.get_owner_id()
+        return owner_id is None or obj.user_id == owner_id
+
+
 class HabitSerializer(serializers.ModelSerializer):
+    serializer_related_field = OwnHabitRelatedField
+
     class Meta:
         model = Habit
         fields = ('id', 'place', 'time', 'periodicity', 'action', 'is_pleasurable',
@@ -26,3 +103,81 @@ class HabitPublicSerializer(serializers.ModelSerializer):
         fields = ('action', 'time', 'periodicity', 'place', 'is_pleasurable',
                   'associated_habit', 'reward', 'lead_time',)
 
+
+class HabitOperationSerializer(serializers.Serializer):
+    """Одна операция пакетного изменения привычек"""
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+    op = serializers.ChoiceField(choices=(CREATE, UPDATE, DELETE))
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] != self.CREATE and 'id' not in attrs:
+            raise serializers.ValidationError({'id': 'Обязательное поле для update и delete'})
+        if attrs['op'] != self.DELETE and 'data' not in attrs:
+            raise serializers.ValidationError({'data': 'Обязательное поле для create и update'})
+        return attrs
+
+
+class HabitCompletionSerializer(serializers.Serializer):
+    """Отметка о выполнении привычки. Без даты выполнение отмечается за сегодня"""
+    completed_on = serializers.DateField(required=False)
+
+    def validate_completed_on(self, value):
+        if value > timezone.localdate():
+            raise serializers.ValidationError('Нельзя отметить выполнение в будущем')
+        return value
+
+
+class HabitStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = HabitStats
+        fields = ('habit', 'total_completions', 'current_streak', 'longest_streak',
+                  'first_completed_on', 'last_completed_on',)
+
+
+class ValuesSerializer:
+    """
+    Быстрая сериализация строк queryset.values() для списков только на чтение.
+    Соответствие полей вычисляется один раз по сериализатору serializer_class: поля, которые DRF отдает
+    без изменений (числа, строки, логические, первичные ключи связей), копируются как есть,
+    время преобразуется в ISO 8601, остальные поля — методом to_representation поля DRF.
+    Результат совпадает с serializer_class(many=True).data
+    """
+    identity_fields = (serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+                       serializers.PrimaryKeyRelatedField)
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        opts = serializer_class.Meta.model._meta
+        self.mapping = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            key = opts.get_field(field.source).attname
+            self.mapping.append((name, key, self.get_converter(field)))
+        self.mapping = tuple(self.mapping)
+        self.fields = tuple(key for _, key, _ in self.mapping)
+
+    def get_converter(self, field):
+        """Функция преобразования значения поля или None, если значение отдается как есть"""
+        if isinstance(field, self.identity_fields):
+            return None
+        if isinstance(field, serializers.TimeField) and \
+                str(getattr(field, 'format', api_settings.TIME_FORMAT)).lower() == ISO_8601:
+            return datetime.time.isoformat
+        return field.to_representation
+
+    def to_representation(self, rows):
+        mapping = self.mapping
+        return [
+            {
+                name: value if converter is None or value is None else converter(value)
+                for name, key, converter in mapping
+                for value in (row[key],)
+            }
+            for row in rows
+        ]
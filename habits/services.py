@@ -0,0 +1,211 @@
+import datetime
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min
+from django.utils import timezone
+
+from habits.cache import invalidate_public_habits, invalidate_user_habits
+from habits.completions import rebuild_habit_stats
+from habits.models import DeletedHabit, Habit
+from habits.serializers import get_related_pks, HabitOperationSerializer, HabitSerializer
+from habits.summary import get_bucket, update_summary
+
+REMINDER_BATCH_SIZE = 1000
+
+REMINDER_FIELDS = ('id', 'action', 'time', 'place', 'periodicity', 'date_of_next_reminder_sending')
+
+
+def get_due_habits(now):
+    """Привычки с напоминанием в текущий час, владельцу которых можно отправить сообщение"""
+    return Habit.objects.due_for_reminder(now).filter(user__telegram_chat_id__isnull=False).order_by()
+
+
+def get_due_reminders(now, first_id=None, last_id=None):
+    """
+    Напоминания, которые нужно отправить в текущий час, с id в диапазоне [first_id, last_id].
+    Возвращает словари только с нужными для отправки полями и chat_id владельца, одним запросом с JOIN
+    """
+    habits = get_due_habits(now)
+    if first_id is not None:
+        habits = habits.filter(pk__gte=first_id)
+    if last_id is not None:
+        habits = habits.filter(pk__lte=last_id)
+    return habits.values(
+        *REMINDER_FIELDS,
+        chat_id=F('user__telegram_chat_id'),
+    )
+
+
+def split_reminder_shards(now, max_shards):
+    """
+    Делит id привычек с напоминанием в текущий час на диапазоны [first_id, last_id].
+    Число диапазонов не больше max_shards и не больше числа пачек по REMINDER_BATCH_SIZE
+    """
+    bounds = get_due_habits(now).aggregate(first_id=Min('pk'), last_id=Max('pk'), count=Count('pk'))
+    if not bounds['count']:
+        return []
+
+    shards = min(max_shards, math.ceil(bounds['count'] / REMINDER_BATCH_SIZE))
+    width = math.ceil((bounds['last_id'] - bounds['first_id'] + 1) / shards)
+    return [
+        (first_id, min(first_id + width - 1, bounds['last_id']))
+        for first_id in range(bounds['first_id'], bounds['last_id'] + 1, width)
+    ]
+
+
+def format_reminder(reminder):
+    return f'Напоминание выполнить "{reminder["action"]}" в {reminder["time"]} в {reminder["place"]}'
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def advance_reminders(reminders, today):
+    """
+    Сдвигает дату следующего напоминания у привычек, по которым напоминание отправлено.
+    Обновляется только поле date_of_next_reminder_sending, одним UPDATE на каждую периодичность
+    """
+    pks_by_periodicity = defaultdict(list)
+    for reminder in reminders:
+        pks_by_periodicity[reminder['periodicity']].append(reminder['id'])
+
+    for periodicity, pks in pks_by_periodicity.items():
+        next_date = today + datetime.timedelta(days=periodicity)
+        for start in range(0, len(pks), REMINDER_BATCH_SIZE):
+            Habit.objects.filter(
+                pk__in=pks[start:start + REMINDER_BATCH_SIZE],
+            ).update(date_of_next_reminder_sending=next_date)
+
+
+def apply_habit_operations(user, operations):
+    """
+    Пакетное создание, изменение и удаление привычек пользователя.
+    operations — проверенные HabitOperationSerializer операции. Все операции проверяются HabitSerializer,
+    связанные и изменяемые привычки загружаются одним запросом, изменения применяются через
+    bulk_create/bulk_update и один DELETE в одной транзакции. Если хотя бы одна операция не прошла проверку,
+    ничего не применяется.
+    Возвращает (results, errors): результаты или ошибки по каждой операции в порядке операций
+    """
+    errors = [{} for _ in operations]
+    pks = {operation['id'] for operation in operations if 'id' in operation}
+    associated_pks = get_related_pks(
+        Habit, (operation.get('data', {}).get('associated_habit') for operation in operations)
+    )
+    habits = Habit.objects.in_bulk(pks | associated_pks) if pks | associated_pks else {}
+    context = {'prefetched': {'associated_habit': habits}, 'user': user}
+
+    seen = set()
+    for index, operation in enumerate(operations):
+        if 'id' not in operation:
+            continue
+        habit = habits.get(operation['id'])
+        if habit is None or habit.user_id != user.pk:
+            errors[index] = {'id': ['Привычка не найдена']}
+        elif operation['id'] in seen:
+            errors[index] = {'id': ['Привычка изменяется в пакете несколько раз']}
+        seen.add(operation['id'])
+
+    creates = [index for index, operation in enumerate(operations)
+               if operation['op'] == HabitOperationSerializer.CREATE]
+    create_serializer = HabitSerializer(data=[operations[index]['data'] for index in creates], many=True,
+                                        context=context)
+    if not create_serializer.is_valid():
+        for index, item_errors in zip(creates, create_serializer.errors):
+            errors[index] = item_errors
+
+    updates = {}
+    for index, operation in enumerate(operations):
+        if operation['op'] != HabitOperationSerializer.UPDATE or errors[index]:
+            continue
+        serializer = HabitSerializer(habits[operation['id']], data=operation['data'], partial=True, context=context)
+        if serializer.is_valid():
+            updates[index] = serializer
+        else:
+            errors[index] = serializer.errors
+
+    if any(errors):
+        return None, errors
+
+    deletes = [index for index, operation in enumerate(operations)
+               if operation['op'] == HabitOperationSerializer.DELETE]
+    created = [Habit(user=user, **validated_data) for validated_data in create_serializer.validated_data]
+    updated = []
+    update_fields = set()
+    affects_public = any(habit.is_public for habit in created)
+    rebuilt = []
+    removed_buckets = []
+    for serializer in updates.values():
+        habit = serializer.instance
+        affects_public = affects_public or habit.is_public
+        removed_buckets.append(get_bucket(habit))
+        if serializer.validated_data.get('periodicity', habit.periodicity) != habit.periodicity:
+            rebuilt.append(habit.pk)
+        for field, value in serializer.validated_data.items():
+            setattr(habit, field, value)
+        affects_public = affects_public or habit.is_public
+        updated.append(habit)
+        update_fields.update(serializer.validated_data)
+    deleted = [habits[operations[index]['id']] for index in deletes]
+
+    with transaction.atomic():
+        Habit.objects.bulk_create(created)
+        if updated and update_fields:
+            now = timezone.now()
+            for habit in updated:
+                habit.updated_at = now
+            Habit.objects.bulk_update(updated, fields=sorted(update_fields | {'updated_at'}))
+        if rebuilt:
+            rebuild_habit_stats(rebuilt)
+        update_summary(added=[get_bucket(habit) for habit in created + updated], removed=removed_buckets)
+        delete_habits(deleted)
+
+    invalidate_user_habits(user.pk)
+    if affects_public:
+        invalidate_public_habits()
+
+    results = [None] * len(operations)
+    for index, habit in zip(creates, created):
+        results[index] = {'op': HabitOperationSerializer.CREATE, 'status': 201, 'data': HabitSerializer(habit).data}
+    for index, serializer in updates.items():
+        results[index] = {'op': HabitOperationSerializer.UPDATE, 'status': 200,
+                          'data': HabitSerializer(serializer.instance).data}
+    for index in deletes:
+        results[index] = {'op': HabitOperationSerializer.DELETE, 'status': 204, 'id': operations[index]['id']}
+    return results, errors
+
+
+def delete_habits(habits):
+    """
+    Удаляет привычки, сохраняет записи об удалении для синхронизации клиентов и уменьшает счетчики сводки.
+    У привычек, связанных с удаляемыми, связь сбрасывается с обновлением даты изменения.
+    Сбрасывает кэш списков затронутых пользователей и, если нужно, ленты публичных привычек
+    """
+    pks = [habit.pk for habit in habits]
+    if not pks:
+        return
+
+    now = timezone.now()
+    with transaction.atomic():
+        referencing = Habit.objects.filter(associated_habit__in=pks).exclude(pk__in=pks)
+        referencing_owners = list(referencing.values_list('user_id', 'is_public'))
+        if referencing_owners:
+            referencing.update(associated_habit=None, updated_at=now)
+        DeletedHabit.objects.bulk_create(
+            DeletedHabit(user_id=habit.user_id, habit_id=habit.pk) for habit in habits if habit.user_id is not None
+        )
+        Habit.objects.filter(pk__in=pks).delete()
+        update_summary(removed=[get_bucket(habit) for habit in habits])
+
+    invalidate_user_habits(*(habit.user_id for habit in habits), *(user_id for user_id, _ in referencing_owners))
+    if any(habit.is_public for habit in habits) or any(is_public for _, is_public in referencing_owners):
+        invalidate_public_habits()
@@ -0,0 +1,99 @@
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count
+
+from habits.models import Habit, HabitSummary
+
+BUCKET_FIELDS = ('user_id', 'periodicity', 'is_public', 'is_pleasurable')
+
+
+def get_bucket(habit):
+    """Группа сводки, в которую входит привычка: кортеж значений BUCKET_FIELDS или None для привычки без владельца"""
+    if habit.user_id is None:
+        return None
+    return tuple(getattr(habit, field) for field in BUCKET_FIELDS)
+
+
+def update_summary(added=(), removed=()):
+    """
+    Изменяет счетчики сводки: +1 группам из added, -1 группам из removed. None в списках пропускаются.
+    Все группы обновляются одним INSERT ... ON CONFLICT DO UPDATE в той же транзакции, что и изменение привычек.
+    Строки вставляются в одном порядке, поэтому одновременные изменения не блокируют друг друга взаимно
+    """
+    deltas = Counter(bucket for bucket in added if bucket is not None)
+    deltas.subtract(bucket for bucket in removed if bucket is not None)
+    rows = [(*bucket, delta) for bucket, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+
+    table = HabitSummary._meta.db_table
+    columns = [HabitSummary._meta.get_field(field).column for field in BUCKET_FIELDS]
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            INSERT INTO {table} ({', '.join(columns)}, count) VALUES {placeholders}
+            ON CONFLICT ({', '.join(columns)}) DO UPDATE SET count = {table}.count + EXCLUDED.count
+            ''',
+            [value for row in rows for value in row],
+        )
+
+
+def count_buckets():
+    """Число привычек в каждой группе, подсчитанное по таблице привычек"""
+    rows = Habit.objects.filter(user__isnull=False).order_by().values(*BUCKET_FIELDS).annotate(count=Count('pk'))
+    return {tuple(row[field] for field in BUCKET_FIELDS): row['count'] for row in rows}
+
+
+def rebuild_summary():
+    """
+    Пересчитывает сводку с нуля одним GROUP BY по привычкам и сохраняет ее пачками.
+    Таблица сводки блокируется на время пересчета: изменения привычек, начатые во время пересчета,
+    дождутся его окончания и применят свои счетчики к новой сводке. Возвращает число групп
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {HabitSummary._meta.db_table} IN EXCLUSIVE MODE')
+        HabitSummary.objects.all().delete()
+        buckets = count_buckets()
+        HabitSummary.objects.bulk_create(
+            (HabitSummary(count=count, **dict(zip(BUCKET_FIELDS, bucket))) for bucket, count in buckets.items()),
+            batch_size=1000,
+        )
+    return len(buckets)
+
+
+def check_summary_drift():
+    """Расхождения сводки с таблицей привычек: список (группа, по привычкам, в сводке)"""
+    expected = count_buckets()
+    actual = {
+        tuple(row[field] for field in BUCKET_FIELDS): row['count']
+        for row in HabitSummary.objects.exclude(count=0).values(*BUCKET_FIELDS, 'count')
+    }
+    return [
+        (bucket, expected.get(bucket, 0), actual.get(bucket, 0))
+        for bucket in sorted(expected.keys() | actual.keys())
+        if expected.get(bucket, 0) != actual.get(bucket, 0)
+    ]
+
+
+def get_user_summary(user):
+    """Число привычек пользователя всего, по публичности, приятности и периодичности из строк сводки"""
+    rows = list(HabitSummary.objects.filter(user=user, count__gt=0).values('periodicity', 'is_public',
+                                                                           'is_pleasurable', 'count'))
+    by_periodicity = Counter()
+    for row in rows:
+        by_periodicity[row['periodicity']] += row['count']
+
+    return {
+        'total': sum(row['count'] for row in rows),
+        'public': sum(row['count'] for row in rows if row['is_public']),
+        'private': sum(row['count'] for row in rows if not row['is_public']),
+        'pleasurable': sum(row['count'] for row in rows if row['is_pleasurable']),
+        'useful': sum(row['count'] for row in rows if not row['is_pleasurable']),
+        'by_periodicity': [
+            {'periodicity': periodicity, 'count': count} for periodicity, count in sorted(by_periodicity.items())
+        ],
+    }
@@ -0,0 +1,102 @@
+import base64
+import datetime
+import json
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from habits.models import DeletedHabit, Habit
+
+
+@dataclass
+class SyncPosition:
+    """
+    Позиция в упорядоченном по (дата, id) потоке изменений.
+    pk равен None, если все записи с датой timestamp уже переданы клиенту
+    """
+    timestamp: datetime.datetime | None = None
+    pk: int | None = None
+
+    def get_filter(self, field):
+        if self.timestamp is None:
+            return Q()
+        if self.pk is None:
+            return Q(**{f'{field}__gt': self.timestamp})
+        return Q(**{f'{field}__gt': self.timestamp}) | Q(**{field: self.timestamp, 'id__gt': self.pk})
+
+    def encode(self):
+        return [self.timestamp.isoformat() if self.timestamp is not None else None, self.pk]
+
+    @classmethod
+    def decode(cls, value):
+        timestamp, pk = value
+        return cls(
+            timestamp=datetime.datetime.fromisoformat(timestamp) if timestamp is not None else None,
+            pk=int(pk) if pk is not None else None,
+        )
+
+
+@dataclass
+class SyncCursor:
+    """Позиции клиента в потоке измененных привычек и в потоке записей об удалении"""
+    changed: SyncPosition
+    deleted: SyncPosition
+
+    def encode(self):
+        payload = {'c': self.changed.encode(), 'd': self.deleted.encode()}
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+    @classmethod
+    def decode(cls, encoded):
+        """Разбирает курсор клиента, выбрасывает ValueError, если он поврежден"""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return cls(changed=SyncPosition.decode(payload['c']), deleted=SyncPosition.decode(payload['d']))
+        except (TypeError, ValueError, KeyError) as e:
+            raise ValueError(encoded) from e
+
+
+def read_stream(queryset, field, position, until, limit):
+    """
+    Следующие limit записей после position с датой не позже until и новая позиция.
+    Если записей больше нет, позиция переносится на until, чтобы следующий запрос не просматривал их снова
+    """
+    rows = list(
+        queryset.filter(position.get_filter(field), **{f'{field}__lte': until}).order_by(field, 'id')[:limit + 1]
+    )
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, SyncPosition(getattr(last, field), last.pk), True
+    return rows, SyncPosition(until), False
+
+
+def get_habit_changes(user, cursor=None, limit=100, now=None):
+    """
+    Изменения привычек пользователя с момента, на который указывает cursor.
+    Возвращает (измененные привычки, id удаленных привычек, новый курсор, есть ли еще изменения).
+
+    Изменения читаются только до now минус HABITS_SYNC_LAG_SECONDS: запись с более ранней датой изменения,
+    но еще не зафиксированная транзакция, за это время успевает стать видимой и не будет пропущена.
+    Первая синхронизация без курсора возвращает все привычки, записи об удалении ей не нужны
+    """
+    now = now or timezone.now()
+    until = now - datetime.timedelta(seconds=settings.HABITS_SYNC_LAG_SECONDS)
+    if cursor is None:
+        cursor = SyncCursor(changed=SyncPosition(), deleted=SyncPosition(until))
+
+    changed, changed_position, changed_more = read_stream(
+        Habit.objects.filter(user=user), 'updated_at', cursor.changed, until, limit
+    )
+    deleted, deleted_position, deleted_more = read_stream(
+        DeletedHabit.objects.filter(user=user).only('id', 'habit_id', 'deleted_at'),
+        'deleted_at', cursor.deleted, until, limit,
+    )
+    return (
+        changed,
+        [tombstone.habit_id for tombstone in deleted],
+        SyncCursor(changed=changed_position, deleted=deleted_position),
+        changed_more or deleted_more,
+    )
@@ -0,0 +1,91 @@
+import datetime
+import logging
+import math
+
+from celery import chord, shared_task
+from django.conf import settings
+
+from habits.services import advance_reminders, chunked, format_reminder, get_due_reminders, split_reminder_shards, \
+    REMINDER_BATCH_SIZE
+from habits.ratelimit import TelegramRateLimiter
+from habits.telegram import TelegramClient
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def send_message():
+    """
+    Ежечасная рассылка напоминаний.
+    Делит привычки с напоминанием в текущий час на диапазоны id и отправляет их параллельно отдельными задачами
+    """
+    now = datetime.datetime.now()
+
+    shards = split_reminder_shards(now, settings.REMINDER_SHARDS)
+    if not shards:
+        return {'shards': 0, 'sent': 0, 'failed': 0, 'requeued': 0}
+
+    chord(
+        send_reminders.s(now.isoformat(), first_id, last_id) for first_id, last_id in shards
+    )(collect_reminder_results.s())
+    return {'shards': len(shards)}
+
+
+@shared_task
+def send_reminders(now, first_id, last_id, habit_ids=None, attempt=1):
+    """
+    Отправка напоминаний по привычкам с id в диапазоне [first_id, last_id], при повторе — только habit_ids.
+    Сообщения, отправку которых ограничил Telegram или ограничитель частоты, не считаются ошибкой: они
+    отправляются повторно этой же задачей через retry_after секунд. Ответы 429 повторяются не более
+    REMINDER_MAX_ATTEMPTS раз, а сообщения, отложенные ограничителем, — всегда: за каждый повтор
+    в чат отправляется хотя бы одно сообщение
+    """
+    started_at = now
+    now = datetime.datetime.fromisoformat(now)
+
+    sent = 0
+    throttled = []
+    failed = 0
+    reminders = get_due_reminders(now, first_id, last_id)
+    if habit_ids is not None:
+        reminders = reminders.filter(pk__in=habit_ids)
+    with TelegramClient(rate_limiter=TelegramRateLimiter.from_settings()) as client:
+        for batch in chunked(reminders.iterator(chunk_size=REMINDER_BATCH_SIZE), REMINDER_BATCH_SIZE):
+            results = client.send_messages((reminder['chat_id'], format_reminder(reminder)) for reminder in batch)
+            batch_sent = []
+            for reminder, result in zip(batch, results):
+                if result.ok:
+                    batch_sent.append(reminder)
+                elif result.retry_after is not None and (
+                        result.status_code is None or attempt < settings.REMINDER_MAX_ATTEMPTS):
+                    throttled.append((reminder['id'], result.retry_after))
+                else:
+                    failed += 1
+            # Дата сдвигается после каждой пачки: если задача прервется, отправленные напоминания не повторятся
+            advance_reminders(batch_sent, now.date())
+            sent += len(batch_sent)
+
+    if throttled:
+        # Повтор выполняется с тем же временем рассылки, поэтому напоминания не выпадают из выборки часа
+        countdown = math.ceil(max(retry_after for _, retry_after in throttled))
+        logger.info('Отправка %s напоминаний повторится через %s с', len(throttled), countdown)
+        send_reminders.apply_async(
+            (started_at, first_id, last_id),
+            {'habit_ids': [habit_id for habit_id, _ in throttled], 'attempt': attempt + 1},
+            countdown=countdown,
+        )
+    return {'sent': sent, 'failed': failed, 'requeued': len(throttled)}
+
+
+@shared_task
+def collect_reminder_results(results):
+    """Суммирует результаты отправки по всем диапазонам"""
+    total = {
+        'shards': len(results),
+        'sent': sum(result['sent'] for result in results),
+        'failed': sum(result['failed'] for result in results),
+        'requeued': sum(result['requeued'] for result in results),
+    }
+    logger.info('Напоминания отправлены: %(sent)s, не отправлены: %(failed)s, отложены: %(requeued)s, '
+                'задач: %(shards)s', total)
+    return total
@@ -0,0 +1,210 @@
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import redis
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DeliveryResult:
+    """
+    Результат отправки одного сообщения.
+    retry_after задан, если отправку ограничил Telegram (status_code 429) или ограничитель частоты
+    (status_code None) и сообщение нужно отправить позже
+    """
+    chat_id: str
+    ok: bool
+    status_code: int | None = None
+    error: str | None = None
+    retry_after: float | None = None
+
+
+class TelegramClient:
+    """
+    Отправка сообщений в Telegram через общий пул HTTP-соединений.
+    Сообщения отправляются параллельно, не более max_workers запросов одновременно
+    """
+
+    def __init__(self, token=None, api_url=None, max_workers=None, timeout=None, rate_limiter=None, max_attempts=None):
+        self.token = token or settings.API_KEY_TELEGRAM_BOT
+        self.api_url = (api_url or settings.TELEGRAM_API_URL).rstrip('/')
+        self.max_workers = max_workers or settings.TELEGRAM_MAX_WORKERS
+        self.timeout = timeout or settings.TELEGRAM_TIMEOUT
+        self.rate_limiter = rate_limiter
+        self.max_attempts = max_attempts or settings.TELEGRAM_MAX_ATTEMPTS
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='telegram')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+        self.session.close()
+
+    @property
+    def send_message_url(self):
+        return f'{self.api_url}/bot{self.token}/sendMessage'
+
+    def send_message(self, chat_id, text):
+        """
+        Отправляет одно сообщение и возвращает результат, не выбрасывая исключений.
+        Если отправку в чат ограничивает ограничитель частоты или Telegram ответил 429, поток не ждет:
+        возвращается результат с retry_after, и сообщение отправляется позже. Без ограничителя
+        после ответа 429 сообщение отправляется повторно через retry_after секунд, не более max_attempts раз
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            wait = self.acquire(chat_id)
+            if wait:
+                return DeliveryResult(chat_id=chat_id, ok=False, error='Отправка в чат ограничена', retry_after=wait)
+
+            try:
+                response = self.session.post(
+                    self.send_message_url,
+                    json={'chat_id': chat_id, 'text': text},
+                    timeout=self.timeout,
+                )
+            except requests.RequestException as e:
+                logger.warning('Не удалось отправить сообщение в чат %s: %s', chat_id, e)
+                return DeliveryResult(chat_id=chat_id, ok=False, error=str(e))
+
+            if response.status_code == 429:
+                retry_after = self.get_retry_after(response)
+                logger.info('Telegram ограничил отправку в чат %s на %s с', chat_id, retry_after)
+                if self.rate_limiter is not None or attempt == self.max_attempts:
+                    self.block(chat_id, retry_after)
+                    return DeliveryResult(chat_id=chat_id, ok=False, status_code=response.status_code,
+                                          error=response.text, retry_after=retry_after)
+                time.sleep(retry_after)
+                continue
+
+            if response.status_code != 200:
+                logger.warning('Telegram ответил %s для чата %s', response.status_code, chat_id)
+                return DeliveryResult(chat_id=chat_id, ok=False, status_code=response.status_code, error=response.text)
+            return DeliveryResult(chat_id=chat_id, ok=True, status_code=response.status_code)
+
+    def acquire(self, chat_id):
+        """
+        Токен ограничителя частоты для отправки в чат: 0 или сколько секунд ждать чату.
+        Если Redis недоступен, сообщение отправляется без ограничителя
+        """
+        if self.rate_limiter is None:
+            return 0
+        try:
+            return self.rate_limiter.acquire(chat_id)
+        except redis.RedisError as e:
+            logger.warning('Ограничитель частоты недоступен, сообщение в чат %s отправляется без него: %s', chat_id, e)
+            return 0
+
+    def block(self, chat_id, retry_after):
+        """Приостанавливает отправку в чат после ответа 429, если есть ограничитель частоты"""
+        if self.rate_limiter is None:
+            return
+        try:
+            self.rate_limiter.block(chat_id, retry_after)
+        except redis.RedisError as e:
+            logger.warning('Ограничитель частоты недоступен, отправка в чат %s не приостановлена: %s', chat_id, e)
+
+    @staticmethod
+    def get_retry_after(response):
+        """Время ожидания из ответа 429: parameters.retry_after в теле или заголовок Retry-After"""
+        try:
+            return float(response.json()['parameters']['retry_after'])
+        except (ValueError, KeyError, TypeError):
+            return float(response.headers.get('Retry-After', 1))
+
+    def send_messages(self, messages):
+        """
+        Отправляет пары (chat_id, text) параллельно.
+        Возвращает список DeliveryResult в том же порядке, что и сообщения
+        """
+        futures = [self.executor.submit(self.send_message, chat_id, text) for chat_id, text in messages]
+        return [future.result() for future in futures]
+
+
+class StandInTelegramRequestHandler(BaseHTTPRequestHandler):
+    """Обработчик, отвечающий на sendMessage как Telegram Bot API"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        message = json.loads(body or b'{}')
+        self.server.received.append(message)
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        chat_id = str(message.get('chat_id'))
+        if chat_id in self.server.failing_chat_ids:
+            status, payload = 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: chat not found'}
+        elif self.server.throttled_chat_ids.get(chat_id):
+            self.server.throttled_chat_ids[chat_id] -= 1
+            status, payload = 429, {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                                    'parameters': {'retry_after': self.server.retry_after}}
+        else:
+            status, payload = 200, {'ok': True, 'result': {'chat': {'id': message.get('chat_id')},
+                                                           'text': message.get('text')}}
+
+        content = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInTelegramServer(ThreadingHTTPServer):
+    """
+    Локальная замена Telegram Bot API для тестов и замеров пропускной способности без сети.
+    delay имитирует задержку ответа, сообщения в failing_chat_ids завершаются ошибкой,
+    а на throttled_chat_ids ({chat_id: число ответов}) сервер отвечает 429 с retry_after
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, delay=0, failing_chat_ids=(), throttled_chat_ids=None, retry_after=1):
+        super().__init__(('127.0.0.1', 0), StandInTelegramRequestHandler)
+        self.delay = delay
+        self.failing_chat_ids = {str(chat_id) for chat_id in failing_chat_ids}
+        self.throttled_chat_ids = {str(chat_id): count for chat_id, count in (throttled_chat_ids or {}).items()}
+        self.retry_after = retry_after
+        self.received = []
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # Клиент, не дождавшийся ответа, закрывает соединение: это ожидаемо при проверке таймаутов
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
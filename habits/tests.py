@@ -1,14 +1,60 @@
+import csv
+import datetime
+import decimal
+import io
+import json
+import os
+import random
+import time
+import uuid
+from unittest import mock, skipUnless
+
+import redis
+from django.contrib.admin import AdminSite
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.db import connection, connections, transaction
+from django.test import AsyncClient, LiveServerTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
 from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-from habits.models import Habit
+from config.celery import app as celery_app
+from config.db import start_tracking, stop_tracking
+from config.renderers import ORJSONParser, ORJSONRenderer
+from habits.admin import HabitAdmin
+from habits.benchmark import compare, ENDPOINTS, get_missing_endpoints, measure_renderers, measure_serialization, \
+    run_benchmark, seed
+from habits.cache import get_user_habits_version, invalidate_user_habits
+from habits.completions import compute_stats, rebuild_habit_stats, STATS_FIELDS
+from habits.importer import import_habits, ImportFormatError, read_json_rows
+from habits.datagen import EMAIL_TEMPLATE, generate_data
+from habits.loadtest import compare_sync_async, DEFAULT_SCENARIOS, login_users, run_scenarios, SYNC_ASYNC_PATHS
+from habits.models import Habit, HabitCompletion, HabitStats
+from habits.ratelimit import TelegramRateLimiter
+from habits.serializers import HabitPublicSerializer, HabitSerializer, ValuesSerializer
+from habits.services import delete_habits, get_due_reminders, split_reminder_shards
+from habits.summary import check_summary_drift
+from habits.sync import get_habit_changes
+from habits.views import HabitExportAPIView
+from habits.tasks import collect_reminder_results, send_message, send_reminders
+from habits.telegram import DeliveryResult, StandInTelegramServer, TelegramClient
 from users.models import User
 
+TEST_REDIS_URL = os.getenv('TEST_REDIS_URL', 'redis://localhost:6379/15')
+
 
 class HabitAPITestCase(APITestCase):
     time = '17:31:00'
 
     def setUp(self) -> None:
+        cache.clear()
         self.client = APIClient()
         self.user = User.objects.create(email='user@test.com', password='test')
         self.client.force_authenticate(user=self.user)
@@ -266,8 +312,7 @@ class HabitAPITestCase(APITestCase):
 
         self.assertEqual(
             response.json(),
-            {'count': 2,
-             'next': None,
+            {'next': None,
              'previous': None,
              'results':
                  [
@@ -313,8 +358,7 @@ class HabitAPITestCase(APITestCase):
 
         self.assertEqual(
             response.json(),
-            {'count': 1,
-             'next': None,
+            {'next': None,
              'previous': None,
              'results':
                  [
@@ -380,3 +424,1530 @@ class HabitAPITestCase(APITestCase):
             response.status_code,
             status.HTTP_204_NO_CONTENT
         )
+
+    def test_create_habit_query_count(self):
+        """Тестирование, что создание привычки со связанной привычкой не делает лишних запросов"""
+        habit = {
+            "action": "Habit_test_2",
+            "lead_time": 10,
+            "periodicity": 1,
+            "time": self.time,
+            "associated_habit": self.habit_pleasurable.id
+        }
+
+        # Загрузка связанной привычки полем сериализатора, INSERT и счетчик сводки
+        # в одной транзакции (SAVEPOINT в тесте)
+        with self.assertNumQueries(5):
+            response = self.client.post('/habit/create/', data=habit)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Habit.objects.get(pk=response.data['id']).user, self.user)
+
+    def test_partial_update_habit(self):
+        """Тестирование частичного обновления привычки с проверкой по сохраненным значениям"""
+        response = self.client.patch(f'/habit/{self.habit.id}/update/', data={"place": "Дом"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['place'], 'Дом')
+
+        response = self.client.patch(f'/habit/{self.habit_pleasurable.id}/update/', data={"reward": "Test"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json(),
+            {
+                "non_field_errors": [
+                    "Нельзя назначить вознаграждение или связанную привычку для приятной привычки"
+                ]
+            }
+        )
+
+    def test_public_list_habit_cache(self):
+        """Тестирование кэширования ленты публичных привычек"""
+        self.client.get('/habit/public_list/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/habit/public_list/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_public_list_habit_cache_invalidation(self):
+        """Тестирование сброса кэша ленты публичных привычек при изменении публичной привычки"""
+        self.client.get('/habit/public_list/')
+
+        self.client.post('/habit/create/', data={
+            "action": "Habit_test_2",
+            "lead_time": 10,
+            "periodicity": 1,
+            "time": self.time,
+            "is_public": True
+        })
+        self.assertEqual(len(self.client.get('/habit/public_list/').json()['results']), 2)
+
+        self.client.patch(f'/habit/{self.habit.id}/update/', data={
+            "action": "Habit_test_1",
+            "lead_time": 10,
+            "periodicity": 1,
+            "is_public": False
+        })
+        self.assertEqual(len(self.client.get('/habit/public_list/').json()['results']), 1)
+
+        public_habit = Habit.objects.get(action='Habit_test_2')
+        self.client.delete(f'/habit/{public_habit.id}/delete/')
+        self.assertEqual(len(self.client.get('/habit/public_list/').json()['results']), 0)
+
+    def test_public_list_habit_cache_private_changes(self):
+        """Тестирование, что изменение личной привычки не сбрасывает кэш ленты публичных привычек"""
+        self.client.get('/habit/public_list/')
+
+        self.client.patch(f'/habit/{self.habit_pleasurable.id}/update/', data={
+            "action": "Habit_test_1_update",
+            "lead_time": 10,
+            "periodicity": 1
+        })
+
+        with self.assertNumQueries(0):
+            self.client.get('/habit/public_list/')
+
+    def test_retrieve_habit_not_modified(self):
+        """Тестирование условного запроса привычки по ETag и Last-Modified"""
+        response = self.client.get(f'/habit/{self.habit.id}/')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/habit/{self.habit.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        response = self.client.get(f'/habit/{self.habit.id}/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(f'/habit/{self.habit.id}/update/', data={"place": "Дом"})
+        response = self.client.get(f'/habit/{self.habit.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_habit_not_modified(self):
+        """Тестирование условного запроса списка привычек"""
+        etag = self.client.get('/habit/list/')['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/habit/list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.assertEqual(self.client.get('/habit/list/', {'page_size': 1}, HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_200_OK)
+
+        self.client.delete(f'/habit/{self.habit.id}/delete/')
+        response = self.client.get('/habit/list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_public_list_habit_not_modified(self):
+        """Тестирование условного запроса ленты публичных привычек без обращения к БД"""
+        etag = self.client.get('/habit/public_list/')['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/habit/public_list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(f'/habit/{self.habit.id}/update/', data={"place": "Дом"})
+        self.assertEqual(self.client.get('/habit/public_list/', HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_200_OK)
+
+    def test_list_habit_cache(self):
+        """Тестирование кэширования списка привычек пользователя"""
+        self.client.get('/habit/list/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/habit/list/')
+        self.assertEqual(len(response.json()['results']), 2)
+
+        other_user = User.objects.create(email='other@test.com')
+        self.client.force_authenticate(user=other_user)
+        self.assertEqual(self.client.get('/habit/list/').json()['results'], [])
+
+    def test_list_habit_cache_invalidation(self):
+        """Тестирование сброса кэша списка привычек при каждом изменении"""
+        def list_actions():
+            return [habit['action'] for habit in self.client.get('/habit/list/').json()['results']]
+
+        list_actions()
+        self.client.post('/habit/create/', data={"action": "Habit_test_2", "lead_time": 10, "time": self.time})
+        self.assertIn('Habit_test_2', list_actions())
+
+        self.client.patch(f'/habit/{self.habit.id}/update/', data={"action": "Habit_test_1_update"})
+        self.assertIn('Habit_test_1_update', list_actions())
+
+        self.client.delete(f'/habit/{self.habit.id}/delete/')
+        self.assertNotIn('Habit_test_1_update', list_actions())
+
+        self.client.post('/habit/bulk/', data=[{'op': 'delete', 'id': self.habit_pleasurable.id}], format='json')
+        self.assertEqual(list_actions(), ['Habit_test_2'])
+
+    def test_list_habit_cache_associated_habit_owner(self):
+        """Тестирование сброса кэша владельца привычки, связанная привычка которой удалена"""
+        other_user = User.objects.create(email='other@test.com')
+        other_habit = Habit.objects.create(user=other_user, action='Habit_other', lead_time=10,
+                                           associated_habit=self.habit_pleasurable)
+        self.client.force_authenticate(user=other_user)
+        self.client.get('/habit/list/')
+
+        delete_habits([self.habit_pleasurable])
+
+        response = self.client.get('/habit/list/')
+        self.assertEqual(response.json()['results'][0]['id'], other_habit.id)
+        self.assertIsNone(response.json()['results'][0]['associated_habit'])
+
+    def test_list_habit_cache_admin(self):
+        """Тестирование сброса кэша списка привычек при изменениях из админки"""
+        habit_admin = HabitAdmin(Habit, AdminSite())
+        self.client.get('/habit/list/')
+
+        self.habit.action = 'Habit_test_1_admin'
+        habit_admin.save_model(None, self.habit, mock.Mock(initial={'user': self.user.id}), change=True)
+        self.assertEqual(self.client.get('/habit/list/').json()['results'][0]['action'], 'Habit_test_1_admin')
+
+        habit_admin.delete_queryset(None, Habit.objects.filter(pk=self.habit.pk))
+        self.assertEqual(len(self.client.get('/habit/list/').json()['results']), 1)
+
+    def test_cache_version_bumped_after_commit(self):
+        """Тестирование повторного увеличения версии после фиксации транзакции"""
+        version = get_user_habits_version(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                invalidate_user_habits(self.user.id)
+                self.assertEqual(get_user_habits_version(self.user.id), version + 1)
+        self.assertEqual(get_user_habits_version(self.user.id), version + 2)
+
+
+class HabitBulkAPITestCase(APITestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create(email='user@test.com', password='test')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(user=self.user, action='Habit_test_1', lead_time=10, time='17:31:00')
+        self.habit_pleasurable = Habit.objects.create(
+            user=self.user, action='Habit_test_pleasurable', lead_time=10, time='17:31:00', is_pleasurable=True
+        )
+
+    def get_operations(self, count):
+        habits = Habit.objects.bulk_create(
+            Habit(user=self.user, action=f'Habit_test_{index}', lead_time=10) for index in range(count * 2)
+        )
+        operations = [
+            {'op': 'create', 'data': {'action': f'Habit_new_{index}', 'lead_time': 10, 'time': '08:00:00',
+                                      'associated_habit': self.habit_pleasurable.id}}
+            for index in range(count)
+        ]
+        operations += [{'op': 'update', 'id': habit.id, 'data': {'place': 'Дом'}} for habit in habits[:count]]
+        operations += [{'op': 'delete', 'id': habit.id} for habit in habits[count:]]
+        return operations
+
+    def test_bulk_habit(self):
+        """Тестирование пакетного создания, редактирования и удаления привычек"""
+        habit_to_delete = Habit.objects.create(user=self.user, action='Habit_test_2', lead_time=10)
+
+        response = self.client.post('/habit/bulk/', data=[
+            {'op': 'create', 'data': {'action': 'Habit_new', 'lead_time': 10, 'periodicity': 2, 'time': '08:00:00',
+                                      'associated_habit': self.habit_pleasurable.id}},
+            {'op': 'update', 'id': self.habit.id, 'data': {'place': 'Дом', 'is_public': True}},
+            {'op': 'delete', 'id': habit_to_delete.id},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        created = Habit.objects.get(action='Habit_new')
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    'op': 'create',
+                    'status': 201,
+                    'data': {
+                        'id': created.id,
+                        'place': None,
+                        'time': '08:00:00',
+                        'periodicity': 2,
+                        'action': 'Habit_new',
+                        'is_pleasurable': False,
+                        'associated_habit': self.habit_pleasurable.id,
+                        'reward': None,
+                        'lead_time': 10,
+                        'is_public': False
+                    }
+                },
+                {
+                    'op': 'update',
+                    'status': 200,
+                    'data': {
+                        'id': self.habit.id,
+                        'place': 'Дом',
+                        'time': '17:31:00',
+                        'periodicity': 1,
+                        'action': 'Habit_test_1',
+                        'is_pleasurable': False,
+                        'associated_habit': None,
+                        'reward': None,
+                        'lead_time': 10,
+                        'is_public': True
+                    }
+                },
+                {'op': 'delete', 'status': 204, 'id': habit_to_delete.id},
+            ]
+        )
+        self.assertEqual((created.user, created.associated_habit), (self.user, self.habit_pleasurable))
+        self.habit.refresh_from_db()
+        self.assertEqual((self.habit.place, self.habit.is_public), ('Дом', True))
+        self.assertFalse(Habit.objects.filter(pk=habit_to_delete.id).exists())
+
+    def test_bulk_habit_validation_error(self):
+        """Тестирование, что при ошибке в одной из операций не применяется ни одна"""
+        other_habit = Habit.objects.create(
+            user=User.objects.create(email='other@test.com', password='test'), action='Other', lead_time=10
+        )
+
+        response = self.client.post('/habit/bulk/', data=[
+            {'op': 'create', 'data': {'action': 'Habit_new', 'lead_time': 10}},
+            {'op': 'create', 'data': {'action': 'Habit_new', 'lead_time': 121}},
+            {'op': 'update', 'id': self.habit.id, 'data': {'associated_habit': self.habit.id}},
+            {'op': 'delete', 'id': other_habit.id},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json(),
+            [
+                {},
+                {'non_field_errors': ['Время на выполнение должно быть не больше 120 минут']},
+                {'non_field_errors': ['Связанная привычка должна быть приятной']},
+                {'id': ['Привычка не найдена']},
+            ]
+        )
+        self.assertFalse(Habit.objects.filter(action='Habit_new').exists())
+        self.assertTrue(Habit.objects.filter(pk=other_habit.id).exists())
+
+    def test_bulk_habit_associated_habit_values(self):
+        """Тестирование, что пакетное и одиночное создание одинаково принимают значения связанной привычки"""
+        pk = self.habit_pleasurable.id
+        for value in (pk, str(pk), float(pk), f'{pk}.0', True, 'abc', None, pk + 1000):
+            with self.subTest(value=value):
+                data = {'action': 'Habit_new', 'lead_time': 10, 'associated_habit': value}
+                single = self.client.post('/habit/create/', data=data, format='json')
+                bulk = self.client.post('/habit/bulk/', data=[{'op': 'create', 'data': data}], format='json')
+
+                if single.status_code == status.HTTP_201_CREATED:
+                    self.assertEqual(bulk.status_code, status.HTTP_200_OK)
+                    self.assertEqual(bulk.json()[0]['data']['associated_habit'], single.json()['associated_habit'])
+                else:
+                    self.assertEqual(bulk.status_code, status.HTTP_400_BAD_REQUEST)
+                    self.assertEqual(bulk.json()[0], single.json())
+
+    def test_bulk_habit_invalid_operation(self):
+        """Тестирование проверки формата операций"""
+        response = self.client.post('/habit/bulk/', data=[{'op': 'update', 'data': {}}], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), [{'id': ['Обязательное поле для update и delete']}])
+
+    def test_bulk_habit_query_count(self):
+        """Тестирование, что число запросов не зависит от числа операций"""
+        with CaptureQueriesContext(connection) as small_batch:
+            self.client.post('/habit/bulk/', data=self.get_operations(2), format='json')
+        small_batch_count = len(small_batch.captured_queries)
+
+        with CaptureQueriesContext(connection) as large_batch:
+            response = self.client.post('/habit/bulk/', data=self.get_operations(20), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(small_batch_count, len(large_batch.captured_queries))
+
+
+@override_settings(HABITS_SYNC_LAG_SECONDS=0)
+class HabitSyncAPITestCase(APITestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create(email='user@test.com', password='test')
+        self.client.force_authenticate(user=self.user)
+        self.habit_pleasurable = Habit.objects.create(
+            user=self.user, action='Habit_test_pleasurable', lead_time=10, is_pleasurable=True
+        )
+        self.habit = Habit.objects.create(
+            user=self.user, action='Habit_test_1', lead_time=10, associated_habit=self.habit_pleasurable
+        )
+        Habit.objects.create(user=User.objects.create(email='other@test.com'), action='Habit_other', lead_time=10)
+
+    def sync(self, cursor=None, **params):
+        if cursor is not None:
+            params['cursor'] = cursor
+        response = self.client.get('/habit/sync/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_sync_habit(self):
+        """Тестирование первой и последующей синхронизации"""
+        data = self.sync()
+        self.assertCountEqual([habit['id'] for habit in data['changed']], [self.habit_pleasurable.id, self.habit.id])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['has_more'])
+
+        data = self.sync(data['cursor'])
+        self.assertEqual((data['changed'], data['deleted']), ([], []))
+
+        new_habit = Habit.objects.create(user=self.user, action='Habit_test_2', lead_time=10)
+        self.client.delete(f'/habit/{self.habit_pleasurable.id}/delete/')
+        data = self.sync(data['cursor'])
+
+        # Связь с удаленной привычкой сброшена, поэтому привычка тоже считается измененной
+        self.assertCountEqual([habit['id'] for habit in data['changed']], [self.habit.id, new_habit.id])
+        self.assertEqual(next(habit for habit in data['changed'] if habit['id'] == self.habit.id)['associated_habit'],
+                         None)
+        self.assertEqual(data['deleted'], [self.habit_pleasurable.id])
+
+        data = self.sync(data['cursor'])
+        self.assertEqual((data['changed'], data['deleted']), ([], []))
+
+    def test_sync_habit_bulk_changes(self):
+        """Тестирование, что пакетные изменения попадают в синхронизацию"""
+        cursor = self.sync()['cursor']
+        self.client.post('/habit/bulk/', data=[
+            {'op': 'update', 'id': self.habit.id, 'data': {'place': 'Дом'}},
+            {'op': 'delete', 'id': self.habit_pleasurable.id},
+        ], format='json')
+
+        data = self.sync(cursor)
+        self.assertEqual([habit['place'] for habit in data['changed']], ['Дом'])
+        self.assertEqual(data['deleted'], [self.habit_pleasurable.id])
+
+    def test_sync_habit_limit(self):
+        """Тестирование получения изменений порциями"""
+        Habit.objects.bulk_create(Habit(user=self.user, action=f'Habit_{index}', lead_time=10) for index in range(5))
+
+        ids, cursor, has_more = [], None, True
+        while has_more:
+            data = self.sync(cursor, limit=3)
+            ids += [habit['id'] for habit in data['changed']]
+            cursor, has_more = data['cursor'], data['has_more']
+
+        self.assertEqual(len(ids), 7)
+        self.assertCountEqual(ids, Habit.objects.filter(user=self.user).values_list('id', flat=True))
+
+    @override_settings(HABITS_SYNC_LAG_SECONDS=5)
+    def test_sync_habit_lag(self):
+        """Тестирование, что недавние изменения отдаются при следующей синхронизации"""
+        now = timezone.now() + datetime.timedelta(seconds=10)
+        _, _, cursor, _ = get_habit_changes(self.user, now=now)
+        Habit.objects.filter(pk=self.habit.pk).update(updated_at=now)
+
+        changed, _, cursor, _ = get_habit_changes(self.user, cursor, now=now + datetime.timedelta(seconds=1))
+        self.assertEqual(changed, [])
+
+        changed, _, _, _ = get_habit_changes(self.user, cursor, now=now + datetime.timedelta(seconds=10))
+        self.assertEqual(changed, [self.habit])
+
+    def test_sync_habit_query_count(self):
+        """Тестирование, что синхронизация без изменений выполняется двумя запросами"""
+        cursor = self.sync()['cursor']
+        with self.assertNumQueries(2):
+            self.sync(cursor)
+
+    def test_invalid_cursor(self):
+        """Тестирование неверного курсора"""
+        response = self.client.get('/habit/sync/', {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class HabitCompletionAPITestCase(APITestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create(email='user@test.com', password='test')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(user=self.user, action='Habit_test_1', lead_time=10)
+        self.today = timezone.localdate()
+
+    def complete(self, days_ago=None, habit=None):
+        data = {} if days_ago is None else {'completed_on': self.today - datetime.timedelta(days=days_ago)}
+        return self.client.post(f'/habit/{(habit or self.habit).id}/complete/', data=data)
+
+    def test_compute_stats(self):
+        """Тестирование подсчета серий по датам выполнения"""
+        dates = [datetime.date(2024, 7, day) for day in (1, 2, 3, 5, 6, 9)]
+
+        self.assertEqual(compute_stats(dates, 1), {
+            'total_completions': 6, 'current_streak': 1, 'longest_streak': 3,
+            'first_completed_on': datetime.date(2024, 7, 1), 'last_completed_on': datetime.date(2024, 7, 9),
+        })
+        self.assertEqual(compute_stats(dates, 2)['longest_streak'], 5)
+        self.assertEqual(compute_stats(dates, 3)['current_streak'], 6)
+
+    def test_complete_habit(self):
+        """Тестирование отметки о выполнении привычки"""
+        response = self.complete()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['current_streak'], 1)
+
+        response = self.complete()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['total_completions'], 1)
+
+        # Отметка задним числом пересчитывает серию по истории
+        response = self.complete(days_ago=1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['current_streak'], 2)
+        self.assertEqual(response.json()['first_completed_on'], (self.today - datetime.timedelta(days=1)).isoformat())
+
+    def test_complete_habit_errors(self):
+        """Тестирование ошибок отметки о выполнении"""
+        other_habit = Habit.objects.create(user=User.objects.create(email='other@test.com'), action='Habit_other',
+                                           lead_time=10)
+
+        self.assertEqual(self.complete(days_ago=-1).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.complete(habit=other_habit).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(HabitCompletion.objects.exists())
+
+    def test_incremental_stats_match_history(self):
+        """Тестирование, что статистика, обновляемая при отметках в любом порядке, совпадает с подсчетом по истории"""
+        days = [0, 1, 2, 4, 5, 6, 7, 10, 12, 13]
+        rng = random.Random(0)
+        for days_ago in rng.sample(days, len(days)):
+            self.complete(days_ago=days_ago)
+
+        stats = HabitStats.objects.values(*STATS_FIELDS).get(habit=self.habit)
+        dates = sorted(self.today - datetime.timedelta(days=days_ago) for days_ago in days)
+        self.assertEqual(stats, compute_stats(dates, 1))
+
+        HabitStats.objects.all().delete()
+        self.assertEqual(rebuild_habit_stats(), 1)
+        self.assertEqual(HabitStats.objects.values(*STATS_FIELDS).get(habit=self.habit), compute_stats(dates, 1))
+
+    def test_user_stats(self):
+        """Тестирование статистики пользователя"""
+        for days_ago in (5, 4, 3):
+            self.complete(days_ago=days_ago)
+        weekly_habit = Habit.objects.create(user=self.user, action='Habit_test_2', lead_time=10, periodicity=7)
+        for days_ago in (13, 6):
+            self.complete(days_ago=days_ago, habit=weekly_habit)
+
+        # Статистика читается одним запросом независимо от длины истории
+        with self.assertNumQueries(1):
+            response = self.client.get('/habit/stats/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {
+            'total_completions': 5,
+            'active_streaks': 1,
+            'longest_streak': 3,
+            'habits': [
+                {'habit': self.habit.id, 'action': 'Habit_test_1', 'total_completions': 3, 'current_streak': 0,
+                 'longest_streak': 3, 'last_completed_on': (self.today - datetime.timedelta(days=3)).isoformat(),
+                 'adherence': 0.5},
+                {'habit': weekly_habit.id, 'action': 'Habit_test_2', 'total_completions': 2, 'current_streak': 2,
+                 'longest_streak': 2, 'last_completed_on': (self.today - datetime.timedelta(days=6)).isoformat(),
+                 'adherence': 1.0},
+            ],
+        })
+
+    def test_periodicity_change_rebuilds_stats(self):
+        """Тестирование пересчета серий при смене периодичности"""
+        for days_ago in (4, 2, 0):
+            self.complete(days_ago=days_ago)
+        self.assertEqual(HabitStats.objects.get(habit=self.habit).current_streak, 1)
+
+        self.client.patch(f'/habit/{self.habit.id}/update/', data={'periodicity': 2})
+        self.assertEqual(HabitStats.objects.get(habit=self.habit).current_streak, 3)
+
+        self.client.post('/habit/bulk/', data=[{'op': 'update', 'id': self.habit.id, 'data': {'periodicity': 1}}],
+                         format='json')
+        self.assertEqual(HabitStats.objects.get(habit=self.habit).current_streak, 1)
+
+
+class HabitSummaryAPITestCase(APITestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create(email='user@test.com', password='test')
+        self.client.force_authenticate(user=self.user)
+
+    def create(self, **data):
+        response = self.client.post('/habit/create/', data={'action': 'Habit_test', 'lead_time': 10, **data})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()['id']
+
+    def test_summary_updated_on_writes(self):
+        """Тестирование обновления сводки при создании, изменении и удалении привычек"""
+        public_id = self.create(periodicity=1, is_public=True)
+        pleasurable_id = self.create(periodicity=7, is_pleasurable=True)
+        self.create(periodicity=1)
+
+        self.client.patch(f'/habit/{public_id}/update/', data={'periodicity': 2})
+        self.client.delete(f'/habit/{pleasurable_id}/delete/')
+        self.client.post('/habit/bulk/', data=[
+            {'op': 'create', 'data': {'action': 'Habit_bulk', 'lead_time': 10, 'periodicity': 3, 'is_public': True}},
+            {'op': 'update', 'id': public_id, 'data': {'is_public': False}},
+        ], format='json')
+
+        # Сводка читается одним запросом
+        with self.assertNumQueries(1):
+            response = self.client.get('/habit/summary/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {
+            'total': 3,
+            'public': 1,
+            'private': 2,
+            'pleasurable': 0,
+            'useful': 3,
+            'by_periodicity': [
+                {'periodicity': 1, 'count': 1},
+                {'periodicity': 2, 'count': 1},
+                {'periodicity': 3, 'count': 1},
+            ],
+        })
+        self.assertEqual(check_summary_drift(), [])
+
+    def test_summary_admin(self):
+        """Тестирование обновления сводки при смене владельца привычки из админки"""
+        habit_id = self.create(periodicity=1)
+        habit = Habit.objects.get(pk=habit_id)
+        other_user = User.objects.create(email='other@test.com')
+
+        habit.user = other_user
+        HabitAdmin(Habit, AdminSite()).save_model(None, habit, mock.Mock(initial={'user': self.user.id}), change=True)
+
+        self.assertEqual(self.client.get('/habit/summary/').json()['total'], 0)
+        self.assertEqual(check_summary_drift(), [])
+
+    def test_rebuild_command(self):
+        """Тестирование проверки расхождений и пересчета сводки командой"""
+        self.create(periodicity=1)
+        Habit.objects.create(user=self.user, action='Habit_test', lead_time=10, periodicity=5)
+
+        with self.assertRaisesMessage(CommandError, 'в 1 группах'):
+            call_command('rebuild_habit_summary', '--check', stdout=io.StringIO())
+
+        stdout = io.StringIO()
+        call_command('rebuild_habit_summary', stdout=stdout)
+        self.assertIn('Расхождений нет', stdout.getvalue())
+        self.assertEqual(self.client.get('/habit/summary/').json()['total'], 2)
+
+
+class HabitExportAPITestCase(APITestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create(email='user@test.com', password='test')
+        self.client.force_authenticate(user=self.user)
+        Habit.objects.bulk_create(
+            Habit(user=self.user, action=f'Habit_test_{index}', lead_time=10, place='Дом, "офис"',
+                  time=datetime.time(index % 24, 0), is_public=index % 2 == 0)
+            for index in range(25)
+        )
+        Habit.objects.create(user=User.objects.create(email='other@test.com'), action='Habit_other', lead_time=10)
+        self.expected = HabitSerializer(Habit.objects.filter(user=self.user).order_by('-time', 'id'), many=True).data
+
+    def test_export_ndjson(self):
+        """Тестирование выгрузки привычек в NDJSON частями"""
+        with mock.patch.multiple(HabitExportAPIView, chunk_size=10, first_chunk_size=5):
+            response = self.client.get('/habit/export/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        chunks = list(response.streaming_content)
+        self.assertEqual([len(chunk.splitlines()) for chunk in chunks], [5, 10, 10])
+        self.assertEqual([json.loads(line) for line in b''.join(chunks).splitlines()], self.expected)
+
+    def test_export_csv(self):
+        """Тестирование выгрузки привычек в CSV"""
+        response = self.client.get('/habit/export/', {'export_format': 'csv'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="habits.csv"')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(rows[0]['place'], 'Дом, "офис"')
+        self.assertEqual([int(row['id']) for row in rows], [habit['id'] for habit in self.expected])
+
+    def test_export_unknown_format(self):
+        """Тестирование ошибки при неизвестном формате выгрузки"""
+        response = self.client.get('/habit/export/', {'export_format': 'xml'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_export_asgi(self):
+        """Тестирование, что под ASGI выгрузка передается асинхронным итератором без чтения в память"""
+        response = await AsyncClient().get('/habit/export/',
+                                           headers={'Authorization': f'Bearer {AccessToken.for_user(self.user)}'})
+
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([json.loads(line) for line in content.splitlines()], self.expected)
+
+
+class HabitImportAPITestCase(APITestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create(email='user@test.com', password='test')
+        self.client.force_authenticate(user=self.user)
+        self.habit_pleasurable = Habit.objects.create(user=self.user, action='Habit_test_pleasurable', lead_time=10,
+                                                      is_pleasurable=True)
+        self.other_habit = Habit.objects.create(user=User.objects.create(email='other@test.com'),
+                                                action='Habit_other', lead_time=10, is_pleasurable=True)
+
+    def upload(self, name, content, **data):
+        return self.client.post('/habit/import/', data={'file': SimpleUploadedFile(name, content.encode()), **data},
+                                format='multipart')
+
+    def test_import_csv(self):
+        """Тестирование импорта привычек из CSV с ошибками в отдельных строках"""
+        self.client.get('/habit/list/')
+        content = '\n'.join([
+            'action,time,periodicity,lead_time,is_public,associated_habit,reward',
+            'Habit_import_1,08:00:00,1,10,true,,',
+            f'Habit_import_2,09:00:00,2,15,false,{self.habit_pleasurable.id},',
+            'Habit_import_3,10:00:00,1,200,false,,',
+            'Habit_import_4,,7,5,false,,Кофе',
+            f'Habit_import_5,,1,5,false,{self.other_habit.id},',
+        ])
+
+        response = self.upload('habits.csv', content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        report = response.json()
+        self.assertEqual((report['rows'], report['created'], report['failed']), (5, 3, 2))
+        self.assertEqual([error['row'] for error in report['errors']], [3, 5])
+        self.assertIn('associated_habit', report['errors'][1]['errors'])
+        self.assertEqual(Habit.objects.get(action='Habit_import_2').associated_habit, self.habit_pleasurable)
+        # Кэш списка сброшен
+        self.assertEqual(len(self.client.get('/habit/list/?page_size=10').json()['results']), 4)
+        self.assertEqual(self.client.get('/habit/summary/').json()['total'], 3)
+
+    def test_import_json_error_stops_reading(self):
+        """Тестирование, что ошибка JSON в начале файла не заставляет читать файл целиком"""
+        row = json.dumps({'action': 'Habit_import', 'lead_time': 10}) + '\n'
+        content = ('{"action": oops}\n' + row * 100000).encode()
+        reads = []
+
+        class File(io.BytesIO):
+            def read1(self, size=-1):
+                data = super().read1(size)
+                reads.append(len(data))
+                return data
+
+        with self.assertRaises(ImportFormatError):
+            list(read_json_rows(File(content), read_size=1024, max_object_size=16 * 1024))
+
+        self.assertLess(sum(reads), 64 * 1024)
+
+    def test_import_associated_habit_owner(self):
+        """Тестирование одинаковой проверки владельца связанной привычки при импорте, в пакете и по одной"""
+        data = {'action': 'Habit_new', 'lead_time': 10, 'associated_habit': self.other_habit.id}
+
+        single = self.client.post('/habit/create/', data=data, format='json')
+        bulk = self.client.post('/habit/bulk/', data=[{'op': 'create', 'data': data}], format='json')
+        report = self.upload('habits.json', json.dumps([data])).json()
+
+        self.assertEqual(single.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(bulk.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(bulk.json()[0], single.json())
+        self.assertEqual(report['errors'], [{'row': 1, 'errors': single.json()}])
+        self.assertFalse(Habit.objects.filter(action='Habit_new').exists())
+
+        habit = Habit.objects.create(user=self.user, action='Habit_test', lead_time=10)
+        response = self.client.patch(f'/habit/{habit.id}/update/', data={'associated_habit': self.other_habit.id},
+                                     format='json')
+        self.assertEqual(response.json(), single.json())
+
+    def test_import_json_chunks(self):
+        """Тестирование разбора JSON частями и постоянного числа запросов на часть"""
+        items = [{'action': f'Habit_import_{index}', 'lead_time': 10, 'associated_habit': self.habit_pleasurable.id}
+                 for index in range(30)]
+        content = json.dumps(items, ensure_ascii=False, indent=2)
+
+        self.assertEqual(list(read_json_rows(io.BytesIO(content.encode()), read_size=7)), items)
+        self.assertEqual(list(read_json_rows(io.BytesIO('\n'.join(map(json.dumps, items)).encode()))), items)
+
+        with CaptureQueriesContext(connection) as small_chunk:
+            import_habits(self.user, items[:3], chunk_size=100)
+        with CaptureQueriesContext(connection) as large_chunk:
+            report = import_habits(self.user, items, chunk_size=100)
+
+        self.assertEqual(len(small_chunk.captured_queries), len(large_chunk.captured_queries))
+        self.assertEqual(report.created, 30)
+
+    def test_import_errors(self):
+        """Тестирование ошибок формата файла"""
+        self.assertEqual(self.upload('habits.xml', '<habits/>').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.upload('habits.json', '[{"action": "Habit_import", ').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+        response = self.upload('habits.txt', '{"action": "Habit_import", "lead_time": 10}\n[1]', import_format='json')
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['errors'][0]['row'], 2)
+
+
+class HabitCursorPaginatorTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create(email='user@test.com', password='test')
+        self.client.force_authenticate(user=self.user)
+
+        times = [None, '08:00:00', '17:31:00', '17:31:00', '06:15:00', None, '17:31:00', '23:59:00', '08:00:00',
+                 '17:31:00', '00:00:00', '12:00:00']
+        self.habits = [
+            Habit.objects.create(user=self.user, action=f'Habit_test_{index}', lead_time=10, time=time)
+            for index, time in enumerate(times)
+        ]
+        self.ordered_ids = [
+            habit.id for habit in sorted(
+                self.habits,
+                key=lambda habit: (habit.time is not None, -int(habit.time.replace(':', '')) if habit.time else 0,
+                                   habit.id)
+            )
+        ]
+
+    def get_pages(self, url):
+        pages = []
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.json())
+            url = pages[-1]['next']
+        return pages
+
+    def test_list_habit_pages(self):
+        """Тестирование перехода по страницам списка привычек вперед и назад"""
+        pages = self.get_pages('/habit/list/')
+
+        self.assertEqual([len(page['results']) for page in pages], [5, 5, 2])
+        self.assertEqual([habit['id'] for page in pages for habit in page['results']], self.ordered_ids)
+        self.assertIsNone(pages[0]['previous'])
+        self.assertNotIn('count', pages[0])
+
+        previous = self.client.get(pages[2]['previous']).json()
+        self.assertEqual(previous['results'], pages[1]['results'])
+        first = self.client.get(previous['previous']).json()
+        self.assertEqual(first['results'], pages[0]['results'])
+        self.assertIsNone(first['previous'])
+
+    def test_list_habit_page_size_and_count(self):
+        """Тестирование размера страницы и запроса количества привычек"""
+        response = self.client.get('/habit/list/?page_size=7&count=true')
+
+        self.assertEqual(response.json()['count'], 12)
+        self.assertEqual([habit['id'] for habit in response.json()['results']], self.ordered_ids[:7])
+        self.assertNotIn('count=', response.json()['next'])
+
+    def test_list_habit_query_count(self):
+        """Тестирование, что страница списка привычек читается одним запросом на любой глубине"""
+        pages = self.get_pages('/habit/list/?page_size=2')
+
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.client.get(pages[-1]['previous'])
+
+    def test_invalid_cursor(self):
+        """Тестирование неверного курсора"""
+        response = self.client.get('/habit/list/?cursor=invalid')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ValuesSerializerTestCase(TestCase):
+
+    def setUp(self) -> None:
+        user = User.objects.create(email='user@test.com', password='test')
+        pleasurable = Habit.objects.create(user=user, action='Habit_pleasurable', lead_time=10, is_pleasurable=True,
+                                           time='07:05:30', is_public=True)
+        Habit.objects.create(user=user, action='Habit_test_1', place='Дом', time='17:31:00', periodicity=3,
+                             lead_time=120, associated_habit=pleasurable, is_public=True)
+        Habit.objects.create(user=user, action='Habit_test_2', reward='Кофе', lead_time=1)
+
+    def test_values_serializer_json(self):
+        """Тестирование, что сериализация строк .values() дает тот же JSON, что и сериализаторы DRF"""
+        renderer = JSONRenderer()
+        queryset = Habit.objects.order_by('id')
+        for serializer_class in (HabitSerializer, HabitPublicSerializer):
+            values_serializer = ValuesSerializer(serializer_class)
+            self.assertEqual(
+                renderer.render(values_serializer.to_representation(queryset.values(*values_serializer.fields))),
+                renderer.render(serializer_class(queryset, many=True).data),
+            )
+
+    def test_measure_serialization(self):
+        """Тестирование замера стоимости сериализации"""
+        result = measure_serialization(HabitSerializer, Habit.objects.order_by('id'), repeat=1)
+
+        self.assertEqual(result['items'], 3)
+        self.assertTrue(result['identical'])
+        self.assertEqual(set(result['model']), {'fetch_us', 'serialize_us', 'render_us'})
+
+
+class ORJSONRendererTestCase(TestCase):
+
+    def test_render_same_as_drf(self):
+        """Тестирование, что рендерер на orjson выводит те же байты, что и JSONRenderer"""
+        data = {
+            'time': datetime.time(17, 31),
+            'time_ms': datetime.time(7, 5, 30, 123456),
+            'date': datetime.date(2024, 7, 1),
+            'datetime': datetime.datetime(2024, 7, 1, 8, 0, 0, 123456, tzinfo=datetime.timezone.utc),
+            'decimal': decimal.Decimal('10.50'),
+            'lazy': gettext_lazy('Привычка'),
+            'text': 'строка\u2028с разделителем',
+            1: [None, True, 1.5],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(data, 'application/json; indent=4'),
+                         JSONRenderer().render(data, 'application/json; indent=4'))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_parse(self):
+        """Тестирование разбора JSON парсером на orjson"""
+        self.assertEqual(ORJSONParser().parse(io.BytesIO('{"action": "Бег", "lead_time": 10}'.encode())),
+                         {'action': 'Бег', 'lead_time': 10})
+        for body in (b'{"action": ', b'{"lead_time": NaN}'):
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(io.BytesIO(body))
+
+    def test_measure_renderers(self):
+        """Тестирование замера рендереров на ленте публичных привычек"""
+        user = User.objects.create(email='user@test.com')
+        Habit.objects.create(user=user, action='Habit_test_1', time='17:31:00', lead_time=10, is_public=True)
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        result = measure_renderers(client, [5], repeat=1)[5]
+
+        self.assertEqual(result['items'], 1)
+        self.assertTrue(result['identical'])
+
+
+class HabitAsyncAPITestCase(APITestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create(email='user@test.com', password='test')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(user=self.user, action='Habit_test_1', lead_time=10, time='17:31:00',
+                                          is_public=True)
+        Habit.objects.create(user=self.user, action='Habit_test_2', lead_time=10, time='08:00:00')
+
+    def test_async_views_same_as_sync(self):
+        """Тестирование, что асинхронные эндпоинты отвечают так же, как синхронные"""
+        for sync_url, async_url in (
+            (f'/habit/{self.habit.id}/', f'/habit/async/{self.habit.id}/'),
+            ('/habit/list/?page_size=1', '/habit/async/list/?page_size=1'),
+            ('/habit/public_list/', '/habit/async/public_list/'),
+        ):
+            sync_response = self.client.get(sync_url)
+            async_response = self.client.get(async_url)
+
+            self.assertEqual(async_response.status_code, status.HTTP_200_OK)
+            self.assertEqual(async_response.content, sync_response.content.replace(b'/habit/', b'/habit/async/'))
+
+    def test_async_retrieve_errors(self):
+        """Тестирование ошибок асинхронного просмотра привычки"""
+        other_habit = Habit.objects.create(user=User.objects.create(email='other@test.com'), action='Habit_other',
+                                           lead_time=10)
+
+        self.assertEqual(self.client.get('/habit/async/0/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(f'/habit/async/{other_habit.id}/').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.post(f'/habit/async/{self.habit.id}/').status_code,
+                         status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(f'/habit/async/{self.habit.id}/').status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_async_list_cache_and_not_modified(self):
+        """Тестирование кэша и условных запросов асинхронного списка"""
+        etag = self.client.get('/habit/async/list/')['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/habit/async/list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/habit/async/list/')
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+class LoadTestTestCase(LiveServerTestCase):
+
+    def test_compare_sync_async(self):
+        """Тестирование нагрузочного сравнения синхронных и асинхронных эндпоинтов на живом сервере"""
+        cache.clear()
+        user = User.objects.create(email='user@test.com')
+        habit = Habit.objects.create(user=user, action='Habit_test_1', lead_time=10, is_public=True)
+
+        results = compare_sync_async(self.live_server_url, str(AccessToken.for_user(user)), habit.id,
+                                     concurrency=2, duration=0.2)
+
+        self.assertEqual(len(results), len(SYNC_ASYNC_PATHS))
+        for sync_result, async_result in results:
+            self.assertEqual(async_result.path, sync_result.path.replace('/habit/', '/habit/async/'))
+            for result in (sync_result, async_result):
+                self.assertGreater(result.requests, 0)
+                self.assertEqual(result.errors, 0)
+
+    def test_run_scenarios(self):
+        """Тестирование смеси запросов от имени сгенерированных пользователей на живом сервере"""
+        cache.clear()
+        data = generate_data(users=3, habits=30, password='load-password', seed=1)
+        emails = [EMAIL_TEMPLATE.format(index=data.first_index + index) for index in range(data.users)]
+        emails.append('missing@test.com')
+
+        users = login_users(self.live_server_url, emails, 'load-password')
+        results, total = run_scenarios(self.live_server_url, users, DEFAULT_SCENARIOS, concurrency=2, duration=0.5)
+
+        self.assertTrue(users)
+        self.assertEqual([result.path for result in results], [scenario.name for scenario in DEFAULT_SCENARIOS])
+        self.assertEqual(total.requests, sum(result.requests for result in results))
+        self.assertGreater(total.requests, 0)
+        self.assertEqual(total.errors, 0)
+
+
+class GenerateDataTestCase(TestCase):
+
+    def test_generate_data(self):
+        """Тестирование генерации пользователей и привычек"""
+        User.objects.create(email='user@test.com')
+
+        data = generate_data(users=20, habits=500, password='load-password', seed=1, batch_size=100)
+
+        self.assertEqual(data.users, 20)
+        self.assertEqual(data.habits, 500)
+        self.assertEqual(Habit.objects.count(), 500)
+        self.assertEqual(Habit.objects.filter(is_public=True).count(), data.public)
+        self.assertEqual(Habit.objects.filter(is_pleasurable=True).count(), data.pleasurable)
+        self.assertTrue(User.objects.get(email=EMAIL_TEMPLATE.format(index=data.first_index))
+                        .check_password('load-password'))
+        self.assertFalse(User.objects.filter(email=EMAIL_TEMPLATE.format(index=data.first_index - 1)).exists())
+        associated = Habit.objects.filter(associated_habit__isnull=False).select_related('associated_habit')
+        self.assertEqual(len(associated), data.associated)
+        self.assertGreater(data.associated, 0)
+        for habit in associated:
+            self.assertEqual(habit.associated_habit.user_id, habit.user_id)
+            self.assertTrue(habit.associated_habit.is_pleasurable)
+            self.assertIsNone(habit.reward)
+        self.assertFalse(Habit.objects.filter(is_pleasurable=True, reward__isnull=False).exists())
+        self.assertFalse(Habit.objects.filter(is_pleasurable=True, associated_habit__isnull=False).exists())
+        self.assertEqual(check_summary_drift(), [])
+
+    def test_generate_data_command(self):
+        """Тестирование команды генерации данных"""
+        out = io.StringIO()
+
+        call_command('generate_data', users=5, habits=50, stdout=out)
+
+        self.assertEqual(Habit.objects.count(), 50)
+        self.assertIn(EMAIL_TEMPLATE.format(index=1), out.getvalue())
+
+    def test_load_mix_command_weights(self):
+        """Тестирование проверки весов команды load_mix"""
+        with self.assertRaises(CommandError):
+            call_command('load_mix', weight=['unknown=1'])
+
+
+class DBConnectionTimingTestCase(APITestCase):
+
+    def test_connection_setup_recorded(self):
+        """Тестирование учета новых соединений с БД в статистике текущего запроса"""
+        new_connection = connections.create_connection('default')
+        stats, token = start_tracking()
+        try:
+            new_connection.ensure_connection()
+        finally:
+            stop_tracking(token)
+            new_connection.close()
+
+        self.assertEqual(stats.connections, 1)
+        self.assertGreater(stats.seconds, 0)
+
+    def test_server_timing_header(self):
+        """Тестирование заголовка Server-Timing при повторном использовании соединения"""
+        self.client.force_authenticate(user=User.objects.create(email='user@test.com'))
+
+        response = self.client.get('/habit/list/')
+
+        self.assertEqual(response['Server-Timing'], 'db-connect;dur=0.00;desc="0"')
+
+    def test_celery_task_logged(self):
+        """Тестирование записи в лог статистики соединений задачи Celery"""
+        with self.assertLogs('config.db', 'INFO') as logs:
+            collect_reminder_results.apply(args=([],))
+
+        self.assertIn('новых соединений с БД 0', logs.output[0])
+
+
+class ExplainQueriesMixin:
+    """
+    Проверка планов запросов через EXPLAIN.
+    Seq Scan запрещается на время EXPLAIN: на небольшой тестовой таблице PostgreSQL выбирает его и при
+    наличии подходящего индекса, а без подходящего индекса последовательное чтение останется в плане
+    """
+
+    def explain(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+            cursor.execute('RESET enable_seqscan')
+        return plan
+
+    def assertNoSeqScan(self, sql, params=None, table='habits_habit', index=None):
+        plan = self.explain(sql, params)
+        self.assertNotIn(f'Seq Scan on {table}', plan, msg=f'{sql}\n{plan}')
+        if index is not None:
+            self.assertIn(index, plan, msg=f'{sql}\n{plan}')
+        return plan
+
+    def assertEndpointNoSeqScan(self, url, table='habits_habit', index=None):
+        """Проверяет планы всех запросов эндпоинта к таблице. index должен использоваться хотя бы в одном из них"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        queries = [query['sql'] for query in context.captured_queries if table in query['sql']]
+        self.assertTrue(queries)
+        plans = [self.assertNoSeqScan(sql, table=table) for sql in queries]
+        if index is not None:
+            self.assertTrue(any(index in plan for plan in plans), msg='\n'.join(plans))
+        return response
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN проверяется только для PostgreSQL')
+class HabitQueryPlanTestCase(ExplainQueriesMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            User(email=f'user_{index}@test.com', password='test', telegram_chat_id=str(index)) for index in range(50)
+        )
+        Habit.objects.bulk_create(
+            Habit(
+                user=users[index % len(users)],
+                action=f'Habit_test_{index}',
+                lead_time=10,
+                time=datetime.time(index % 24, index % 60),
+                is_public=index % 10 == 0,
+                date_of_next_reminder_sending=datetime.date(2024, 7, 1) + datetime.timedelta(days=index % 7),
+            )
+            for index in range(5000)
+        )
+        cls.user = users[0]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE habits_habit')
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_habit_query_plan(self):
+        """Тестирование, что страницы списка привычек читаются по индексу"""
+        index = 'habit_user_time_idx'
+        response = self.assertEndpointNoSeqScan('/habit/list/?count=true', index=index)
+        self.assertEndpointNoSeqScan(response.json()['next'], index=index)
+        self.assertEndpointNoSeqScan(self.client.get(response.json()['next']).json()['previous'], index=index)
+
+    def test_public_list_habit_query_plan(self):
+        """Тестирование, что страницы ленты публичных привычек читаются по индексу"""
+        index = 'habit_public_time_idx'
+        response = self.assertEndpointNoSeqScan('/habit/public_list/?count=true', index=index)
+        self.assertEndpointNoSeqScan(response.json()['next'], index=index)
+
+    def test_retrieve_habit_query_plan(self):
+        """Тестирование, что привычка читается по индексу"""
+        habit = Habit.objects.filter(user=self.user).first()
+        self.assertEndpointNoSeqScan(f'/habit/{habit.id}/', index='habits_habit_pkey')
+
+    def test_due_reminders_query_plan(self):
+        """Тестирование, что напоминания выбираются по индексу"""
+        now = datetime.datetime(2024, 7, 3, 17, 5)
+        self.assertNoSeqScan(*get_due_reminders(now).query.sql_with_params(), index='habit_reminder_due_idx')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BenchmarkTestCase(TestCase):
+
+    def test_endpoints_cover_routes(self):
+        """Тестирование, что для каждого маршрута habits и users есть сценарий замера"""
+        self.assertEqual(get_missing_endpoints(), [])
+
+    def test_run_benchmark(self):
+        """Тестирование замера всех маршрутов на сгенерированных данных"""
+        user = seed(users=5, habits=50)
+
+        results = run_benchmark(user, repeat=2)
+
+        self.assertEqual(set(results), {endpoint.name for endpoint in ENDPOINTS})
+        # Страница ленты и пользователь JWT берутся из кэша, а со сброшенным кэшем страница читается из БД
+        self.assertEqual(results['habits-public_list']['queries'], 0)
+        for name in ('habits-list-cold', 'habits-list-cursor-cold', 'habits-public_list-cold',
+                     'habits-public_list-cursor-cold', 'habits-public_list-async-cold'):
+            self.assertEqual(results[name]['queries'], 1, name)
+        self.assertEqual(results['habits-public_list-count-cold']['queries'], 2)
+        for result in results.values():
+            self.assertEqual(set(result), {'queries', 'p50_ms', 'p95_ms', 'memory_kib'})
+
+    def test_compare(self):
+        """Тестирование сравнения результатов с базовыми"""
+        baseline = {'habit-get': {'queries': 2, 'p50_ms': 10, 'p95_ms': 20, 'memory_kib': 40}}
+
+        self.assertEqual(compare({'habit-get': {'queries': 2, 'p50_ms': 14, 'p95_ms': 29, 'memory_kib': 40}},
+                                 baseline, tolerance=0.5), [])
+        self.assertEqual(len(compare({'habit-get': {'queries': 3, 'p50_ms': 16, 'p95_ms': 20, 'memory_kib': 40}},
+                                     baseline, tolerance=0.5)), 2)
+
+
+@override_settings(TELEGRAM_RATE_LIMIT_REDIS_URL=None)
+class HabitReminderTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.now = datetime.datetime(2024, 7, 15, 17, 5)
+        self.user = User.objects.create(email='user@test.com', password='test', telegram_chat_id='1')
+
+    def create_habit(self, **kwargs):
+        return Habit.objects.create(user=self.user, action='Habit_test', lead_time=10, **kwargs)
+
+    def test_due_for_reminder(self):
+        """Тестирование выборки привычек для отправки напоминаний"""
+        due_today = self.create_habit(time='17:31:00', date_of_next_reminder_sending=self.now.date())
+        overdue = self.create_habit(time='17:00:00', date_of_next_reminder_sending=datetime.date(2024, 7, 1))
+        never_sent = self.create_habit(time='17:59:00')
+        self.create_habit(time='18:31:00', date_of_next_reminder_sending=self.now.date())
+        self.create_habit(time='17:31:00', date_of_next_reminder_sending=datetime.date(2024, 7, 16))
+        self.create_habit(date_of_next_reminder_sending=self.now.date())
+
+        self.assertQuerySetEqual(
+            Habit.objects.due_for_reminder(self.now).order_by('pk'),
+            [due_today, overdue, never_sent]
+        )
+
+    def test_get_due_reminders(self):
+        """Тестирование выборки напоминаний одним запросом вместе с chat_id владельца"""
+        habit = self.create_habit(time='17:31:00', place='Дом')
+        no_chat_user = User.objects.create(email='no_chat@test.com', password='test')
+        Habit.objects.create(user=no_chat_user, action='Habit_test', lead_time=10, time='17:31:00')
+
+        with self.assertNumQueries(1):
+            reminders = list(get_due_reminders(self.now))
+
+        self.assertEqual(
+            reminders,
+            [
+                {
+                    'id': habit.pk,
+                    'action': 'Habit_test',
+                    'time': datetime.time(17, 31),
+                    'place': 'Дом',
+                    'periodicity': 1,
+                    'date_of_next_reminder_sending': None,
+                    'chat_id': '1',
+                }
+            ]
+        )
+
+    def test_send_message_advances_reminders(self):
+        """Тестирование сдвига даты следующего напоминания после отправки"""
+        now = datetime.datetime.now()
+        user = User.objects.create(email='chat@test.com', password='test', telegram_chat_id='2')
+        habits = [
+            Habit.objects.create(user=user, action='Habit_test', lead_time=10, time=now.time(), periodicity=periodicity)
+            for periodicity in (1, 3)
+        ]
+
+        with StandInTelegramServer() as server, self.settings(TELEGRAM_API_URL=server.url):
+            result = send_reminders(now.isoformat(), None, None)
+
+        self.assertEqual(result, {'sent': 2, 'failed': 0, 'requeued': 0})
+        self.assertEqual(len(server.received), 2)
+        for habit in habits:
+            habit.refresh_from_db()
+            self.assertEqual(
+                habit.date_of_next_reminder_sending,
+                now.date() + datetime.timedelta(days=habit.periodicity)
+            )
+
+    def test_send_message_query_count(self):
+        """Тестирование, что число запросов не зависит от числа отправляемых напоминаний"""
+        now = datetime.datetime.now()
+        user = User.objects.create(email='chat@test.com', password='test', telegram_chat_id='2')
+
+        def create_habits(count):
+            Habit.objects.bulk_create(
+                Habit(user=user, action='Habit_test', lead_time=10, time=now.time(), periodicity=index % 7 + 1)
+                for index in range(count)
+            )
+
+        with StandInTelegramServer() as server, self.settings(TELEGRAM_API_URL=server.url):
+            create_habits(7)
+            with CaptureQueriesContext(connection) as small_tick:
+                send_reminders(now.isoformat(), None, None)
+
+            Habit.objects.all().delete()
+            create_habits(70)
+            with CaptureQueriesContext(connection) as large_tick:
+                send_reminders(now.isoformat(), None, None)
+
+        self.assertEqual(len(server.received), 77)
+        self.assertEqual(len(small_tick.captured_queries), len(large_tick.captured_queries))
+
+    @mock.patch('habits.tasks.REMINDER_BATCH_SIZE', 2)
+    def test_send_message_advances_each_batch(self):
+        """Тестирование, что отправленные пачки сдвигаются, даже если задача прервалась на следующей пачке"""
+        now = datetime.datetime.now()
+        habits = [self.create_habit(time=now.time()) for _ in range(4)]
+        send_messages = TelegramClient.send_messages
+        batches = []
+
+        def send_first_batch(client, messages):
+            batches.append(messages)
+            if len(batches) > 1:
+                raise RuntimeError('Воркер остановлен')
+            return send_messages(client, messages)
+
+        with StandInTelegramServer() as server, self.settings(TELEGRAM_API_URL=server.url), \
+                mock.patch.object(TelegramClient, 'send_messages', send_first_batch), \
+                self.assertRaises(RuntimeError):
+            send_reminders(now.isoformat(), None, None)
+
+        self.assertEqual(len(server.received), 2)
+        self.assertEqual(Habit.objects.filter(pk__in=[habit.pk for habit in habits],
+                                              date_of_next_reminder_sending__isnull=False).count(), 2)
+
+    def test_send_message_keeps_failed_reminders_due(self):
+        """Тестирование, что привычка с неотправленным напоминанием остается к отправке"""
+        now = datetime.datetime.now()
+        user = User.objects.create(email='chat@test.com', password='test', telegram_chat_id='404')
+        habit = Habit.objects.create(user=user, action='Habit_test', lead_time=10, time=now.time())
+
+        with StandInTelegramServer(failing_chat_ids=['404']) as server, self.settings(TELEGRAM_API_URL=server.url), \
+                self.assertLogs('habits.telegram', 'WARNING'):
+            result = send_reminders(now.isoformat(), None, None)
+
+        habit.refresh_from_db()
+        self.assertEqual(result, {'sent': 0, 'failed': 1, 'requeued': 0})
+        self.assertIsNone(habit.date_of_next_reminder_sending)
+
+    @override_settings(TELEGRAM_MAX_ATTEMPTS=2)
+    def test_send_message_requeues_throttled_reminders(self):
+        """Тестирование повторной отправки напоминаний, отправку которых ограничил Telegram"""
+        now = datetime.datetime.now()
+        user = User.objects.create(email='chat@test.com', password='test', telegram_chat_id='429')
+        habit = Habit.objects.create(user=user, action='Habit_test', lead_time=10, time=now.time())
+
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+
+        with StandInTelegramServer(throttled_chat_ids={'429': 2}, retry_after=0.01) as server, \
+                self.settings(TELEGRAM_API_URL=server.url), self.assertLogs('habits', 'INFO'):
+            result = send_reminders(now.isoformat(), None, None)
+
+        habit.refresh_from_db()
+        self.assertEqual(result, {'sent': 0, 'failed': 0, 'requeued': 1})
+        self.assertEqual(len(server.received), 3)
+        self.assertEqual(habit.date_of_next_reminder_sending, now.date() + datetime.timedelta(days=1))
+
+    @override_settings(REMINDER_MAX_ATTEMPTS=2)
+    def test_send_message_requeues_rate_limited_reminders(self):
+        """Тестирование, что сообщения, отложенные ограничителем частоты, откладываются и на последней попытке"""
+        now = datetime.datetime.now()
+        habit = self.create_habit(time=now.time())
+        deferred = DeliveryResult(chat_id='1', ok=False, error='Отправка в чат ограничена', retry_after=0.5)
+
+        with mock.patch.object(TelegramClient, 'send_messages', return_value=[deferred]), \
+                mock.patch('habits.tasks.send_reminders.apply_async') as apply_async, self.assertLogs('habits', 'INFO'):
+            result = send_reminders(now.isoformat(), None, None, attempt=2)
+
+        self.assertEqual(result, {'sent': 0, 'failed': 0, 'requeued': 1})
+        apply_async.assert_called_once_with((now.isoformat(), None, None), {'habit_ids': [habit.pk], 'attempt': 3},
+                                            countdown=1)
+
+    @mock.patch('habits.services.REMINDER_BATCH_SIZE', 10)
+    def test_split_reminder_shards(self):
+        """Тестирование разбиения привычек с напоминанием на диапазоны id"""
+        habits = [self.create_habit(time='17:31:00') for _ in range(25)]
+        first_id, last_id = habits[0].pk, habits[-1].pk
+
+        self.assertEqual(split_reminder_shards(self.now, max_shards=8), [
+            (first_id, first_id + 8),
+            (first_id + 9, first_id + 17),
+            (first_id + 18, last_id),
+        ])
+        self.assertEqual(split_reminder_shards(self.now, max_shards=1), [(first_id, last_id)])
+        self.assertEqual(split_reminder_shards(self.now + datetime.timedelta(hours=1), max_shards=8), [])
+
+    @mock.patch('habits.services.REMINDER_BATCH_SIZE', 10)
+    def test_send_message_fan_out(self):
+        """Тестирование рассылки напоминаний параллельными задачами по диапазонам id"""
+        now = datetime.datetime.now()
+        user = User.objects.create(email='chat@test.com', password='test', telegram_chat_id='2')
+        Habit.objects.bulk_create(
+            Habit(user=user, action='Habit_test', lead_time=10, time=now.time()) for _ in range(25)
+        )
+
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+
+        with StandInTelegramServer() as server, self.settings(TELEGRAM_API_URL=server.url, REMINDER_SHARDS=2), \
+                mock.patch('habits.tasks.logger') as logger:
+            result = send_message()
+
+        self.assertEqual(result, {'shards': 2})
+        logger.info.assert_called_once_with(mock.ANY, {'shards': 2, 'sent': 25, 'failed': 0, 'requeued': 0})
+        self.assertEqual(len(server.received), 25)
+        self.assertFalse(Habit.objects.filter(date_of_next_reminder_sending__isnull=True).exists())
+
+
+class TelegramClientTestCase(TestCase):
+
+    def test_send_messages(self):
+        """Тестирование параллельной отправки сообщений с результатом по каждому сообщению"""
+        messages = [(str(chat_id), f'Сообщение {chat_id}') for chat_id in range(20)]
+
+        with StandInTelegramServer(failing_chat_ids=['13']) as server, self.assertLogs('habits.telegram', 'WARNING'):
+            with TelegramClient(token='test', api_url=server.url, max_workers=4) as client:
+                results = client.send_messages(messages)
+
+        self.assertEqual([result.chat_id for result in results], [chat_id for chat_id, _ in messages])
+        self.assertEqual([result.chat_id for result in results if not result.ok], ['13'])
+        self.assertEqual(results[13].status_code, 400)
+        self.assertCountEqual(server.received, [{'chat_id': chat_id, 'text': text} for chat_id, text in messages])
+
+    def test_send_message_timeout(self):
+        """Тестирование, что превышение времени ожидания отмечается как ошибка отправки"""
+        with StandInTelegramServer(delay=0.5) as server, self.assertLogs('habits.telegram', 'WARNING'):
+            with TelegramClient(token='test', api_url=server.url, timeout=0.05) as client:
+                result = client.send_message('1', 'Сообщение')
+
+        self.assertFalse(result.ok)
+        self.assertIsNone(result.status_code)
+
+    def test_send_message_retry_after(self):
+        """Тестирование повторной отправки после ответа 429"""
+        with StandInTelegramServer(throttled_chat_ids={'1': 1}, retry_after=0.1) as server, \
+                self.assertLogs('habits.telegram', 'INFO'):
+            with TelegramClient(token='test', api_url=server.url) as client:
+                result = client.send_message('1', 'Сообщение')
+
+        self.assertTrue(result.ok)
+        self.assertEqual(len(server.received), 2)
+
+
+def redis_available():
+    try:
+        return redis.Redis.from_url(TEST_REDIS_URL).ping()
+    except redis.RedisError:
+        return False
+
+
+@skipUnless(redis_available(), 'Redis недоступен')
+class TelegramRateLimiterTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.client = redis.Redis.from_url(TEST_REDIS_URL)
+        self.key_prefix = f'test:telegram:ratelimit:{uuid.uuid4()}'
+        self.addCleanup(self.delete_keys)
+
+    def delete_keys(self):
+        keys = list(self.client.scan_iter(f'{self.key_prefix}:*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def get_rate_limiter(self, **kwargs):
+        return TelegramRateLimiter(self.client, key_prefix=self.key_prefix, **kwargs)
+
+    def test_global_bucket(self):
+        """Тестирование общего ограничения частоты отправки"""
+        rate_limiter = self.get_rate_limiter(rate=5, chat_rate=5)
+
+        self.assertEqual([rate_limiter.try_acquire(chat_id) for chat_id in range(5)], [(0, False)] * 5)
+        wait, chat_limited = rate_limiter.try_acquire(5)
+        self.assertGreater(wait, 0)
+        self.assertFalse(chat_limited)
+
+    def test_chat_bucket(self):
+        """Тестирование ограничения частоты отправки в один чат"""
+        rate_limiter = self.get_rate_limiter(rate=30, chat_rate=1)
+
+        self.assertEqual(rate_limiter.try_acquire(1), (0, False))
+        wait, chat_limited = rate_limiter.try_acquire(1)
+        self.assertAlmostEqual(wait, 1, delta=0.1)
+        self.assertTrue(chat_limited)
+        self.assertEqual(rate_limiter.try_acquire(2), (0, False))
+
+    def test_shared_between_instances(self):
+        """Тестирование, что ограничение общее для всех воркеров"""
+        self.assertEqual(self.get_rate_limiter(rate=30, chat_rate=1).try_acquire(1), (0, False))
+        self.assertGreater(self.get_rate_limiter(rate=30, chat_rate=1).try_acquire(1)[0], 0)
+
+    def test_block(self):
+        """Тестирование приостановки отправки в чат на retry_after секунд, а боту — не дольше max_bot_block"""
+        rate_limiter = self.get_rate_limiter(rate=30, chat_rate=1, max_bot_block=0.5)
+        rate_limiter.block(1, retry_after=2)
+
+        self.assertAlmostEqual(rate_limiter.try_acquire(1)[0], 2, delta=0.1)
+        wait, chat_limited = rate_limiter.try_acquire(2)
+        self.assertAlmostEqual(wait, 0.5, delta=0.1)
+        self.assertFalse(chat_limited)
+
+        # Паузу бота acquire ждет, паузу чата — нет
+        started = time.monotonic()
+        self.assertEqual(rate_limiter.acquire(2), 0)
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        self.assertGreater(rate_limiter.acquire(1), 1)
+
+    def test_send_messages_honors_retry_after(self):
+        """Тестирование, что после ответа 429 чат приостанавливается, а сообщение откладывается без ожидания"""
+        rate_limiter = self.get_rate_limiter(rate=100, chat_rate=100, max_bot_block=0)
+
+        with StandInTelegramServer(throttled_chat_ids={'1': 1}, retry_after=30) as server, \
+                self.assertLogs('habits.telegram', 'INFO'):
+            with TelegramClient(token='test', api_url=server.url, rate_limiter=rate_limiter) as client:
+                started = time.monotonic()
+                first = client.send_message('1', 'Сообщение')
+                second = client.send_messages([('1', 'Сообщение'), ('2', 'Сообщение')])
+                elapsed = time.monotonic() - started
+
+        self.assertEqual((first.ok, first.status_code, first.retry_after), (False, 429, 30))
+        self.assertFalse(second[0].ok)
+        self.assertIsNone(second[0].status_code)
+        self.assertAlmostEqual(second[0].retry_after, 30, delta=1)
+        self.assertTrue(second[1].ok)
+        self.assertEqual(len(server.received), 2)
+        self.assertLess(elapsed, 1)
+
+    def test_send_messages_one_chat_does_not_hold_workers(self):
+        """Тестирование, что сообщения в ограниченный чат не занимают потоки, пока ждут другие чаты"""
+        rate_limiter = self.get_rate_limiter(rate=100, chat_rate=1)
+        messages = [('1', 'Сообщение')] * 16 + [(str(chat_id), 'Сообщение') for chat_id in range(2, 18)]
+
+        with StandInTelegramServer() as server:
+            with TelegramClient(token='test', api_url=server.url, rate_limiter=rate_limiter, max_workers=8) as client:
+                started = time.monotonic()
+                results = client.send_messages(messages)
+                elapsed = time.monotonic() - started
+
+        self.assertEqual(sum(result.ok for result in results[:16]), 1)
+        self.assertTrue(all(result.retry_after for result in results[:16] if not result.ok))
+        self.assertTrue(all(result.ok for result in results[16:]))
+        self.assertEqual(len(server.received), 17)
+        self.assertLess(elapsed, 1)
+
+    def test_send_message_redis_error(self):
+        """Тестирование, что при недоступном Redis сообщение отправляется без ограничителя"""
+        rate_limiter = self.get_rate_limiter()
+
+        with StandInTelegramServer() as server, self.assertLogs('habits.telegram', 'WARNING'), \
+                mock.patch.object(rate_limiter, 'script', side_effect=redis.ConnectionError('Redis недоступен')):
+            with TelegramClient(token='test', api_url=server.url, rate_limiter=rate_limiter) as client:
+                result = client.send_message('1', 'Сообщение')
+
+        self.assertTrue(result.ok)
+        self.assertEqual(len(server.received), 1)
@@ -1,7 +1,9 @@
 from django.urls import path
 
 from habits.views import HabitCreateAPIView, HabitUpdateAPIView, HabitDestroyAPIView, HabitRetrieveAPIView, HabitListAPIView, \
-    HabitPublicListAPIView
+    HabitPublicListAPIView, HabitBulkAPIView, HabitSyncAPIView, HabitRetrieveAsyncAPIView, HabitListAsyncAPIView, \
+    HabitPublicListAsyncAPIView, HabitCompletionAPIView, HabitStatsAPIView, \
+    HabitSummaryAPIView, HabitExportAPIView, HabitImportAPIView
 from users.apps import UsersConfig
 
 app_name = UsersConfig.name
@@ -14,4 +16,14 @@ urlpatterns = [
     path('<int:pk>/', HabitRetrieveAPIView.as_view(), name='habit-get'),
     path('list/', HabitListAPIView.as_view(), name='habits-list'),
     path('public_list/', HabitPublicListAPIView.as_view(), name='habits-public_list'),
+    path('bulk/', HabitBulkAPIView.as_view(), name='habits-bulk'),
+    path('sync/', HabitSyncAPIView.as_view(), name='habits-sync'),
+    path('async/<int:pk>/', HabitRetrieveAsyncAPIView.as_view(), name='habit-get-async'),
+    path('async/list/', HabitListAsyncAPIView.as_view(), name='habits-list-async'),
+    path('async/public_list/', HabitPublicListAsyncAPIView.as_view(), name='habits-public_list-async'),
+    path('<int:pk>/complete/', HabitCompletionAPIView.as_view(), name='habit-complete'),
+    path('stats/', HabitStatsAPIView.as_view(), name='habits-stats'),
+    path('summary/', HabitSummaryAPIView.as_view(), name='habits-summary'),
+    path('export/', HabitExportAPIView.as_view(), name='habits-export'),
+    path('import/', HabitImportAPIView.as_view(), name='habits-import'),
 ]
@@ -1,68 +1,71 @@
 from rest_framework.exceptions import ValidationError
 
-from habits.models import Habit
 
-
-class LeadTimeValidator:
-    """Проверка времени на выполнение привычки"""
+class HabitFieldValidator:
+    """
+    Базовый валидатор привычки.
+    Значения берутся из проверяемых данных без копирования, а при частичном обновлении недостающие поля —
+    из уже загруженной привычки. Для связанной привычки берется ее id, чтобы не загружать ее отдельным запросом
+    """
+    requires_context = True
 
     def __init__(self, field):
         self.field = field
 
-    def __call__(self, value):
-        tmp_val = dict(value).get(self.field)
-        if tmp_val > 120:
+    @staticmethod
+    def get(value, serializer, field):
+        if field in value:
+            return value[field]
+        if serializer.instance is not None:
+            return getattr(serializer.instance, serializer.instance._meta.get_field(field).attname)
+        return None
+
+
+class LeadTimeValidator(HabitFieldValidator):
+    """Проверка времени на выполнение привычки"""
+
+    def __call__(self, value, serializer):
+        tmp_val = self.get(value, serializer, self.field)
+        if tmp_val is not None and tmp_val > 120:
             raise ValidationError('Время на выполнение должно быть не больше 120 минут')
 
 
-class PeriodicityValidator:
+class PeriodicityValidator(HabitFieldValidator):
     """Проверка периодичности выполнения в днях"""
 
-    def __init__(self, field):
-        self.field = field
-
-    def __call__(self, value):
-        tmp_val = dict(value).get(self.field)
-        if tmp_val > 7:
+    def __call__(self, value, serializer):
+        tmp_val = self.get(value, serializer, self.field)
+        if tmp_val is not None and tmp_val > 7:
             raise ValidationError('Периодичность выполнения должна быть не реже, чем 1 раз за 7 дней')
 
 
-class AssociatedHabitOrRewardValidator:
+class AssociatedHabitOrRewardValidator(HabitFieldValidator):
     """Проверка, что вознаграждени и связанная привычка не назначены одновременно"""
 
-    def __init__(self, field):
-        self.field = field
-
-    def __call__(self, value):
-        associated_habit = dict(value).get('associated_habit')
-        reward = dict(value).get(self.field)
+    def __call__(self, value, serializer):
+        associated_habit = self.get(value, serializer, 'associated_habit')
+        reward = self.get(value, serializer, self.field)
         if associated_habit is not None and reward is not None:
             raise ValidationError('Нельзя назначить вознаграждение и связанную привычку одновременно')
 
 
-class PleasurableHabitValidator:
+class PleasurableHabitValidator(HabitFieldValidator):
     """Проверка, что у приятной привычки не назначено вознаграждение или связанная привычка"""
 
-    def __init__(self, field):
-        self.field = field
-
-    def __call__(self, value):
-        is_pleasurable = dict(value).get('is_pleasurable')
-        tmp_val = dict(value).get(self.field)
+    def __call__(self, value, serializer):
+        is_pleasurable = self.get(value, serializer, 'is_pleasurable')
+        tmp_val = self.get(value, serializer, self.field)
         if is_pleasurable and tmp_val is not None:
             raise ValidationError('Нельзя назначить вознаграждение или связанную привычку для приятной привычки')
 
 
-class AssociatedHabitIsPleasurableHabitValidator:
-    """Проверка, что связанная привычка является приятной"""
-
-    def __init__(self, field):
-        self.field = field
-
-    def __call__(self, value):
-        associated_habit = dict(value).get(self.field)
-        if associated_habit is not None:
-            habit = Habit.objects.get(pk=associated_habit.pk)
+class AssociatedHabitIsPleasurableHabitValidator(HabitFieldValidator):
+    """
+    Проверка, что связанная привычка является приятной.
+    Связанная привычка уже загружена полем сериализатора, повторный запрос не нужен
+    """
 
-            if not habit.is_pleasurable:
-                raise ValidationError('Связанная привычка должна быть приятной')
+    def __call__(self, value, serializer):
+        associated_habit = value.get(self.field)
+        if associated_habit is not None and not associated_habit.is_pleasurable:
+            raise ValidationError('Связанная привычка должна быть приятной')
@@ -1,10 +1,146 @@
-from rest_framework import generics
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import generics, status
+from rest_framework.exceptions import NotFound, ParseError, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
+from habits.cache import aget_public_habits_cache_key, aget_user_habits_cache_key, get_public_habits_cache_key, \
+    get_user_habits_cache_key, invalidate_public_habits, invalidate_user_habits
+from habits.completions import get_user_stats, rebuild_habit_stats, record_completion
+from habits.conditional import ConditionalGetMixin
+from habits.export import EXPORT_FORMATS
+from habits.importer import IMPORT_READERS, import_habits, ImportFormatError
 from habits.models import Habit
-from habits.paginator import HabitPaginator
+from habits.paginator import HabitCursorPaginator
 from habits.permissions import IsOwner
-from habits.serializers import HabitSerializer, HabitPublicSerializer
+from habits.serializers import HabitSerializer, HabitPublicSerializer, HabitOperationSerializer, ValuesSerializer, \
+    HabitCompletionSerializer, HabitStatsSerializer
+from habits.services import apply_habit_operations, delete_habits
+from habits.summary import get_bucket, get_user_summary, update_summary
+from habits.sync import get_habit_changes, SyncCursor
+
+
+class AsyncAPIViewMixin:
+    """
+    Асинхронная обработка запроса в представлениях DRF.
+    Аутентификация, проверка прав и выбор рендерера могут обращаться к БД, поэтому выполняются в потоке,
+    а обработчики get и т.п. — асинхронные и работают с асинхронным ORM и кэшем
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aget_object(self):
+        """То же, что get_object, через асинхронный ORM"""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, DjangoValidationError, TypeError, ValueError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+class ValuesListMixin:
+    """
+    Список только на чтение, который читает строки queryset.values() и сериализует их values_serializer,
+    не создавая модели и не вызывая поля DRF для каждой привычки
+    """
+    values_serializer = None
+
+    def get_values_queryset(self):
+        fields = dict.fromkeys(self.values_serializer.fields + getattr(self.paginator, 'position_fields', ()))
+        return self.filter_queryset(self.get_queryset()).values(*fields)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_values_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.values_serializer.to_representation(page))
+        return Response(self.values_serializer.to_representation(queryset))
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.get_values_queryset()
+        if self.paginator is not None:
+            page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+            return self.get_paginated_response(self.values_serializer.to_representation(page))
+        return Response(self.values_serializer.to_representation([row async for row in queryset]))
+
+
+class CachedListMixin:
+    """
+    Список, страницы которого кэшируются под ключом get_cache_key(request) с версией данных.
+    ETag строится по тому же ключу, поэтому ответ 304 не требует ни запроса к БД, ни чтения страницы из кэша
+    """
+
+    def get_cache_key(self, request):
+        raise NotImplementedError
+
+    async def aget_cache_key(self, request):
+        raise NotImplementedError
+
+    def get_cache_timeout(self):
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        cache_key = self.get_cache_key(request)
+        not_modified = self.get_not_modified_response(request, etag=self.make_etag(request, cache_key))
+        if not_modified is not None:
+            return not_modified
+
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        cache.set(cache_key, response.data, self.get_cache_timeout())
+        return response
+
+    async def alist(self, request, *args, **kwargs):
+        cache_key = await self.aget_cache_key(request)
+        not_modified = self.get_not_modified_response(request, etag=self.make_etag(request, cache_key))
+        if not_modified is not None:
+            return not_modified
+
+        data = await cache.aget(cache_key)
+        if data is not None:
+            return Response(data)
+
+        response = await super().alist(request, *args, **kwargs)
+        await cache.aset(cache_key, response.data, self.get_cache_timeout())
+        return response
 
 
 class HabitCreateAPIView(generics.CreateAPIView):
@@ -13,35 +149,96 @@ class HabitCreateAPIView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
-        new_habit = serializer.save()
-        new_habit.user = self.request.user
-        new_habit.save()
+        with transaction.atomic():
+            new_habit = serializer.save(user=self.request.user)
+            update_summary(added=[get_bucket(new_habit)])
 
+        invalidate_user_habits(new_habit.user_id)
+        if new_habit.is_public:
+            invalidate_public_habits()
 
-class HabitListAPIView(generics.ListAPIView):
-    """Эндпоинт списка привычек"""
+
+class HabitListAPIView(ConditionalGetMixin, CachedListMixin, ValuesListMixin, generics.ListAPIView):
+    """
+    Эндпоинт списка привычек.
+    Страницы кэшируются под версией списка пользователя, которую увеличивает каждое изменение его привычек
+    """
     serializer_class = HabitSerializer
+    values_serializer = ValuesSerializer(HabitSerializer)
     permission_classes = [IsAuthenticated, IsOwner]
-    pagination_class = HabitPaginator
+    pagination_class = HabitCursorPaginator
 
     def get_queryset(self):
         return Habit.objects.filter(user=self.request.user)
 
+    def get_cache_key(self, request):
+        return get_user_habits_cache_key(request)
+
+    async def aget_cache_key(self, request):
+        return await aget_user_habits_cache_key(request)
+
+    def get_cache_timeout(self):
+        return settings.USER_HABITS_CACHE_TIMEOUT
 
-class HabitPublicListAPIView(generics.ListAPIView):
-    """Эндпоинт списка публичных привычек"""
+
+class HabitListAsyncAPIView(AsyncAPIViewMixin, HabitListAPIView):
+    """Асинхронный эндпоинт списка привычек"""
+
+    async def get(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
+
+
+class HabitPublicListAPIView(ConditionalGetMixin, CachedListMixin, ValuesListMixin, generics.ListAPIView):
+    """Эндпоинт списка публичных привычек. Страницы кэшируются под версией ленты"""
     serializer_class = HabitPublicSerializer
+    values_serializer = ValuesSerializer(HabitPublicSerializer)
     permission_classes = [IsAuthenticated]
-    pagination_class = HabitPaginator
+    pagination_class = HabitCursorPaginator
     queryset = Habit.objects.filter(is_public=True)
 
+    def get_cache_key(self, request):
+        return get_public_habits_cache_key(request)
+
+    async def aget_cache_key(self, request):
+        return await aget_public_habits_cache_key(request)
 
-class HabitRetrieveAPIView(generics.RetrieveAPIView):
-    """Эндпоинт просмотра привычки"""
+    def get_cache_timeout(self):
+        return settings.PUBLIC_HABITS_CACHE_TIMEOUT
+
+
+class HabitPublicListAsyncAPIView(AsyncAPIViewMixin, HabitPublicListAPIView):
+    """Асинхронный эндпоинт списка публичных привычек"""
+
+    async def get(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
+
+
+class HabitRetrieveAPIView(ConditionalGetMixin, generics.RetrieveAPIView):
+    """Эндпоинт просмотра привычки. ETag и Last-Modified берутся из даты изменения привычки"""
     serializer_class = HabitSerializer
     queryset = Habit.objects.all()
     permission_classes = [IsAuthenticated, IsOwner]
 
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_object_response(request, self.get_object())
+
+    def get_object_response(self, request, instance):
+        not_modified = self.get_not_modified_response(
+            request,
+            etag=self.make_etag(request, instance.pk, instance.updated_at.isoformat()),
+            last_modified=instance.updated_at,
+        )
+        if not_modified is not None:
+            return not_modified
+        return Response(self.get_serializer(instance).data)
+
+
+class HabitRetrieveAsyncAPIView(AsyncAPIViewMixin, HabitRetrieveAPIView):
+    """Асинхронный эндпоинт просмотра привычки"""
+
+    async def get(self, request, *args, **kwargs):
+        return self.get_object_response(request, await self.aget_object())
+
 
 class HabitUpdateAPIView(generics.UpdateAPIView):
     """Эндпоинт редактирования привычки"""
@@ -49,8 +246,191 @@ class HabitUpdateAPIView(generics.UpdateAPIView):
     queryset = Habit.objects.all()
     permission_classes = [IsAuthenticated, IsOwner]
 
+    def perform_update(self, serializer):
+        was_public = serializer.instance.is_public
+        old_periodicity = serializer.instance.periodicity
+        old_bucket = get_bucket(serializer.instance)
+        with transaction.atomic():
+            habit = serializer.save()
+            update_summary(added=[get_bucket(habit)], removed=[old_bucket])
+
+        # Серии выполнений зависят от периодичности
+        if habit.periodicity != old_periodicity:
+            rebuild_habit_stats([habit.pk])
+        invalidate_user_habits(habit.user_id)
+        if was_public or habit.is_public:
+            invalidate_public_habits()
+
 
 class HabitDestroyAPIView(generics.DestroyAPIView):
     """Эндпоинт удаления привычки"""
     queryset = Habit.objects.all()
     permission_classes = [IsAuthenticated, IsOwner]
+
+    def perform_destroy(self, instance):
+        delete_habits([instance])
+
+
+class HabitBulkAPIView(generics.GenericAPIView):
+    """
+    Эндпоинт пакетного создания, редактирования и удаления привычек.
+    Принимает список операций {"op": "create" | "update" | "delete", "id": ..., "data": {...}}
+    и применяет их в одной транзакции, только если все операции прошли проверку
+    """
+    serializer_class = HabitOperationSerializer
+    permission_classes = [IsAuthenticated]
+    max_operations = 500
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True, max_length=self.max_operations)
+        serializer.is_valid(raise_exception=True)
+
+        results, errors = apply_habit_operations(request.user, serializer.validated_data)
+        if results is None:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(results, status=status.HTTP_200_OK)
+
+
+class HabitSyncAPIView(generics.GenericAPIView):
+    """
+    Эндпоинт синхронизации привычек.
+    Возвращает привычки, измененные с прошлой синхронизации, id удаленных привычек и курсор для следующего запроса.
+    Пока has_more равен true, клиент сразу запрашивает следующую порцию с новым курсором
+    """
+    serializer_class = HabitSerializer
+    permission_classes = [IsAuthenticated]
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_limit = 100
+    max_limit = 1000
+    invalid_cursor_message = 'Неверный курсор'
+
+    def get(self, request, *args, **kwargs):
+        changed, deleted, cursor, has_more = get_habit_changes(
+            request.user, cursor=self.get_cursor(), limit=self.get_limit()
+        )
+        return Response({
+            'changed': self.get_serializer(changed, many=True).data,
+            'deleted': deleted,
+            'cursor': cursor.encode(),
+            'has_more': has_more,
+        })
+
+    def get_cursor(self):
+        encoded = self.request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            return SyncCursor.decode(encoded)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        if limit <= 0:
+            return self.default_limit
+        return min(limit, self.max_limit)
+
+
+class HabitCompletionAPIView(generics.GenericAPIView):
+    """
+    Эндпоинт отметки о выполнении привычки.
+    Возвращает обновленную статистику привычки: 201, если выполнение отмечено, 200, если оно уже было отмечено
+    """
+    serializer_class = HabitCompletionSerializer
+    queryset = Habit.objects.all()
+    permission_classes = [IsAuthenticated, IsOwner]
+
+    def post(self, request, *args, **kwargs):
+        habit = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        stats, created = record_completion(habit, serializer.validated_data.get('completed_on', timezone.localdate()))
+        return Response(HabitStatsSerializer(stats).data,
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class HabitStatsAPIView(generics.GenericAPIView):
+    """Эндпоинт статистики выполнения привычек пользователя: серии и доля выполнения по каждой привычке"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_user_stats(request.user))
+
+
+class HabitSummaryAPIView(generics.GenericAPIView):
+    """Эндпоинт сводки по привычкам пользователя: всего, публичные и личные, приятные и полезные, по периодичности"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_user_summary(request.user))
+
+
+class HabitExportAPIView(generics.GenericAPIView):
+    """
+    Эндпоинт выгрузки всех привычек пользователя в NDJSON или CSV (параметр export_format).
+    Ответ передается потоком по мере чтения привычек серверным курсором частями по chunk_size строк
+    """
+    serializer_class = HabitSerializer
+    values_serializer = ValuesSerializer(HabitSerializer)
+    permission_classes = [IsAuthenticated]
+    # Параметр format уже занят DRF для выбора рендерера
+    export_format_query_param = 'export_format'
+    default_export_format = 'ndjson'
+    chunk_size = 2000
+    first_chunk_size = 100
+
+    def get_queryset(self):
+        # Порядок совпадает с индексом habit_user_time_idx, поэтому строки читаются без сортировки
+        return Habit.objects.filter(user=self.request.user).order_by('-time', 'id').values(
+            *self.values_serializer.fields,
+        )
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get(self.export_format_query_param, self.default_export_format)
+        export_class = EXPORT_FORMATS.get(export_format)
+        if export_class is None:
+            raise ValidationError({self.export_format_query_param: [
+                f'Неизвестный формат выгрузки, допустимые: {", ".join(EXPORT_FORMATS)}'
+            ]})
+
+        export = export_class(self.get_queryset(), self.values_serializer, self.chunk_size, self.first_chunk_size)
+        content = aiter(export) if isinstance(request._request, ASGIRequest) else iter(export)
+        response = StreamingHttpResponse(content, content_type=export.content_type)
+        response['Content-Disposition'] = f'attachment; filename="habits.{export.extension}"'
+        # Отключает буферизацию ответа в nginx
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class HabitImportAPIView(generics.GenericAPIView):
+    """
+    Эндпоинт импорта привычек из файла CSV или JSON (массив или NDJSON), переданного в поле file.
+    Формат берется из параметра import_format или расширения файла. Файл разбирается и сохраняется частями,
+    строки с ошибками пропускаются. Возвращает отчет: число строк, созданных привычек, ошибки по строкам и скорость
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    import_format_query_param = 'import_format'
+
+    def post(self, request, *args, **kwargs):
+        file = request.data.get('file')
+        if file is None:
+            raise ValidationError({'file': ['Файл не передан']})
+
+        import_format = request.data.get(self.import_format_query_param) or file.name.rpartition('.')[2].lower()
+        reader = IMPORT_READERS.get(import_format)
+        if reader is None:
+            raise ValidationError({self.import_format_query_param: [
+                f'Неизвестный формат импорта, допустимые: {", ".join(IMPORT_READERS)}'
+            ]})
+
+        try:
+            report = import_habits(request.user, reader(file))
+        except ImportFormatError as exc:
+            raise ParseError(str(exc))
+        return Response(report.as_dict())
@@ -0,0 +1,60 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from users.cache import get_user_cache_key
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Аутентификация по JWT, которая берет пользователя из кэша вместо запроса к users_user.
+    В кэше хранятся только поля, нужные для проверок JWTAuthentication.get_user: id, is_active
+    и, если включен CHECK_REVOKE_TOKEN, MD5 от хэша пароля. Пользователь из кэша возвращается
+    с отложенными остальными полями, они загружаются из БД при первом обращении.
+    Запись хранится не дольше AUTH_USER_CACHE_TIMEOUT и не дольше срока действия токена, а при изменении
+    или удалении пользователя удаляется из кэша (User.save, User.delete, UserQuerySet.update и delete).
+    Кэш должен быть общим для всех процессов приложения, иначе сброс виден только изменившему процессу
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = get_user_cache_key(user_id)
+        cached = cache.get(key)
+        if cached is None:
+            user = super().get_user(validated_token)
+            timeout = settings.AUTH_USER_CACHE_TIMEOUT
+            if 'exp' in validated_token:
+                timeout = min(timeout, int(validated_token['exp'] - time.time()))
+            if timeout > 0:
+                cache.set(key, self.get_cached_fields(user), timeout)
+            return user
+
+        # Проверки JWTAuthentication.get_user для пользователя из кэша
+        if not cached['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != cached['password_hash']:
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return self.user_model.from_db(
+            router.db_for_read(self.user_model),
+            [self.user_model._meta.pk.attname, 'is_active'],
+            [cached['id'], cached['is_active']],
+        )
+
+    @staticmethod
+    def get_cached_fields(user):
+        return {
+            'id': user.pk,
+            'is_active': user.is_active,
+            'password_hash': get_md5_hash_password(user.password) if api_settings.CHECK_REVOKE_TOKEN else None,
+        }
@@ -0,0 +1,22 @@
+from django.core.cache import cache
+from django.db import transaction
+
+USER_CACHE_KEY = 'users:auth:{user_id}'
+
+
+def get_user_cache_key(user_id):
+    return USER_CACHE_KEY.format(user_id=user_id)
+
+
+def invalidate_cached_user(*user_ids):
+    """
+    Удаляет пользователей из кэша аутентификации.
+    Внутри транзакции записи удаляются еще раз после ее фиксации, чтобы запрос, прочитавший
+    пользователя до фиксации, не оставил в кэше устаревшие данные
+    """
+    keys = [get_user_cache_key(user_id) for user_id in user_ids if user_id is not None]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,48 @@
+from django.core.management import BaseCommand, CommandError
+
+from habits.importer import IMPORT_CHUNK_SIZE, IMPORT_READERS, import_habits, ImportFormatError
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Команда для импорта привычек пользователя из файла CSV или JSON (массив или NDJSON).
+    Файл читается и сохраняется частями, после каждой части выводится прогресс, в конце — ошибки по строкам
+    """
+    help = 'Импорт привычек пользователя из файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу')
+        parser.add_argument('--email', required=True, help='Почта пользователя, которому добавляются привычки')
+        parser.add_argument('--format', choices=sorted(IMPORT_READERS), dest='import_format',
+                            help='Формат файла, по умолчанию по расширению')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help='Количество строк в одной части')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {options["email"]} не найден')
+
+        import_format = options['import_format'] or options['path'].rpartition('.')[2].lower()
+        reader = IMPORT_READERS.get(import_format)
+        if reader is None:
+            raise CommandError(f'Неизвестный формат импорта, допустимые: {", ".join(IMPORT_READERS)}')
+
+        def on_chunk(report):
+            self.stdout.write(f'Строк {report.rows}, создано {report.created}, с ошибками {report.failed}, '
+                              f'{report.rows_per_second} строк/с')
+
+        with open(options['path'], 'rb') as file:
+            try:
+                report = import_habits(user, reader(file), chunk_size=options['chunk_size'], on_chunk=on_chunk)
+            except ImportFormatError as exc:
+                raise CommandError(str(exc))
+
+        for error in report.errors:
+            self.stdout.write(f'Строка {error["row"]}: {error["errors"]}')
+        if report.failed > len(report.errors):
+            self.stdout.write(f'И еще строк с ошибками: {report.failed - len(report.errors)}')
+        self.stdout.write(f'Импортировано привычек {report.created} из {report.rows} за {report.seconds:.1f} с '
+                          f'({report.rows_per_second} строк/с)')
@@ -1,7 +1,28 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
 from django.db import models
 
 from config.settings import NULLABLE
+from users.cache import invalidate_cached_user
+
+
+class UserQuerySet(models.QuerySet):
+    """Массовое изменение и удаление пользователей тоже удаляет их из кэша аутентификации"""
+
+    def update(self, **kwargs):
+        user_ids = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        invalidate_cached_user(*user_ids)
+        return rows
+
+    def delete(self):
+        user_ids = list(self.values_list('pk', flat=True))
+        result = super().delete()
+        invalidate_cached_user(*user_ids)
+        return result
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
 
 
 class User(AbstractUser):
@@ -12,3 +33,15 @@ class User(AbstractUser):
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
+
+    objects = UserManager()
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_cached_user(self.pk)
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        invalidate_cached_user(user_id)
+        return result
@@ -1,3 +1,153 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.test import override_settings, TestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from habits.models import Habit
+from users.authentication import CachedJWTAuthentication
+from users.cache import get_user_cache_key
+from users.models import User
+
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create(email='user@test.com', password='test')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_user_cached(self):
+        """Тестирование, что повторные запросы не загружают пользователя из БД"""
+        self.client.get(f'/users/{self.user.id}/')
+
+        # Остается только запрос пользователя, которого просматривают
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/users/{self.user.id}/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['email'], 'user@test.com')
+
+    def test_user_update_invalidates_cache(self):
+        """Тестирование сброса кэша при изменении пользователя через API"""
+        self.client.get(f'/users/{self.user.id}/')
+
+        response = self.client.patch(f'/users/{self.user.id}/update/', data={'first_name': 'Сергей'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertIsNone(cache.get(get_user_cache_key(self.user.id)))
+        response = self.client.get(f'/users/{self.user.id}/')
+        self.assertEqual(response.json()['first_name'], 'Сергей')
+        self.assertIsNotNone(cache.get(get_user_cache_key(self.user.id)))
+
+    def test_cached_fields(self):
+        """Тестирование, что в кэше хранятся только поля для проверок, без хэша пароля"""
+        self.client.get(f'/users/{self.user.id}/')
+
+        cached = cache.get(get_user_cache_key(self.user.id))
+        self.assertEqual(set(cached), {'id', 'is_active', 'password_hash'})
+        self.assertEqual((cached['id'], cached['is_active']), (self.user.id, True))
+        self.assertNotIn(self.user.password, str(cached))
+
+    def test_cached_user_loads_deferred_fields(self):
+        """Тестирование, что остальные поля пользователя из кэша загружаются из БД при обращении"""
+        request = mock.Mock(META={'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'})
+        CachedJWTAuthentication().authenticate(request)
+
+        with self.assertNumQueries(0):
+            user, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertEqual(user, self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'user@test.com')
+
+    def test_queryset_update_invalidates_cache(self):
+        """Тестирование, что массовая деактивация пользователей сразу лишает их доступа"""
+        self.client.get(f'/users/{self.user.id}/')
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        self.assertIsNone(cache.get(get_user_cache_key(self.user.id)))
+        response = self.client.get(f'/users/{self.user.id}/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_queryset_delete_invalidates_cache(self):
+        """Тестирование, что массовое удаление пользователей сразу лишает их доступа"""
+        self.client.get('/habit/list/')
+
+        User.objects.filter(pk=self.user.pk).delete()
+
+        response = self.client.get('/habit/list/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user(self):
+        """Тестирование, что деактивированный пользователь сразу теряет доступ"""
+        self.client.get(f'/users/{self.user.id}/')
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(f'/users/{self.user.id}/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user(self):
+        """Тестирование, что удаленный пользователь сразу теряет доступ"""
+        self.client.get('/habit/list/')
+
+        self.user.delete()
+
+        response = self.client.get('/habit/list/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=3600)
+    def test_cache_timeout_limited_by_token(self):
+        """Тестирование, что пользователь не хранится в кэше дольше срока действия токена"""
+        token = AccessToken.for_user(self.user)
+        token.set_exp(lifetime=datetime.timedelta(seconds=30))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        with mock.patch('users.authentication.cache.set') as cache_set:
+            self.client.get(f'/users/{self.user.id}/')
+
+        key, cached, timeout = cache_set.call_args.args
+        self.assertEqual(key, get_user_cache_key(self.user.id))
+        self.assertLessEqual(timeout, 30)
+
+
+class ImportHabitsCommandTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create(email='user@test.com', password='test')
+
+    def import_file(self, content, suffix, *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, encoding='utf-8', delete=False) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        stdout = io.StringIO()
+        call_command('import_habits', file.name, '--email', self.user.email, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_import_habits(self):
+        """Тестирование импорта привычек командой с прогрессом по частям и ошибками по строкам"""
+        content = '\n'.join(['action,lead_time,periodicity'] + [f'Habit_import_{index},10,1' for index in range(5)]
+                            + ['Habit_import_bad,10,30'])
+
+        output = self.import_file(content, '.csv', '--chunk-size', '2')
+
+        self.assertEqual(Habit.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(output.count('Строк '), 3)
+        self.assertIn('Строка 6: ', output)
+        self.assertIn('Импортировано привычек 5 из 6', output)
+
+    def test_import_errors(self):
+        """Тестирование ошибок команды импорта"""
+        with self.assertRaisesMessage(CommandError, 'Ошибка JSON'):
+            self.import_file('[{"action": ', '.json')
+        with self.assertRaisesMessage(CommandError, 'не найден'):
+            call_command('import_habits', 'habits.csv', '--email', 'missing@test.com')